@@ -3,6 +3,8 @@ import tornado.web
 import sys
 
 
+from .cluster import SharedExecutor
+from .jobs import JobManager
 from .handlers import (
     ProjectHandler,
     DatasetHandler,
@@ -20,6 +22,12 @@ from .handlers import (
 def make_app():
     """Create and return a `tornado.web.Application` object with specified
     handlers and settings.
+
+    The application's `executor` (a `cluster.SharedExecutor`) and
+    `job_manager` (a `jobs.JobManager`) are shared by all handlers; call
+    ``app.executor.start()`` and ``app.job_manager.start()`` once the event
+    loop is set up to connect to the scheduler before the first request
+    arrives and to resume the jobs interrupted by the last shutdown.
     """
     settings = {
         'static_path': '../public',
@@ -30,9 +38,10 @@ def make_app():
         (r'/project(/.*)?', ProjectHandler),
         (r'/dataset(/.*)?', DatasetHandler),
         (r'/features(/.*)?', FeatureHandler),
+        (r'/models/([0-9]+)/(grow)', ModelHandler),
         (r'/models(/.*)?', ModelHandler),
         (r'/predictions(/[0-9]+)?', PredictionHandler),
-        (r'/predictions/([0-9]+)/(download)', PredictionHandler),
+        (r'/predictions/([0-9]+)/(download|results)', PredictionHandler),
         (r'/predict_raw_data', PredictRawDataHandler),
         (r'/features_list', FeatureListHandler),
         (r'/socket_auth_token', SocketAuthTokenHandler),
@@ -42,4 +51,8 @@ def make_app():
              {'path': 'public/', 'default_filename': 'index.html'})
     ]
 
-    return tornado.web.Application(handlers, **settings)
+    app = tornado.web.Application(handlers, **settings)
+    app.executor = SharedExecutor()
+    app.job_manager = JobManager(app.executor)
+
+    return app
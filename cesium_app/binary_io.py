@@ -0,0 +1,213 @@
+'''Binary encodings for raw time series and prediction data.
+
+Time series can be sent to `/predict_raw_data` either as JSON, or in one of
+the following binary forms (selected by the request's `Content-Type`):
+
+- ``application/x-npy``: a single `.npy` array of shape `(k, n)` (one time
+  series) or `(k, m, n)` (`m` time series of equal length), where the `k`
+  rows are times, values and (optionally) errors.
+- ``application/x-npz``: an `.npz` archive with arrays `times`, `values`,
+  optional `errors` and optional `offsets`; if `offsets` is given, the other
+  arrays are the concatenation of all (ragged) time series.
+- ``application/octet-stream``: a length-prefixed, little-endian buffer::
+
+      uint64  n_series
+      uint64  n_arrays                   (2: times, values; 3: + errors)
+      uint64  offsets[n_series + 1]      (offsets[0] == 0)
+      float64 data[n_arrays][offsets[-1]]
+
+The `.npy` and buffer forms are decoded without copying: the returned arrays
+are read-only views into the request body.
+'''
+
+import io
+import struct
+
+import numpy as np
+
+
+__all__ = ['NPY_CONTENT_TYPE', 'NPZ_CONTENT_TYPE', 'BUFFER_CONTENT_TYPE',
+           'CONTENT_TYPES', 'decode_ts_data', 'encode_buffer',
+           'encode_predset']
+
+
+NPY_CONTENT_TYPE = 'application/x-npy'
+NPZ_CONTENT_TYPE = 'application/x-npz'
+BUFFER_CONTENT_TYPE = 'application/octet-stream'
+CONTENT_TYPES = (NPY_CONTENT_TYPE, NPZ_CONTENT_TYPE, BUFFER_CONTENT_TYPE)
+
+_BUFFER_HEADER = struct.Struct('<QQ')
+
+
+def _split_ragged(data, offsets):
+    """Split flat array `data` into a list of views at `offsets`."""
+    return [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _check_offsets(offsets, n_points=None):
+    """Ensure `offsets` start at zero and are non-decreasing."""
+    # Compared rather than differenced, since unsigned differences wrap
+    if (len(offsets) < 2 or offsets[0] != 0 or
+            np.any(offsets[1:] < offsets[:-1])):
+        raise ValueError('Offsets must start at 0 and be non-decreasing')
+    if n_points is not None and offsets[-1] != n_points:
+        raise ValueError('Last offset ({}) does not match number of points '
+                         '({})'.format(offsets[-1], n_points))
+
+
+def _unstack(arrays):
+    """Turn `(k, n)` or `(k, m, n)` input into a list of `k` entries, each a
+    single `(n,)` array or a list of `m` such arrays.
+    """
+    if arrays.ndim == 2:
+        return list(arrays)
+    elif arrays.ndim == 3:
+        return [list(a) for a in arrays]
+    else:
+        raise ValueError('Expected array of shape (k, n) or (k, m, n); got '
+                         '{}'.format(arrays.shape))
+
+
+def _decode_npy(body):
+    """Decode a `.npy` body into a zero-copy view."""
+    f = io.BytesIO(body)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    if dtype.hasobject:
+        raise ValueError('Object arrays are not supported')
+    count = int(np.prod(shape))
+    arrays = np.frombuffer(body, dtype=dtype, count=count, offset=f.tell())
+    if fortran_order:
+        arrays = arrays.reshape(shape[::-1]).T
+    else:
+        arrays = arrays.reshape(shape)
+
+    return _unstack(arrays)
+
+
+def _decode_npz(body):
+    """Decode a `.npz` body; ragged data is split using `offsets`."""
+    with np.load(io.BytesIO(body), allow_pickle=False) as npz:
+        names = [name for name in ('times', 'values', 'errors')
+                 if name in npz.files]
+        if names[:2] != ['times', 'values']:
+            raise ValueError("Archive must contain 'times' and 'values'")
+        arrays = [npz[name] for name in names]
+        offsets = npz['offsets'] if 'offsets' in npz.files else None
+
+    if offsets is None:
+        if len(set(a.shape for a in arrays)) != 1:
+            raise ValueError('Arrays must all have the same shape')
+        return _unstack(np.stack(arrays))
+
+    _check_offsets(offsets)
+    for arr in arrays:
+        _check_offsets(offsets, len(arr))
+    return [_split_ragged(arr, offsets) for arr in arrays]
+
+
+def _decode_buffer(body):
+    """Decode a length-prefixed float64 buffer into zero-copy views."""
+    if len(body) < _BUFFER_HEADER.size:
+        raise ValueError('Buffer too short')
+    n_series, n_arrays = _BUFFER_HEADER.unpack_from(body)
+    if n_arrays not in (2, 3):
+        raise ValueError('Expected 2 or 3 arrays per time series; got '
+                         '{}'.format(n_arrays))
+
+    offsets_start = _BUFFER_HEADER.size
+    data_start = offsets_start + 8 * (n_series + 1)
+    if len(body) < data_start:
+        raise ValueError('Buffer too short')
+    offsets = np.frombuffer(body, dtype='<u8', count=n_series + 1,
+                            offset=offsets_start)
+    _check_offsets(offsets)
+
+    n_points = int(offsets[-1])
+    if len(body) != data_start + 8 * n_arrays * n_points:
+        raise ValueError('Buffer length does not match header')
+    data = np.frombuffer(body, dtype='<f8', count=n_arrays * n_points,
+                         offset=data_start).reshape(n_arrays, n_points)
+
+    return [_split_ragged(arr, offsets) for arr in data]
+
+
+def decode_ts_data(body, content_type):
+    """Decode binary time series data.
+
+    Parameters
+    ----------
+    body : bytes
+        Raw request body.
+    content_type : str
+        One of `CONTENT_TYPES`, indicating the encoding of `body`.
+
+    Returns
+    -------
+    list
+        `[times, values]` or `[times, values, errors]`, where each entry is
+        either a single array or a list of arrays (one per time series), as
+        accepted by `cesium.featurize.featurize_time_series`.
+
+    Raises
+    ------
+    ValueError
+        If the body cannot be decoded.
+
+    """
+    if content_type == NPY_CONTENT_TYPE:
+        return _decode_npy(body)
+    elif content_type == NPZ_CONTENT_TYPE:
+        return _decode_npz(body)
+    elif content_type == BUFFER_CONTENT_TYPE:
+        return _decode_buffer(body)
+    else:
+        raise ValueError('Unknown content type {}'.format(content_type))
+
+
+def encode_buffer(times, values, errors=None):
+    """Encode lists of (ragged) arrays in the length-prefixed buffer format.
+
+    This is the inverse of decoding with `BUFFER_CONTENT_TYPE`; it is meant
+    for use by clients and tests.
+
+    """
+    arrays = [times, values] + ([errors] if errors is not None else [])
+    lengths = [len(t) for t in times]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype('<u8')
+
+    out = io.BytesIO()
+    out.write(_BUFFER_HEADER.pack(len(times), len(arrays)))
+    out.write(offsets.tobytes())
+    for series in arrays:
+        for arr in series:
+            out.write(np.asarray(arr, dtype='<f8').tobytes())
+    return out.getvalue()
+
+
+def encode_predset(predset):
+    """Serialize a prediction `xarray.Dataset` into a compact `.npz` archive.
+
+    The archive contains `name`, `prediction` and, where present,
+    `class_label` and `target`; all string values are stored as fixed-width
+    unicode arrays, so that the result can be loaded with
+    `np.load(..., allow_pickle=False)`.
+
+    """
+    arrays = {'name': predset.name.values.astype('U'),
+              'prediction': predset.prediction.values}
+    if arrays['prediction'].dtype.hasobject:
+        arrays['prediction'] = arrays['prediction'].astype('U')
+    if 'class_label' in predset:
+        arrays['class_label'] = predset.class_label.values.astype('U')
+    if 'target' in predset:
+        arrays['target'] = predset.target.values
+        if arrays['target'].dtype.hasobject:
+            arrays['target'] = arrays['target'].astype('U')
+
+    out = io.BytesIO()
+    np.savez(out, **arrays)
+    return out.getvalue()
@@ -0,0 +1,162 @@
+'''Long-lived connection to the dask scheduler, shared by all handlers.
+
+Connecting a new `distributed.Executor` to the scheduler takes a handshake
+(and starts a new scheduler-side client with its own bookkeeping), so instead
+of creating one per request the application holds a single `SharedExecutor`
+(``application.executor``; see `app_server.make_app`). It connects when the
+server starts, periodically checks that the scheduler still responds and,
+once the connection is lost (e.g. after the scheduler has been restarted),
+replaces it with a new one. Handlers obtain the current executor with
+``yield self._get_executor()``.
+'''
+
+import time
+
+import tornado.gen
+import tornado.ioloop
+import tornado.locks
+
+from .config import cfg
+
+
+__all__ = ['SharedExecutor']
+
+
+class SharedExecutor(object):
+    """Application-wide `distributed.Executor`, reconnected as needed.
+
+    Closing the connection cancels the tasks submitted through it, so a
+    connection is only replaced once it has been closed; while it is still
+    open, a scheduler that does not respond to health checks (e.g. because
+    it is busy) is only reported.
+
+    Parameters
+    ----------
+    address : str, optional
+        Address of the dask scheduler; defaults to
+        ``cfg['cluster']['scheduler_address']``.
+    health_check_interval : float, optional
+        Seconds between health checks; defaults to
+        ``cfg['cluster']['health_check_interval']``. 0 disables periodic
+        checks (the connection is then only re-established when it is found
+        to be closed).
+    timeout : float, optional
+        Seconds to wait for the scheduler to respond when connecting or
+        checking the connection; defaults to ``cfg['cluster']['timeout']``.
+    loop : `tornado.ioloop.IOLoop`, optional
+        Event loop of the executor; defaults to the current loop.
+
+    """
+    def __init__(self, address=None, health_check_interval=None,
+                 timeout=None, loop=None):
+        self.address = address or cfg['cluster']['scheduler_address']
+        if health_check_interval is None:
+            health_check_interval = cfg['cluster']['health_check_interval']
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout or cfg['cluster']['timeout']
+        self.loop = loop or tornado.ioloop.IOLoop.current()
+
+        self._executor = None
+        self._connect_lock = tornado.locks.Lock()
+        self._health_check = None
+        # Connection statistics, e.g. for monitoring
+        self.n_connects = 0
+        self.n_failures = 0
+        self.last_healthy = None
+
+    def start(self):
+        """Connect to the scheduler in the background and start periodic
+        health checks. Must be called from within the event loop thread.
+        """
+        self.loop.spawn_callback(self.check_health)
+        if self.health_check_interval and self._health_check is None:
+            self._health_check = tornado.ioloop.PeriodicCallback(
+                self.check_health, self.health_check_interval * 1000)
+            self._health_check.start()
+
+    @tornado.gen.coroutine
+    def stop(self):
+        """Stop health checks and close the connection to the scheduler."""
+        if self._health_check is not None:
+            self._health_check.stop()
+            self._health_check = None
+        yield self._close()
+
+    @property
+    def connected(self):
+        return (self._executor is not None and
+                self._executor.status == 'running')
+
+    @tornado.gen.coroutine
+    def get(self):
+        """Return the connected executor, (re)connecting if necessary."""
+        if self.connected:
+            return self._executor
+
+        with (yield self._connect_lock.acquire()):
+            # Another request may have reconnected while we were waiting
+            if not self.connected:
+                yield self._connect()
+        return self._executor
+
+    @tornado.gen.coroutine
+    def _connect(self):
+        from distributed import Executor
+
+        yield self._close()
+        executor = Executor(self.address, loop=self.loop, start=False)
+        try:
+            yield tornado.gen.with_timeout(self.loop.time() + self.timeout,
+                                           executor._start())
+        except Exception:
+            try:
+                yield executor._shutdown(fast=True)
+            except Exception:
+                pass
+            raise
+        self._executor = executor
+        self.n_connects += 1
+        self.last_healthy = time.time()
+        print('[cluster] Connected to scheduler at {}'.format(self.address))
+
+    @tornado.gen.coroutine
+    def _close(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            try:
+                yield executor._shutdown(fast=True)
+            except Exception:
+                pass
+
+    @tornado.gen.coroutine
+    def check_health(self):
+        """Check that the scheduler responds, reconnecting if it does not.
+
+        Returns
+        -------
+        bool
+            Whether the scheduler responds (possibly after reconnecting).
+
+        """
+        try:
+            executor = yield self.get()
+            yield tornado.gen.with_timeout(self.loop.time() + self.timeout,
+                                           executor.scheduler.ncores())
+        except Exception as e:
+            self.n_failures += 1
+            print('[cluster] Scheduler at {} not responding ({!r}, {} '
+                  'consecutive checks)'.format(self.address, e,
+                                               self.n_failures))
+            if self.connected:
+                # Only slow; replacing the connection would cancel the tasks
+                # in flight
+                return False
+            try:
+                yield self.get()
+            except Exception:
+                # Retried by the next health check or request
+                return False
+
+        self.n_failures = 0
+        self.last_healthy = time.time()
+        return True
@@ -0,0 +1,88 @@
+'''Delta updates of the lists of projects, datasets, feature sets, models and
+predictions shown by the frontend.
+
+Rather than telling the frontend to download a whole list again (e.g. with
+'cesium/FETCH_MODELS') whenever one of its records changes, handlers and
+jobs push a 'cesium/APPLY_DELTA' action carrying the change itself:
+
+    {'collection': 'models', 'id': 3, 'version': 1500000000123456,
+     'item': {...}}
+
+or, for a deleted record,
+
+    {'collection': 'featuresets', 'id': 2, 'version': ..., 'deleted': True,
+     'cascade': {'models': [3, 4], 'predictions': [7]}}
+
+`item` is the record as returned by the corresponding list endpoint, but
+without the results of predictions (which the frontend downloads separately
+once a prediction has finished), and `cascade` lists the records deleted
+along with it (by ``ON DELETE CASCADE``). `version` is the time of the
+change, in microseconds; the frontend ignores deltas older than the version
+of the item it has.
+'''
+
+import time
+
+from .models import Project, Dataset, Featureset, Model, Prediction
+
+
+__all__ = ['APPLY_DELTA', 'updated', 'deleted']
+
+
+APPLY_DELTA = 'cesium/APPLY_DELTA'
+
+_collections = {Project: 'projects', Dataset: 'datasets',
+                Featureset: 'featuresets', Model: 'models',
+                Prediction: 'predictions'}
+
+
+def _version():
+    return int(time.time() * 1e6)
+
+
+def _item(record):
+    """The record as returned by its list endpoint, without prediction
+    results."""
+    if isinstance(record, Prediction):
+        return record.display_info(results=False)
+    elif hasattr(record, 'display_info'):
+        return record.display_info()
+    return record.__dict__()
+
+
+def _dependents(record):
+    """Queries of the records deleted along with `record`, by collection."""
+    if isinstance(record, Project):
+        return {'datasets': record.datasets,
+                'featuresets': record.featuresets,
+                'models': record.models,
+                'predictions': record.predictions}
+    elif isinstance(record, Dataset):
+        return {'predictions': Prediction.select().where(
+            Prediction.dataset == record)}
+    elif isinstance(record, Featureset):
+        return {'models': record.models,
+                'predictions': Prediction.select().join(Model).where(
+                    Model.featureset == record)}
+    elif isinstance(record, Model):
+        return {'predictions': record.predictions}
+    return {}
+
+
+def updated(record):
+    """Delta of a created or updated `record`."""
+    return {'collection': _collections[type(record)], 'id': record.id,
+            'version': _version(), 'item': _item(record)}
+
+
+def deleted(record, cascade=True):
+    """Delta of the deletion of `record`; must be computed before the
+    record is deleted, unless `cascade` is False (e.g. because it cannot
+    have any dependent records yet)."""
+    delta = {'collection': _collections[type(record)], 'id': record.id,
+             'version': _version(), 'deleted': True}
+    if cascade:
+        delta['cascade'] = {collection: [r.id for r in query]
+                            for collection, query
+                            in _dependents(record).items()}
+    return delta
@@ -0,0 +1,216 @@
+'''Array-backed tree ensembles for fast batch prediction.
+
+A fitted scikit-learn forest is a list of separate `Tree` objects, each of
+which stores its nodes as an array of C structs plus a dense `value` array
+for every node. `FlatForestClassifier` and `FlatForestRegressor` flatten
+all trees of a forest into a handful of contiguous NumPy arrays:
+
+- `children_left`, `children_right`, `feature` (int32) and `threshold`
+  (float64), with one entry per node of the whole ensemble;
+- `leaf_values`, with one row per *leaf* only (for leaves, `feature` holds
+  the row index into `leaf_values` and `children_left` is -1);
+- `roots`, the index of each tree's root node.
+
+Trees are traversed one at a time for all samples, by a loop compiled with
+`numba` if it is installed, or else by vectorized NumPy operations (one tree
+level per step). Being plain NumPy arrays, the flattened models are much
+smaller than the pickled forests and can be saved with `model_io.save_model`
+and memory-mapped by `model_io.load_model`.
+'''
+
+import numpy as np
+try:
+    import numba
+except ImportError:
+    numba = None
+from sklearn.ensemble import (RandomForestClassifier, RandomForestRegressor,
+                              ExtraTreesClassifier, ExtraTreesRegressor)
+from sklearn.model_selection import GridSearchCV
+
+
+__all__ = ['FlatForestClassifier', 'FlatForestRegressor', 'flatten_forest',
+           'is_flattenable']
+
+
+FOREST_CLASSIFIERS = (RandomForestClassifier, ExtraTreesClassifier)
+FOREST_REGRESSORS = (RandomForestRegressor, ExtraTreesRegressor)
+
+_LEAF = -1
+
+
+def _accumulate_leaf_values_numpy(X, roots, children_left, children_right,
+                                  feature, threshold, leaf_values, out):
+    """Add to `out` the values of the leaves reached by each sample of `X` in
+    every tree. Each tree is traversed for all samples at once, one level per
+    vectorized step.
+    """
+    children = np.stack([children_left, children_right], axis=1).ravel()
+    X_flat = X.ravel()
+    sample_offsets = np.arange(X.shape[0]) * X.shape[1]
+    for root in roots:
+        node = np.full(X.shape[0], root, dtype=np.intp)
+        active = np.arange(X.shape[0])
+        while active.size:
+            current = node.take(active)
+            # Negated rather than `>`, so that NaN goes right, as in the loop
+            go_right = ~(X_flat.take(sample_offsets.take(active) +
+                                     feature.take(current))
+                         <= threshold.take(current))
+            current = children.take(2 * current + go_right)
+            node[active] = current
+            active = active[children_left.take(current) != _LEAF]
+        out += leaf_values.take(feature.take(node), axis=0)
+
+
+def _accumulate_leaf_values_loop(X, roots, children_left, children_right,
+                                 feature, threshold, leaf_values, out):
+    """Same as `_accumulate_leaf_values_numpy`, as explicit loops to be
+    compiled by numba.
+    """
+    for t in range(roots.shape[0]):
+        for i in range(X.shape[0]):
+            node = roots[t]
+            while children_left[node] != _LEAF:
+                if X[i, feature[node]] <= threshold[node]:
+                    node = children_left[node]
+                else:
+                    node = children_right[node]
+            leaf = feature[node]
+            for k in range(leaf_values.shape[1]):
+                out[i, k] += leaf_values[leaf, k]
+
+
+if numba is not None:
+    _accumulate_leaf_values = numba.njit(nogil=True)(
+        _accumulate_leaf_values_loop)
+else:
+    _accumulate_leaf_values = _accumulate_leaf_values_numpy
+
+
+class _FlatForest(object):
+    """Base class of flattened tree ensembles."""
+    def __init__(self, estimator):
+        trees = [e.tree_ for e in estimator.estimators_]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError('Multi-output forests are not supported.')
+
+        n_nodes = np.array([tree.node_count for tree in trees])
+        self.roots = np.concatenate([[0], np.cumsum(n_nodes)[:-1]]).astype(
+            np.int32)
+        self.n_features_ = estimator.estimators_[0].tree_.n_features
+
+        children_left = []
+        children_right = []
+        feature = []
+        threshold = []
+        leaf_values = []
+        n_leaves = 0
+        for root, tree in zip(self.roots, trees):
+            is_leaf = tree.children_left == _LEAF
+            left = np.where(is_leaf, _LEAF, tree.children_left + root)
+            right = np.where(is_leaf, _LEAF, tree.children_right + root)
+            leaf_ids = np.cumsum(is_leaf) - 1 + n_leaves
+            children_left.append(left)
+            children_right.append(right)
+            feature.append(np.where(is_leaf, leaf_ids, tree.feature))
+            threshold.append(np.where(is_leaf, 0., tree.threshold))
+            leaf_values.append(self._leaf_values(tree.value[is_leaf, 0, :]))
+            n_leaves += is_leaf.sum()
+
+        self.children_left = np.concatenate(children_left).astype(np.int32)
+        self.children_right = np.concatenate(children_right).astype(np.int32)
+        self.feature = np.concatenate(feature).astype(np.int32)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.leaf_values = np.concatenate(leaf_values).astype(np.float64)
+
+    def _leaf_values(self, values):
+        return values
+
+    def _mean_leaf_values(self, X):
+        """Average, over all trees, the values of the leaves reached by each
+        sample.
+        """
+        # scikit-learn compares float32 feature values against thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_:
+            raise ValueError('Expected input of shape (n_samples, {}); got '
+                             '{}'.format(self.n_features_, X.shape))
+
+        out = np.zeros((X.shape[0], self.leaf_values.shape[1]))
+        _accumulate_leaf_values(X, self.roots, self.children_left,
+                                self.children_right, self.feature,
+                                self.threshold, self.leaf_values, out)
+        out /= len(self.roots)
+        return out
+
+
+class FlatForestClassifier(_FlatForest):
+    """Flattened `RandomForestClassifier`/`ExtraTreesClassifier`.
+
+    Implements the `predict`/`predict_proba` interface of the original
+    estimator, and should produce the same output.
+    """
+    def __init__(self, estimator):
+        _FlatForest.__init__(self, estimator)
+        self.classes_ = estimator.classes_
+
+    def _leaf_values(self, values):
+        normalizer = values.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.] = 1.
+        return values / normalizer
+
+    def predict_proba(self, X):
+        return self._mean_leaf_values(X)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class FlatForestRegressor(_FlatForest):
+    """Flattened `RandomForestRegressor`/`ExtraTreesRegressor`.
+
+    Implements the `predict` interface of the original estimator, and should
+    produce the same output.
+    """
+    def predict(self, X):
+        return self._mean_leaf_values(X)[:, 0]
+
+
+def is_flattenable(model):
+    """Check whether `model` (or its best estimator, for `GridSearchCV`) is a
+    forest supported by `flatten_forest`.
+    """
+    if isinstance(model, GridSearchCV):
+        model = model.best_estimator_
+    return isinstance(model, FOREST_CLASSIFIERS + FOREST_REGRESSORS)
+
+
+def flatten_forest(model):
+    """Convert a fitted forest into a `FlatForestClassifier` or
+    `FlatForestRegressor`.
+
+    Parameters
+    ----------
+    model : scikit-learn estimator or `GridSearchCV`
+        Fitted random forest/extra trees model, or grid search whose best
+        estimator is one.
+
+    Returns
+    -------
+    `FlatForestClassifier` or `FlatForestRegressor`
+
+    Raises
+    ------
+    ValueError
+        If `model` is not a supported forest.
+
+    """
+    if isinstance(model, GridSearchCV):
+        model = model.best_estimator_
+    if isinstance(model, FOREST_CLASSIFIERS):
+        return FlatForestClassifier(model)
+    elif isinstance(model, FOREST_REGRESSORS):
+        return FlatForestRegressor(model)
+    else:
+        raise ValueError('Cannot flatten model of type {}'.format(
+            type(model).__name__))
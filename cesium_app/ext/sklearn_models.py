@@ -141,7 +141,26 @@ model_descriptions = [
      "type": "regressor",
      "url": "http://scikit-learn.org/stable/modules/generated/sklearn.linear_model.BayesianRidge.html"}]
 
+
+# Options controlling the hyperparameter search (see `cesium_app.model_search`)
+# rather than the model itself; added to all models with parameter grids
+search_param_descriptions = [
+    {"name": "search_strategy", "type": str, "default": "grid"},
+    {"name": "search_budget", "type": int, "default": None},
+    {"name": "halving_resource", "type": str, "default": "n_samples"}]
+SEARCH_STRATEGIES = ['grid', 'random', 'halving']
+HALVING_RESOURCES = ['n_samples', 'n_estimators']
+
+
+def _has_param_grid(model_desc):
+    return any(isinstance(p["default"], list) and
+               list not in make_list(p["type"]) for p in model_desc["params"])
+
+
 for model_dict in model_descriptions:
+    if _has_param_grid(model_dict):
+        model_dict['params'] = (model_dict['params'] +
+                                search_param_descriptions)
     model_dict['description'] = (MODELS_TYPE_DICT[model_dict['name'].split()[0]]
                                  .__doc__.split('\n')[0].strip())
     if '(fast)' in model_dict['name']:
@@ -152,7 +171,8 @@ for model_dict in model_descriptions:
                                       'possible parameter values.)')
 
 
-def check_model_param_types(model_type, model_params, all_as_lists=False):
+def check_model_param_types(model_type, model_params, all_as_lists=False,
+                            return_search_options=False):
     """Ensure parameters are of expected type; split standard values and grids.
 
     Parameters
@@ -165,14 +185,19 @@ def check_model_param_types(model_type, model_params, all_as_lists=False):
     all_as_lists : bool, optional
         Boolean indicating whether `model_params` values are wrapped in lists,
         as in the case of parameter grids for optimization.
+    return_search_options : bool, optional
+        Boolean indicating whether to also return the hyperparameter search
+        options (see `search_param_descriptions`) found in `model_params`.
 
     Returns
     -------
-    (dict, dict) tuple
+    (dict, dict) or (dict, dict, dict) tuple
         Returns a tuple of two dictionaries, the first of which contains those
         hyper-parameters that are to be passed into the model constructor as-is,
         and the second containing hyper-parameter grids intended for
-        optimization (with GridSearchCV).
+        optimization (with `model_search.search_params`). If
+        `return_search_options` is True, a third dictionary contains the
+        search options.
 
     Raises
     ------
@@ -242,4 +267,30 @@ def check_model_param_types(model_type, model_params, all_as_lists=False):
                 .format(param_name, model_desc["name"], required_type,
                         param_value, type(param_value)))
 
-    return standard_params, params_to_optimize
+    # Unset options are left out, so that the defaults of `search_params`
+    # apply
+    search_options = {p["name"]: standard_params.pop(p["name"])
+                      for p in search_param_descriptions
+                      if p["name"] in standard_params}
+    search_options = {name: value for name, value in search_options.items()
+                      if value not in [None, "None", ""]}
+    strategy = search_options.get("search_strategy")
+    if strategy not in SEARCH_STRATEGIES + [None]:
+        raise ValueError("Unknown search strategy {}; expected one of {}."
+                         .format(strategy, SEARCH_STRATEGIES))
+    budget = search_options.get("search_budget")
+    if budget is not None and budget < 1:
+        raise ValueError("Search budget must be a positive integer.")
+    resource = search_options.get("halving_resource")
+    if resource not in HALVING_RESOURCES + [None]:
+        raise ValueError("Unknown halving resource {}; expected one of {}."
+                         .format(resource, HALVING_RESOURCES))
+    if (strategy == "halving" and resource == "n_estimators" and
+            not any(p["name"] == "n_estimators" for p in model_desc["params"])):
+        raise ValueError("Model {} has no parameter n_estimators."
+                         .format(model_desc["name"]))
+
+    if return_search_options:
+        return standard_params, params_to_optimize, search_options
+    else:
+        return standard_params, params_to_optimize
@@ -0,0 +1,85 @@
+'''Worker-resident cache of feature sets loaded for model building.
+
+Consecutive model builds on the same feature set (e.g. while tuning
+hyperparameters) would otherwise each read and decode the feature set file
+again. Loaded feature sets are instead kept in a per-process LRU cache,
+keyed by file path and modification time, up to a total size of
+``cfg['models']['featureset_cache_size_mb']``; least recently used entries
+are also evicted while system memory usage exceeds
+``cfg['models']['featureset_cache_max_memory_percent']``. Entries of a
+deleted feature set are removed with `evict`, which should be run on all
+workers (see `FeatureHandler.delete`).
+'''
+
+from collections import OrderedDict
+import os
+import threading
+
+import psutil
+
+from .config import cfg
+
+
+__all__ = ['get', 'evict']
+
+
+# Loaded feature sets and their sizes, keyed by (path, modification time)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _nbytes(data):
+    X, y = data
+    return int(X.memory_usage(index=True, deep=True).sum()) + y.nbytes
+
+
+def _evict_lru():
+    """Evict least recently used entries while the cache is too large or
+    memory is running low. Must be called with `_cache_lock` held.
+    """
+    max_bytes = cfg['models']['featureset_cache_size_mb'] * 2 ** 20
+    max_percent = cfg['models']['featureset_cache_max_memory_percent']
+    while _cache and (
+            sum(nbytes for _, nbytes in _cache.values()) > max_bytes or
+            psutil.virtual_memory().percent > max_percent):
+        _cache.popitem(last=False)
+
+
+def get(path, load):
+    """Return the cached contents of feature set `path`, loading them with
+    `load(path)` if necessary.
+
+    The returned data may be shared with other callers, and so must not be
+    modified in place.
+    """
+    key = (path, os.path.getmtime(path))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key][0]
+
+    data = load(path)
+
+    with _cache_lock:
+        for stale_key in [k for k in _cache if k[0] == path]:
+            del _cache[stale_key]
+        _cache[key] = (data, _nbytes(data))
+        _evict_lru()
+
+    return data
+
+
+def evict(path):
+    """Remove feature set `path` from the cache of this process.
+
+    Returns
+    -------
+    int
+        Number of entries removed.
+
+    """
+    with _cache_lock:
+        keys = [k for k in _cache if k[0] == path]
+        for key in keys:
+            del _cache[key]
+    return len(keys)
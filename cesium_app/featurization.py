@@ -0,0 +1,81 @@
+'''Featurization of datasets on the cluster, shared by featurization and
+prediction jobs.
+
+Each time series file is read and featurized in a single task, so that a
+series that fails (e.g. because its file could not be read from shared
+storage) can be retried, or left out of the feature set, on its own (see
+`retry.wait_items`).
+'''
+
+import tornado.gen
+from cesium import featurize, time_series
+from cesium import featureset
+
+from . import resources
+from . import retry
+
+
+__all__ = ['featurize_file', 'assemble_features', 'featurize_dataset']
+
+
+def featurize_file(uri, features_to_use, custom_script_path=None):
+    """Read and featurize the time series saved at `uri`.
+
+    Returns
+    -------
+    (cesium.time_series.TimeSeries, pandas.Series) tuple
+        The time series and its features.
+
+    """
+    ts = time_series.from_netcdf(uri)
+    features = featurize.featurize_single_ts(
+        ts, features_to_use=features_to_use,
+        custom_script_path=custom_script_path)
+    return ts, features
+
+
+def assemble_features(featurized):
+    """Assemble the outputs of `featurize_file` into an imputed feature
+    set."""
+    all_time_series = [ts for ts, _ in featurized]
+    all_features = [features for _, features in featurized]
+    fset = featurize.assemble_featureset(all_features, all_time_series)
+    return featureset.Featureset.impute(fset)
+
+
+@tornado.gen.coroutine
+def featurize_dataset(executor, uris, features_to_use,
+                      custom_script_path=None):
+    """Featurize the time series saved at `uris` on the cluster.
+
+    Series whose featurization fails (after retrying transient failures)
+    are left out; the others are to be assembled into a feature set with
+    `assemble_features`.
+
+    Returns
+    -------
+    featurized : list of `distributed.Future`
+        Futures of the outputs of `featurize_file` for the series that were
+        featurized successfully.
+    failed : dict
+        Error message of each series (by path) that could not be featurized.
+
+    Raises
+    ------
+    ValueError
+        If no series could be featurized.
+
+    """
+    uri_resources = yield resources.task_resources(*[[uri] for uri in uris])
+    uri_resources = dict(zip(uris, uri_resources))
+
+    def submit(uri, pure):
+        return executor.submit(featurize_file, uri, features_to_use,
+                               custom_script_path, pure=pure,
+                               resources=uri_resources[uri])
+
+    featurized, failed = yield retry.wait_items(submit, uris)
+    if not featurized:
+        raise ValueError('No time series could be featurized: {}'.format(
+            '; '.join(sorted(set(failed.values())))))
+    return featurized, failed
@@ -1,23 +1,127 @@
+'''Publishing of actions to the frontend, through the message proxy and the
+websocket server.
+
+Each process has a single `Flow` publisher (`Flow.instance()`), rather than
+one per request: creating a ZeroMQ context and PUB socket for every request
+used up file descriptors, and messages sent right after connecting were lost
+while the proxy's subscription was still on its way (the "slow joiner"
+problem). `Flow.push` only appends the message to a queue; a background
+thread owns the socket (ZeroMQ sockets may not be shared between threads),
+waits ``cfg['flow']['connect_delay']`` seconds after connecting before
+sending anything, and then sends the queued messages in batches of up to
+``cfg['flow']['batch_size']``. If ``cfg['flow']['queue_size']`` messages are
+waiting, further messages are dropped (and counted in `n_dropped`) instead
+of blocking the request handler.
+'''
+
+import os
+import queue
+import threading
+import time
+
 import zmq
+
+from .config import cfg
 from .json_util import to_json
 
 
+__all__ = ['Flow']
+
+
 class Flow(object):
     """Send messages through websocket to frontend
 
+    Parameters
+    ----------
+    socket_path : str, optional
+        Address of the message proxy's input.
+    queue_size, batch_size : int, optional
+        Maximum number of queued messages, and of messages sent at once.
+    connect_delay : float, optional
+        Seconds to wait after connecting before sending any messages.
+
+    All parameters but `socket_path` default to the corresponding values of
+    ``cfg['flow']``.
+
     """
-    def __init__(self, socket_path='ipc:///tmp/message_flow_in'):
-        ctx = zmq.Context()
-        pub = ctx.socket(zmq.PUB)
-        pub.connect(socket_path)
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, socket_path='ipc:///tmp/message_flow_in',
+                 queue_size=None, batch_size=None, connect_delay=None):
+        def config(value, key):
+            return cfg['flow'][key] if value is None else value
+        self.socket_path = socket_path
+        self.batch_size = config(batch_size, 'batch_size')
+        self.connect_delay = config(connect_delay, 'connect_delay')
+        self._queue = queue.Queue(config(queue_size, 'queue_size'))
+        self.n_sent = 0
+        self.n_dropped = 0
+        self.n_batches = 0
 
-        self._pub = pub
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='flow-publisher')
+        self._thread.start()
+
+    @classmethod
+    def instance(cls):
+        """The publisher shared by all handlers of this process (a new one
+        is created in forked processes, since sockets cannot be shared)."""
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance._pid != os.getpid():
+                cls._instance = cls()
+            return cls._instance
 
     def push(self, user, action_type, payload={}):
         """Push action to specified user over websocket.
 
         """
         print('Pushing action {} to {}'.format(action_type, user))
-        self._pub.send(b"0 " + to_json({'user': user,
-                                        'action': action_type,
-                                        'payload': payload}).encode('utf-8'))
+        message = b"0 " + to_json({'user': user,
+                                   'action': action_type,
+                                   'payload': payload}).encode('utf-8')
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.n_dropped += 1
+            print('[flow] Queue full; dropped action {} to {}'.format(
+                action_type, user))
+
+    def queue_depth(self):
+        """Number of messages waiting to be sent."""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """Wait until all messages pushed so far have been sent; returns
+        whether they were within `timeout` seconds."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = (None if deadline is None
+                             else deadline - time.time())
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _run(self):
+        ctx = zmq.Context.instance()
+        pub = ctx.socket(zmq.PUB)
+        pub.setsockopt(zmq.SNDHWM, 0)
+        pub.connect(self.socket_path)
+        # Give the proxy time to subscribe; messages queue up meanwhile
+        time.sleep(self.connect_delay)
+
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for message in batch:
+                pub.send(message)
+                self._queue.task_done()
+            self.n_sent += len(batch)
+            self.n_batches += 1
@@ -2,6 +2,7 @@ import tornado.web
 import tornado.escape
 import tornado.ioloop
 
+from .. import deltas
 from .. import models
 from ..json_util import to_json
 from ..flow import Flow
@@ -12,7 +13,7 @@ import time
 class BaseHandler(tornado.web.RequestHandler):
     def __init__(self, application, request):
         tornado.web.RequestHandler.__init__(self, application, request)
-        self.flow = Flow()
+        self.flow = Flow.instance()
 
     def get_username(self):
         return "testuser@gmail.com"
@@ -62,6 +63,10 @@ class BaseHandler(tornado.web.RequestHandler):
     def action(self, action, payload={}):
         self.flow.push(self.get_username(), action, payload)
 
+    def push_delta(self, delta):
+        """Send a change to one of the frontend's lists (see `deltas`)."""
+        self.action(deltas.APPLY_DELTA, delta)
+
     def success(self, data={}, action=None, payload={}):
         if action is not None:
             self.action(action, payload)
@@ -83,17 +88,9 @@ class BaseHandler(tornado.web.RequestHandler):
 
     @tornado.gen.coroutine
     def _get_executor(self):
-        loop = tornado.ioloop.IOLoop.current()
-
-        IP = '127.0.0.1'
-        PORT = 63000
-        PORT_SCHEDULER = 63500
-
-        from distributed import Executor
-        executor = Executor('{}:{}'.format(IP, PORT_SCHEDULER), loop=loop,
-                            start=False)
-        yield executor._start()
-
+        """Return the application-wide `distributed.Executor` (see
+        `cluster.SharedExecutor`)."""
+        executor = yield self.application.executor.get()
         return executor
 
 
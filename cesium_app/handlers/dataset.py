@@ -1,5 +1,6 @@
 from .base import BaseHandler, AccessError
 from ..models import Project, Dataset
+from .. import deltas
 from .. import util
 from ..config import cfg
 
@@ -73,7 +74,8 @@ class DatasetHandler(BaseHandler):
         d = Dataset.add(name=dataset_name, project=p, file_names=file_names,
                         file_uris=unique_ts_paths, meta_features=meta_features)
 
-        return self.success(d, 'cesium/FETCH_DATASETS')
+        self.push_delta(deltas.updated(d))
+        return self.success(d)
 
     def get(self, dataset_id=None):
         if dataset_id is not None:
@@ -88,5 +90,7 @@ class DatasetHandler(BaseHandler):
 
     def delete(self, dataset_id):
         d = self._get_dataset(dataset_id)
+        delta = deltas.deleted(d)
         d.delete_instance()
-        return self.success(action='cesium/FETCH_DATASETS')
+        self.push_delta(delta)
+        return self.success()
@@ -1,19 +1,90 @@
 import tornado.ioloop
 
 import xarray as xr
-from cesium import featurize, time_series
 from cesium.features import dask_feature_graph
-from cesium import featureset
 
 from .base import BaseHandler, AccessError
 from ..models import Dataset, Featureset, Project, File
 from ..config import cfg
+from .. import deltas
+from .. import featureset_cache
+from .. import featurization
+from .. import jobs
+from .. import resources
+from .. import retry
 
 from os.path import join as pjoin
 import uuid
 import datetime
 
 
+@tornado.gen.coroutine
+def _featurize(executor, job):
+    '''Compute the feature set of job `job` (see `jobs.register`).'''
+    fset = Featureset.get(Featureset.id == job.target_id)
+    dataset = Dataset.get(Dataset.id == job.params['dataset_id'])
+
+    uris = dataset.uris
+    featurized, failed = yield featurization.featurize_dataset(
+        executor, uris, fset.features_list, fset.custom_features_script)
+    job.failed_items = failed or None
+    job.save()
+
+    dataset_resources, = yield resources.task_resources(uris)
+
+    def write(pure):
+        fset_data = executor.submit(featurization.assemble_features,
+                                    featurized, pure=pure,
+                                    resources=dataset_resources)
+        future = executor.submit(xr.Dataset.to_netcdf, fset_data,
+                                 fset.file.uri, engine=cfg['xr_engine'],
+                                 pure=pure, resources=dataset_resources)
+        jobs.set_task(job, fset, future.key)
+        return future
+
+    yield retry.result(executor, write)
+
+
+def _featurization_succeeded(job, result):
+    fset = Featureset.get(Featureset.id == job.target_id)
+    fset.task_id = None
+    fset.finished = datetime.datetime.now()
+    fset.save()
+
+    note = "Calculation of featureset '{}' completed.".format(fset.name)
+    if job.failed_items:
+        note += ' {} time series could not be featurized.'.format(
+            len(job.failed_items))
+    return note
+
+
+def _featurization_failed(job, error):
+    fset = Featureset.get(Featureset.id == job.target_id)
+    fset.delete_instance()
+
+    return 'Cannot featurize {}: {}'.format(fset.name, error)
+
+
+jobs.register('featurize', _featurize, _featurization_succeeded,
+              _featurization_failed, Featureset)
+
+
+@tornado.gen.coroutine
+def _evict_from_workers(shared_executor, fset_path):
+    '''Drop the feature set saved at `fset_path` from the caches of the
+    workers (see `featureset_cache`).
+
+    Failures are only logged: since cache entries are keyed by modification
+    time as well as path, a stale entry is never used for another file.
+    '''
+    try:
+        executor = yield shared_executor.get()
+        yield executor._run(featureset_cache.evict, fset_path)
+    except Exception as e:
+        print('[featureset_cache] Could not evict {}: {!r}'.format(
+            fset_path, e))
+
+
 class FeatureHandler(BaseHandler):
     def _get_featureset(self, featureset_id):
         try:
@@ -35,33 +106,6 @@ class FeatureHandler(BaseHandler):
 
         self.success(featureset_info)
 
-    @tornado.gen.coroutine
-    def _await_featurization(self, future, fset):
-        """Note: we cannot use self.error / self.success here.  There is
-        no longer an active, open request by the time this happens!
-        That said, we can push notifications through to the frontend
-        using flow.
-        """
-        try:
-            result = yield future._result()
-
-            fset.task_id = None
-            fset.finished = datetime.datetime.now()
-            fset.save()
-
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={"note": "Calculation of featureset '{}' completed.".format(fset.name)})
-
-        except Exception as e:
-            fset.delete_instance()
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={"note": 'Cannot featurize {}: {}'.format(fset.name, e),
-                                 "type": 'error'})
-            print('Error featurizing:', type(e), e)
-
-        self.action('cesium/FETCH_FEATURESETS')
-
-    @tornado.gen.coroutine
     def post(self):
         data = self.get_json()
         featureset_name = data.get('featuresetName', '')
@@ -78,6 +122,8 @@ class FeatureHandler(BaseHandler):
         if not dataset.is_owned_by(self.get_username()):
             return self.error('Cannot access dataset')
 
+        self.application.job_manager.check_capacity(self.get_username())
+
         fset_path = pjoin(cfg['paths']['features_folder'],
                           '{}_featureset.nc'.format(uuid.uuid4()))
 
@@ -87,31 +133,24 @@ class FeatureHandler(BaseHandler):
                                  features_list=features_to_use,
                                  custom_features_script=None)
 
-        executor = yield self._get_executor()
+        self.application.job_manager.submit(
+            'featurize', fset, self.get_username(),
+            {'dataset_id': dataset.id})
 
-        all_time_series = executor.map(time_series.from_netcdf, dataset.uris)
-        all_features = executor.map(featurize.featurize_single_ts,
-                                    all_time_series,
-                                    features_to_use=features_to_use,
-                                    custom_script_path=custom_script_path)
-        computed_fset = executor.submit(featurize.assemble_featureset,
-                                        all_features, all_time_series)
-        imputed_fset = executor.submit(featureset.Featureset.impute, computed_fset)
-        future = executor.submit(xr.Dataset.to_netcdf, imputed_fset,
-                                 fset_path, engine=cfg['xr_engine'])
-        fset.task_id = future.key
-        fset.save()
-
-        loop = tornado.ioloop.IOLoop.current()
-        loop.spawn_callback(self._await_featurization, future, fset)
-
-        self.success(fset, 'cesium/FETCH_FEATURESETS')
+        self.push_delta(deltas.updated(fset))
+        self.success(fset)
 
     def delete(self, featureset_id):
         f = self._get_featureset(featureset_id)
+        fset_path = f.file.uri
+        delta = deltas.deleted(f)
         f.delete_instance()
+        self.push_delta(delta)
+
+        tornado.ioloop.IOLoop.current().spawn_callback(
+            _evict_from_workers, self.application.executor, fset_path)
 
-        self.success(action='cesium/FETCH_FEATURESETS')
+        self.success()
 
     def put(self, featureset_id):
         f = self._get_featureset(featureset_id)
@@ -1,73 +1,466 @@
 '''Handlers for '/models' route.'''
 
 from .base import BaseHandler, AccessError
-from ..models import Project, Model, Featureset, File
+from ..models import Project, Model, Featureset, File, Job
 from ..ext.sklearn_models import (
     model_descriptions as sklearn_model_descriptions,
     check_model_param_types
     )
-from ..util import robust_literal_eval
+from ..ext import flat_forest
+from ..util import robust_literal_eval, file_checksum
 from ..config import cfg
+from .. import deltas
+from .. import model_io
+from .. import model_search
+from .. import incremental
+from .. import jobs
+from .. import resources
+from .. import retry
 
 from os.path import join as pjoin
+import os
 import uuid
 import datetime
+import hashlib
+import json
+import time
 
-from cesium import build_model, featureset
+import cesium
+import numpy as np
+import sklearn
 import tornado.ioloop
-import joblib
-import xarray as xr
-from distributed.client import _wait
 
 
-def _build_model_compute_statistics(fset_path, model_type, model_params,
-                                    params_to_optimize, model_path):
+# Builds in progress in this process, by model file: a future of the output
+# of `_build_model_compute_statistics`. Models sharing a file (see
+# `ModelHandler.post`) each have a job, but only the first of them to run
+# builds it; the others wait for its result, whatever order the jobs are
+# started in (e.g. after `JobManager.reconcile`)
+_builds_in_progress = {}
+
+
+def _model_fingerprint(fset_checksum, model_type, model_params,
+                       params_to_optimize, search_options, flatten,
+                       incremental=False):
+    '''Fingerprint of a model build: two builds with the same fingerprint
+    produce the same model.
+
+    Parameters
+    ----------
+    fset_checksum : str
+        Checksum of the feature set file.
+    model_type : str
+        Type of model to be built, e.g. 'RandomForestClassifier'.
+    model_params : dict
+        Hyperparameters passed to the model constructor as-is (including
+        `random_state`, if any).
+    params_to_optimize : dict
+        Grid of hyperparameter values to search.
+    search_options : dict
+        Hyperparameter search options (see `model_search.search_params`).
+    flatten : bool
+        Whether a flattened copy of the model is saved.
+    incremental : bool, optional
+        Whether the model is trained incrementally.
+
+    Returns
+    -------
+    str or None
+        SHA-256 hash of all of the above and of the versions of the libraries
+        used to build the model, or None if the model is randomized but no
+        `random_state` is given, since such builds are not reproducible.
+    '''
+    if ('random_state' in model_search.make_model(model_type, {}).get_params()
+            and model_params.get('random_state') is None):
+        return None
+    spec = {'featureset': fset_checksum, 'model_type': model_type,
+            'model_params': model_params,
+            'params_to_optimize': params_to_optimize,
+            'search_options': search_options, 'flatten': bool(flatten),
+            'incremental': bool(incremental),
+            'versions': {'cesium': cesium.__version__,
+                         'sklearn': sklearn.__version__,
+                         'numpy': np.__version__}}
+    spec = json.dumps(spec, sort_keys=True, default=repr)
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+
+def _save_model(computed_model, model_path, flat_model_path=None):
+    '''Save model and, if it is a random forest/extra trees model and
+    `flat_model_path` is given, a flattened copy of it (see
+    `ext.flat_forest`), compressed according to ``cfg['models']['compress']``.
+
+    Returns
+    -------
+    flat_model_path : str or None
+        Path of the flattened model, or None if none was saved.
+    artifact_stats : dict
+        `artifact_size`, the total size of the saved files in bytes;
+        `save_time`, the time taken to save them; and `load_time`, the time
+        taken to load the model used for predictions, in seconds.
+    '''
+    compress = cfg['models']['compress']
+    start = time.time()
+    artifact_size = model_io.save_model(computed_model, model_path, compress)
+    if flat_model_path and flat_forest.is_flattenable(computed_model):
+        artifact_size += model_io.save_model(
+            flat_forest.flatten_forest(computed_model), flat_model_path,
+            compress)
+    else:
+        flat_model_path = None
+    save_time = time.time() - start
+
+    start = time.time()
+    model_io.load_model(flat_model_path or model_path, cache=False)
+    load_time = time.time() - start
+
+    return flat_model_path, {'artifact_size': artifact_size,
+                             'save_time': save_time, 'load_time': load_time}
+
+
+def _build_model_compute_statistics(training_data, model_type, model_params,
+                                    best_params, model_path,
+                                    flat_model_path=None):
     '''Build model and return summary statistics.
 
     Parameters
     ----------
-    fset_path : str
-        Path to feature set NetCDF file.
+    training_data : (pandas.DataFrame, numpy.ndarray) tuple
+        Features and targets, as returned by
+        `model_search.load_training_data`.
     model_type : str
         Type of model to be built, e.g. 'RandomForestClassifier'.
     model_params : dict
         Dictionary with hyperparameter values to be used in model building.
         Keys are parameter names, values are the associated parameter values.
-        These hyperparameters will be passed to the model constructor as-is
-        (for hyperparameter optimization, see `params_to_optimize`).
-    params_to_optimize : dict or list of dict
-        During hyperparameter optimization, various model parameters
-        are adjusted to give an optimal fit. This dictionary gives the
-        different values that should be explored for each parameter. E.g.,
-        `{'alpha': [1, 2], 'beta': [4, 5, 6]}` would fit models on all
-        6 combinations of alpha and beta and compare the resulting models'
-        goodness-of-fit. If None, only those hyperparameters specified in
-        `model_parameters` will be used (passed to model constructor as-is).
+        These hyperparameters will be passed to the model constructor as-is.
+    best_params : dict
+        Best values of the optimized hyperparameters, as found by
+        `model_search.search_params` (empty if no hyperparameter optimization
+        was performed). These are combined with `model_params`.
     model_path : str
         Path indicating where serialized model will be saved.
+    flat_model_path : str, optional
+        If given, and the model is a random forest/extra trees model, also
+        save a flattened copy of the model (see `ext.flat_forest`) to this
+        path.
 
     Returns
     -------
     score : float
         The model's training score.
     best_params : dict
-        Dictionary of best hyperparameter values (keys are parameter names,
-        values are the corresponding best values) determined by `scikit-learn`'s
-        `GridSearchCV`. If no hyperparameter optimization is performed (i.e.
-        `params_to_optimize` is None or is an empty dict, this will be an empty
-        dict.
+        `best_params`, as passed in.
+    flat_model_path : str or None
+        Path of the flattened model, or None if none was saved.
+    artifact_stats : dict
+        Size and save/load times of the saved model files (see
+        `_save_model`).
     '''
-    fset = featureset.from_netcdf(fset_path, engine=cfg['xr_engine'])
-    computed_model = build_model.build_model_from_featureset(
-        featureset=fset, model_type=model_type,
-        model_parameters=model_params,
-        params_to_optimize=params_to_optimize)
-    score = build_model.score_model(computed_model, fset)
-    best_params = computed_model.best_params_ if params_to_optimize else {}
-    joblib.dump(computed_model, model_path)
-    fset.close()
+    X, y = training_data
+    computed_model = model_search.fit_model(training_data, model_type,
+                                            dict(model_params, **best_params))
+    score = computed_model.score(X, y)
+    flat_model_path, artifact_stats = _save_model(computed_model, model_path,
+                                                  flat_model_path)
 
-    return score, best_params
+    return score, best_params, flat_model_path, artifact_stats
+
+
+def _build_incremental_model_compute_statistics(fset_path, model_type,
+                                                model_params, model_path):
+    '''Build model incrementally, without loading the whole feature set
+    into memory (see `incremental.fit_incremental`), and return summary
+    statistics.
+
+    Parameters
+    ----------
+    fset_path : str
+        Path to feature set NetCDF file.
+    model_type : str
+        Type of model to be built, e.g. 'LinearSGDClassifier'.
+    model_params : dict
+        Dictionary with hyperparameter values to be passed to the model
+        constructor.
+    model_path : str
+        Path indicating where serialized model will be saved.
+
+    Returns
+    -------
+    score : float
+        The model's training score.
+    best_params : dict
+        Always empty, since no hyperparameter optimization is performed.
+    flat_model_path : None
+        No flattened model is saved.
+    artifact_stats : dict
+        Size and save/load times of the saved model file (see
+        `_save_model`).
+    cv_metrics : None
+        Cross-validation metrics are not computed, since they would require
+        several more passes over the feature set.
+    '''
+    computed_model, score = incremental.fit_incremental(
+        fset_path, model_type, model_params,
+        n_passes=cfg['models']['incremental_passes'],
+        chunk_size=cfg['models']['incremental_chunk_size'],
+        shuffle_chunks=cfg['models']['incremental_shuffle_chunks'],
+        engine=cfg['xr_engine'])
+    flat_model_path, artifact_stats = _save_model(computed_model, model_path)
+
+    return score, {}, flat_model_path, artifact_stats, None
+
+
+def _grow_model_compute_statistics(training_data, parent_path, n_estimators,
+                                   model_path, flat_model_path=None):
+    '''Add estimators to an ensemble model and return summary statistics.
+
+    The parent model is refit with `warm_start` enabled, so that only the
+    additional estimators are trained.
+
+    Parameters
+    ----------
+    training_data : (pandas.DataFrame, numpy.ndarray) tuple
+        Features and targets the parent model was trained on, as returned by
+        `model_search.load_training_data`.
+    parent_path : str
+        Path to serialized parent model.
+    n_estimators : int
+        Total number of estimators of the grown model.
+    model_path : str
+        Path indicating where serialized model will be saved.
+    flat_model_path : str, optional
+        If given, and the model is a random forest/extra trees model, also
+        save a flattened copy of the model (see `ext.flat_forest`) to this
+        path.
+
+    Returns
+    -------
+    score : float
+        The model's training score.
+    params : dict
+        Updated hyperparameters, i.e. `{'n_estimators': n_estimators}`.
+    flat_model_path : str or None
+        Path of the flattened model, or None if none was saved.
+    artifact_stats : dict
+        Size and save/load times of the saved model files (see
+        `_save_model`).
+    cv_metrics : None
+        Cross-validation metrics are not computed, since they would require
+        fitting the whole forest once per fold.
+    '''
+    X, y = training_data
+    # Not from the cache, since the model is modified in place
+    computed_model = model_io.load_model(parent_path, mmap_mode=None,
+                                         cache=False)
+    computed_model = getattr(computed_model, 'best_estimator_', computed_model)
+    if n_estimators <= len(computed_model.estimators_):
+        raise ValueError('Number of estimators must be larger than {}'.format(
+            len(computed_model.estimators_)))
+    computed_model.set_params(warm_start=True, n_estimators=n_estimators)
+    computed_model.fit(X, y)
+    computed_model.set_params(warm_start=False)
+    score = computed_model.score(X, y)
+    flat_model_path, artifact_stats = _save_model(computed_model, model_path,
+                                                  flat_model_path)
+
+    return (score, {'n_estimators': n_estimators}, flat_model_path,
+            artifact_stats, None)
+
+
+@tornado.gen.coroutine
+def _search_and_build_model(executor, job, model, training_data,
+                            model_params, params_to_optimize, search_options,
+                            flat_model_path, fit_resources=None):
+    '''Search for the best hyperparameters (if any are to be optimized)
+    across the cluster, then fit and save the final model while computing
+    its cross-validation metrics.
+
+    Returns the output of `_build_model_compute_statistics`, followed by the
+    output of `model_search.cross_validation_metrics`. Each fit is submitted
+    with `fit_resources` (see `cesium_app.resources`).'''
+    if params_to_optimize:
+        best_params, _ = yield model_search.search_params(
+            executor, training_data, model.type, model_params,
+            params_to_optimize, resources=fit_resources, **search_options)
+    else:
+        best_params = {}
+
+    cv_metrics_future = model_search.cross_validation_metrics(
+        executor, training_data, model.type, dict(model_params, **best_params),
+        resources=fit_resources)
+
+    def build(pure):
+        future = executor.submit(_build_model_compute_statistics,
+                                 training_data, model.type, model_params,
+                                 best_params, model.file.uri, flat_model_path,
+                                 pure=pure, resources=fit_resources)
+        jobs.set_task(job, model, future.key)
+        return future
+
+    result = yield retry.result(executor, build)
+    cv_metrics = yield cv_metrics_future
+    return result + (cv_metrics,)
+
+
+@tornado.gen.coroutine
+def _build_model(executor, job):
+    '''Build the model of job `job` (see `jobs.register`), unless the
+    identical build it shares its files with is in progress or finished.'''
+    model = Model.get(Model.id == job.target_id)
+    model_path = model.file.uri
+    in_progress = _builds_in_progress.get(model_path)
+    if in_progress is not None:
+        result = yield in_progress
+        return result
+
+    # The build this model shares its files with may have finished while
+    # this job was queued
+    built = (Model.select()
+             .where(Model.file == model.file, Model.id != model.id,
+                    Model.finished.is_null(False))
+             .first())
+    if built is not None:
+        return (built.train_score, dict(built.params),
+                built.flat_file.uri if built.flat_file else None,
+                {'artifact_size': built.artifact_size,
+                 'save_time': built.save_time,
+                 'load_time': built.load_time},
+                built.cv_metrics)
+
+    params = job.params
+    fset_path = model.featureset.file.uri
+
+    @tornado.gen.coroutine
+    def build_model():
+        if params['incremental']:
+            # Only a few chunks of the feature set are in memory at a time
+            build_resources, = yield resources.task_resources([])
+
+            def build(pure):
+                future = executor.submit(
+                    _build_incremental_model_compute_statistics, fset_path,
+                    model.type, params['model_params'], model.file.uri,
+                    pure=pure, resources=build_resources)
+                jobs.set_task(job, model, future.key)
+                return future
+
+            result = yield retry.result(executor, build)
+        else:
+            # Loaded once, and shared by all fits of the hyperparameter
+            # search
+            fit_resources, = yield resources.task_resources([fset_path])
+
+            def load(pure):
+                future = executor.submit(model_search.load_training_data,
+                                         fset_path, cfg['xr_engine'],
+                                         pure=pure, resources=fit_resources)
+                jobs.set_task(job, model, future.key)
+                return future
+
+            # Retried here, since the retries of the fits depending on it
+            # would only resubmit the fits
+            training_data = yield retry.wait(load)
+            result = yield _search_and_build_model(
+                executor, job, model, training_data, params['model_params'],
+                params['params_to_optimize'], params['search_options'],
+                params['flat_model_path'], fit_resources)
+        return result
+
+    # Registered before yielding, so that no other job writes the same file
+    model_stats_future = build_model()
+    _builds_in_progress[model_path] = model_stats_future
+    model_stats_future.add_done_callback(
+        lambda f: _builds_in_progress.pop(model_path, None))
+
+    result = yield model_stats_future
+    return result
+
+
+@tornado.gen.coroutine
+def _grow_model(executor, job):
+    '''Grow the parent of the model of job `job` (see `jobs.register`).'''
+    try:
+        model = Model.get(Model.id == job.target_id)
+    except Model.DoesNotExist:
+        _release_parent(job)
+        raise
+    params = job.params
+    fset_path = model.featureset.file.uri
+    load_resources, grow_resources = yield resources.task_resources(
+        [fset_path], [fset_path, params['parent_path']])
+
+    def load(pure):
+        return executor.submit(model_search.load_training_data, fset_path,
+                               cfg['xr_engine'], pure=pure,
+                               resources=load_resources)
+
+    def grow(pure):
+        future = executor.submit(
+            _grow_model_compute_statistics, training_data,
+            params['parent_path'], params['n_estimators'], model.file.uri,
+            params['flat_model_path'], pure=pure, resources=grow_resources)
+        jobs.set_task(job, model, future.key)
+        return future
+
+    try:
+        training_data = yield retry.wait(load)
+        result = yield retry.result(executor, grow)
+    finally:
+        _release_parent(job)
+    return result
+
+
+def _release_parent(job):
+    """Drop the reference to the parent model file taken by
+    `ModelHandler._grow`, if it is still held."""
+    if job.params.pop('parent_retained', False):
+        job.save()
+        File.get(File.uri == job.params['parent_path']).release()
+
+
+def _model_built(job, result):
+    model = Model.get(Model.id == job.target_id)
+    (score, best_params, flat_model_path, artifact_stats,
+     cv_metrics) = result
+
+    if flat_model_path is not None:
+        model.flat_file = File.share(flat_model_path)
+    model.task_id = None
+    model.finished = datetime.datetime.now()
+    model.train_score = score
+    model.params.update(best_params)
+    model.artifact_size = artifact_stats['artifact_size']
+    model.save_time = artifact_stats['save_time']
+    model.load_time = artifact_stats['load_time']
+    model.cv_metrics = cv_metrics
+    model.save()
+
+    return "Model '{}' computed.".format(model.name)
+
+
+def _model_build_failed(job, error):
+    model = Model.get(Model.id == job.target_id)
+    model.delete_instance()
+
+    return "Cannot create model '{}': {}".format(model.name, error)
+
+
+def _model_grow_failed(job, error):
+    _release_parent(job)
+    return _model_build_failed(job, error)
+
+
+def _job_message(job):
+    if job.state == 'queued':
+        return "Model training queued."
+    return "Model training begun."
+
+
+jobs.register('build_model', _build_model, _model_built, _model_build_failed,
+              Model)
+jobs.register('grow_model', _grow_model, _model_built, _model_grow_failed,
+              Model)
 
 
 class ModelHandler(BaseHandler):
@@ -92,29 +485,101 @@ class ModelHandler(BaseHandler):
         return self.success(model_info)
 
     @tornado.gen.coroutine
-    def _await_model_statistics(self, model_stats_future, model):
-        try:
-            score, best_params = yield model_stats_future._result()
-
-            model.task_id = None
-            model.finished = datetime.datetime.now()
-            model.train_score = score
-            model.params.update(best_params)
-            model.save()
+    def _featureset_checksum(self, executor, fset):
+        '''Checksum of the feature set file, computed once on the cluster.'''
+        checksum = fset.file.checksum
+        if checksum is None:
+            checksum = yield executor.submit(file_checksum,
+                                             fset.file.uri)._result()
+            File.update(checksum=checksum).where(
+                File.uri == fset.file.uri).execute()
+        return checksum
+
+    def _reuse_model(self, model, model_name, fset):
+        '''Create a model of feature set `fset` that shares the files of the
+        finished `model`.'''
+        model.file.retain()
+        if model.flat_file is not None:
+            model.flat_file.retain()
+        return Model.create(name=model_name, file=model.file,
+                            flat_file=model.flat_file, featureset=fset,
+                            project=fset.project, params=dict(model.params),
+                            type=model.type,
+                            train_score=model.train_score,
+                            artifact_size=model.artifact_size,
+                            save_time=model.save_time,
+                            load_time=model.load_time,
+                            cv_metrics=model.cv_metrics,
+                            fingerprint=model.fingerprint,
+                            finished=datetime.datetime.now())
+
+    def _new_model_paths(self):
+        '''Paths of the model file and flattened model file (or None) of a
+        new model.'''
+        model_uuid = uuid.uuid4()
+        model_path = pjoin(cfg['paths']['models_folder'],
+                           '{}_model.pkl'.format(model_uuid))
+        if cfg['models']['flatten_forests']:
+            flat_model_path = pjoin(cfg['paths']['models_folder'],
+                                    '{}_model_flat.pkl'.format(model_uuid))
+        else:
+            flat_model_path = None
+        return model_path, flat_model_path
+
+    def _grow(self, model_id):
+        '''Add estimators to an existing ensemble model, saving the result as
+        a new model.'''
+        parent = self._get_model(model_id)
+        if parent.finished is None:
+            return self.error('Cannot grow model that is still being built')
+        # Only ensembles can be grown, e.g. SGD models also take `warm_start`
+        # but have no estimators to add
+        default_params = model_search.make_model(parent.type, {}).get_params()
+        if not {'warm_start', 'n_estimators'} <= set(default_params):
+            return self.error('Model type {} cannot be grown'.format(
+                parent.type))
 
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={"note": "Model '{}' computed.".format(model.name)})
+        data = self.get_json()
+        try:
+            n_estimators = int(data['nEstimators'])
+        except (KeyError, TypeError, ValueError):
+            return self.error('Number of estimators must be an integer')
+        # Missing or None if the model was built with the default
+        current_n_estimators = parent.params.get('n_estimators')
+        if current_n_estimators is None:
+            current_n_estimators = default_params['n_estimators']
+        if n_estimators <= current_n_estimators:
+            return self.error('Number of estimators must be larger than {}'
+                              .format(current_n_estimators))
+
+        self.application.job_manager.check_capacity(self.get_username())
+
+        fset = parent.featureset
+        model_path, flat_model_path = self._new_model_paths()
+        model_name = data.get('modelName') or '{} ({} estimators)'.format(
+            parent.name, n_estimators)
+        model = Model.create(name=model_name, file=File.create(uri=model_path),
+                             featureset=fset, project=fset.project,
+                             params=dict(parent.params,
+                                         n_estimators=n_estimators),
+                             type=parent.type, parent=parent)
 
-        except Exception as e:
-            model.delete_instance()
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={"note": "Cannot create model '{}': {}".format(model.name, e),
-                                 "type": 'error'})
+        # Keep the parent model file until the job is done, even if the
+        # parent is deleted in the meantime (see `_release_parent`)
+        parent.file.retain()
+        job = self.application.job_manager.submit(
+            'grow_model', model, self.get_username(),
+            {'parent_path': parent.file.uri, 'n_estimators': n_estimators,
+             'flat_model_path': flat_model_path, 'parent_retained': True})
 
-        self.action('cesium/FETCH_MODELS')
+        self.push_delta(deltas.updated(model))
+        return self.success(data={'message': _job_message(job)})
 
     @tornado.gen.coroutine
-    def post(self):
+    def post(self, model_id=None, action=None):
+        if action == 'grow':
+            return self._grow(model_id)
+
         data = self.get_json()
 
         model_name = data.pop('modelName')
@@ -134,35 +599,75 @@ class ModelHandler(BaseHandler):
         model_params = {k: robust_literal_eval(v)
                         for k, v in model_params.items()}
 
-        model_params, params_to_optimize = check_model_param_types(model_type,
-                                                                   model_params)
+        (model_params, params_to_optimize,
+         search_options) = check_model_param_types(model_type, model_params,
+                                                   return_search_options=True)
         model_type = model_type.split()[0]
-        model_path = pjoin(cfg['paths']['models_folder'],
-                           '{}_model.pkl'.format(uuid.uuid4()))
-
-        model_file = File.create(uri=model_path)
-        model = Model.create(name=model_name, file=model_file,
-                             featureset=fset, project=fset.project,
-                             params=model_params, type=model_type)
+        model_path, flat_model_path = self._new_model_paths()
 
         executor = yield self._get_executor()
 
-        model_stats_future = executor.submit(
-            _build_model_compute_statistics, fset.file.uri, model_type,
-            model_params, params_to_optimize, model_path)
-
-        model.task_id = model_stats_future.key
-        model.save()
-
-        loop = tornado.ioloop.IOLoop.current()
-        loop.spawn_callback(self._await_model_statistics, model_stats_future, model)
-
-        return self.success(data={'message': "Model training begun."},
-                            action='cesium/FETCH_MODELS')
+        # Hyperparameter searches need the whole feature set in memory
+        train_incrementally = (not params_to_optimize and
+                               incremental.use_incremental_training(
+                                   model_type, fset.file.uri))
+
+        fset_checksum = yield self._featureset_checksum(executor, fset)
+        fingerprint = _model_fingerprint(fset_checksum, model_type,
+                                         model_params, params_to_optimize,
+                                         search_options, flat_model_path,
+                                         train_incrementally)
+
+        # Reuse an identical finished model...
+        identical_models = (Model.select()
+                            .where(Model.fingerprint == fingerprint)
+                            .where(Model.finished.is_null(False))
+                            if fingerprint is not None else [])
+        for identical_model in identical_models:
+            if os.path.exists(identical_model.file.uri):
+                model = self._reuse_model(identical_model, model_name, fset)
+                self.push_delta(deltas.updated(model))
+                return self.success(
+                    data={'message': "Model reused from identical build."})
+
+        self.application.job_manager.check_capacity(self.get_username())
+
+        # ...or share the files of an identical build queued or in progress
+        building_job = (Job.select()
+                        .join(Model, on=(Job.target_id == Model.id))
+                        .where(Job.type == 'build_model',
+                               Model.fingerprint == fingerprint,
+                               Model.finished.is_null())
+                        .first()
+                        if fingerprint is not None else None)
+        if building_job is not None:
+            model_file = File.share(
+                Model.get(Model.id == building_job.target_id).file.uri)
+            flat_model_path = building_job.params['flat_model_path']
+            message = "Waiting for identical model build."
+        else:
+            model_file = File.create(uri=model_path)
+            message = None
 
+        model = Model.create(name=model_name, file=model_file,
+                             featureset=fset, project=fset.project,
+                             params=dict(model_params, **search_options),
+                             type=model_type, fingerprint=fingerprint)
+        job = self.application.job_manager.submit(
+            'build_model', model, self.get_username(),
+            {'model_params': model_params,
+             'params_to_optimize': params_to_optimize,
+             'search_options': search_options,
+             'flat_model_path': flat_model_path,
+             'incremental': train_incrementally})
+
+        self.push_delta(deltas.updated(model))
+        return self.success(data={'message': message or _job_message(job)})
 
     def delete(self, model_id):
         m = self._get_model(model_id)
+        delta = deltas.deleted(m)
         m.delete_instance()
 
-        return self.success(action='cesium/FETCH_MODELS')
+        self.push_delta(delta)
+        return self.success()
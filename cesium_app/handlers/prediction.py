@@ -2,19 +2,25 @@ from .base import BaseHandler, AccessError
 from ..models import Prediction, File, Dataset, Model, Project
 from ..config import cfg
 from .. import util
+from .. import binary_io
+from .. import model_io
+from .. import prediction_store
+from .. import deltas
+from .. import featurization
+from .. import jobs
+from .. import resources
+from .. import retry
+from ..json_util import dataset_row_to_dict
 
 import tornado.gen
 from tornado.web import RequestHandler
 from tornado.escape import json_decode
 
-import cesium.time_series
 import cesium.featurize
 import cesium.predict
 import cesium.featureset
 from cesium.features import CADENCE_FEATS, GENERAL_FEATS, LOMB_SCARGLE_FEATS
 
-import xarray as xr
-import joblib
 from os.path import join as pjoin
 import uuid
 import datetime
@@ -22,6 +28,78 @@ import os
 import tempfile
 
 
+def _model_predictions(fset, model_path):
+    '''Load model from `model_path` and compute its predictions for `fset`.
+
+    The model is loaded inside the task (rather than passed in as the result
+    of another task) so that each worker memory-maps its own copy; see
+    `model_io.load_model`.
+    '''
+    model = model_io.load_model(model_path)
+    return cesium.predict.model_predictions(fset, model)
+
+
+@tornado.gen.coroutine
+def _predict(executor, job):
+    '''Compute the predictions of job `job` (see `jobs.register`).'''
+    prediction = Prediction.get(Prediction.id == job.target_id)
+    dataset = prediction.dataset
+    model = prediction.model
+    fset = model.featureset
+
+    uris = dataset.uris
+    featurized, failed = yield featurization.featurize_dataset(
+        executor, uris, fset.features_list, fset.custom_features_script)
+    job.failed_items = failed or None
+    job.save()
+
+    dataset_resources, model_resources = yield resources.task_resources(
+        uris, [model.prediction_uri])
+
+    def predict(pure):
+        fset_data = executor.submit(featurization.assemble_features,
+                                    featurized, pure=pure,
+                                    resources=dataset_resources)
+        predset = executor.submit(_model_predictions, fset_data,
+                                  model.prediction_uri, pure=pure,
+                                  resources=model_resources)
+        future = executor.submit(prediction_store.write_prediction, predset,
+                                 prediction.file.uri,
+                                 prediction.index_file.uri, cfg['xr_engine'],
+                                 job.params['top_k'], pure=pure,
+                                 resources=dataset_resources)
+        jobs.set_task(job, prediction, future.key)
+        return future
+
+    yield retry.result(executor, predict)
+
+
+def _prediction_succeeded(job, result):
+    prediction = Prediction.get(Prediction.id == job.target_id)
+    prediction.task_id = None
+    prediction.finished = datetime.datetime.now()
+    prediction.save()
+
+    note = "Prediction '{}/{}' completed.".format(prediction.dataset.name,
+                                                   prediction.model.name)
+    if job.failed_items:
+        note += ' {} time series could not be featurized.'.format(
+            len(job.failed_items))
+    return note
+
+
+def _prediction_failed(job, error):
+    prediction = Prediction.get(Prediction.id == job.target_id)
+    prediction.delete_instance()
+
+    return ("Prediction '{}/{}' failed with error {}. Please try again."
+            .format(prediction.dataset.name, prediction.model.name, error))
+
+
+jobs.register('predict', _predict, _prediction_succeeded, _prediction_failed,
+              Prediction)
+
+
 class PredictionHandler(BaseHandler):
     def _get_prediction(self, prediction_id):
         try:
@@ -34,36 +112,6 @@ class PredictionHandler(BaseHandler):
 
         return d
 
-    @tornado.gen.coroutine
-    def _await_prediction(self, future, prediction):
-        try:
-            result = yield future._result()
-
-            prediction.task_id = None
-            prediction.finished = datetime.datetime.now()
-            prediction.save()
-
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={
-                            "note": "Prediction '{}/{}' completed.".format(
-                                prediction.dataset.name,
-                                prediction.model.name)
-                            })
-
-        except Exception as e:
-            prediction.delete_instance()
-            self.action('cesium/SHOW_NOTIFICATION',
-                        payload={
-                            "note": "Prediction '{}/{}'" " failed "
-                            "with error {}. Please try again.".format(
-                                prediction.dataset.name,
-                                prediction.model.name, e),
-                             "type": "error"
-                            })
-
-        self.action('cesium/FETCH_PREDICTIONS')
-
-    @tornado.gen.coroutine
     def post(self):
         data = self.get_json()
 
@@ -82,40 +130,42 @@ class PredictionHandler(BaseHandler):
         if (model.finished is None) or (fset.finished is None):
             return self.error('Computation of model or feature set still in progress')
 
+        top_k = cfg['predictions']['top_k']
+        if 'topK' in data:
+            try:
+                top_k = int(data['topK'])
+            except (TypeError, ValueError):
+                top_k = 0
+            if top_k < 1:
+                return self.error(
+                    'Number of top classes must be a positive integer')
+
+        self.application.job_manager.check_capacity(username)
+
+        prediction_uuid = uuid.uuid4()
         prediction_path = pjoin(cfg['paths']['predictions_folder'],
-                                '{}_prediction.nc'.format(uuid.uuid4()))
+                                '{}_prediction.nc'.format(prediction_uuid))
+        index_path = pjoin(cfg['paths']['predictions_folder'],
+                           '{}_prediction_index.npy'.format(prediction_uuid))
         prediction_file = File.create(uri=prediction_path)
-        prediction = Prediction.create(file=prediction_file, dataset=dataset,
+        index_file = File.create(uri=index_path)
+        prediction = Prediction.create(file=prediction_file,
+                                       index_file=index_file, dataset=dataset,
                                        project=dataset.project, model=model)
 
-        executor = yield self._get_executor()
-
-        all_time_series = executor.map(cesium.time_series.from_netcdf,
-                                       dataset.uris)
-        all_features = executor.map(cesium.featurize.featurize_single_ts,
-                                    all_time_series,
-                                    features_to_use=fset.features_list,
-                                    custom_script_path=fset.custom_features_script)
-        fset_data = executor.submit(cesium.featurize.assemble_featureset,
-                                    all_features, all_time_series)
-        fset_data = executor.submit(cesium.featureset.Featureset.impute, fset_data)
-        model_data = executor.submit(joblib.load, model.file.uri)
-        predset = executor.submit(cesium.predict.model_predictions,
-                                  fset_data, model_data)
-        future = executor.submit(xr.Dataset.to_netcdf, predset,
-                                 prediction_path, engine=cfg['xr_engine'])
-
-        prediction.task_id = future.key
-        prediction.save()
+        self.application.job_manager.submit(
+            'predict', prediction, username, {'top_k': top_k})
 
-        loop = tornado.ioloop.IOLoop.current()
-        loop.spawn_callback(self._await_prediction, future, prediction)
-
-        return self.success(prediction.display_info(), 'cesium/FETCH_PREDICTIONS')
+        self.push_delta(deltas.updated(prediction))
+        return self.success(prediction.display_info())
 
     def get(self, prediction_id=None, action=None):
         if action == 'download':
-            prediction = cesium.featureset.from_netcdf(self._get_prediction(prediction_id).file.uri)
+            prediction = self._get_prediction(prediction_id)
+            if prediction.finished is None:
+                return self.error('Prediction still in progress')
+
+            prediction = cesium.featureset.from_netcdf(prediction.file.uri)
             with tempfile.NamedTemporaryFile() as tf:
                 util.prediction_to_csv(prediction, tf.name)
                 with open(tf.name) as f:
@@ -123,6 +173,22 @@ class PredictionHandler(BaseHandler):
                     self.set_header("Content-Disposition",
                                     "attachment; filename=cesium_prediction_results.csv")
                     self.write(f.read())
+        elif action == 'results':
+            prediction = self._get_prediction(prediction_id)
+            if prediction.finished is None:
+                return self.error('Prediction still in progress')
+
+            name = self.get_argument('name')
+            index_path = (prediction.index_file.uri
+                          if prediction.index_file is not None else None)
+            try:
+                result = prediction_store.load_prediction_row(
+                    prediction.file.uri, name, index_path,
+                    engine=cfg['xr_engine'])
+            except KeyError:
+                return self.error('No such time series: {}'.format(name))
+
+            return self.success(dataset_row_to_dict(result))
         else:
             if prediction_id is None:
                 predictions = [prediction
@@ -137,21 +203,48 @@ class PredictionHandler(BaseHandler):
 
     def delete(self, prediction_id):
         prediction = self._get_prediction(prediction_id)
+        delta = deltas.deleted(prediction)
         prediction.delete_instance()
-        return self.success(action='cesium/FETCH_PREDICTIONS')
+        self.push_delta(delta)
+        return self.success()
 
 
 class PredictRawDataHandler(BaseHandler):
+    def _get_ts_data(self):
+        """Read time series from the request body (if it is in one of the
+        binary formats of `binary_io`) or else from the `ts_data` argument.
+        """
+        content_type = self.request.headers.get('Content-Type', '')
+        content_type = content_type.split(';')[0].strip()
+        if content_type in binary_io.CONTENT_TYPES:
+            return binary_io.decode_ts_data(self.request.body, content_type)
+        else:
+            return json_decode(self.get_argument('ts_data'))
+
     def post(self):
-        ts_data = json_decode(self.get_argument('ts_data'))
+        try:
+            ts_data = self._get_ts_data()
+        except ValueError as e:
+            return self.error('Invalid time series data: {}'.format(e))
         model_id = json_decode(self.get_argument('modelID'))
         meta_feats = json_decode(
             self.get_argument('meta_features', 'null'))
         impute_kwargs = json_decode(
             self.get_argument('impute_kwargs', '{}'))
+        top_k = self.get_argument('top_k', None)
+        if top_k is None:
+            top_k = cfg['predictions']['top_k']
+        else:
+            try:
+                top_k = int(top_k)
+            except ValueError:
+                top_k = 0
+            if top_k < 1:
+                return self.error(
+                    'Number of top classes must be a positive integer')
 
         model = Model.get(Model.id == model_id)
-        computed_model = joblib.load(model.file.uri)
+        computed_model = model_io.load_model(model.prediction_uri)
         features_to_use = model.featureset.features_list
 
         fset_data = cesium.featurize.featurize_time_series(
@@ -159,6 +252,11 @@ class PredictRawDataHandler(BaseHandler):
         fset = cesium.featureset.Featureset(fset_data).impute(**impute_kwargs)
 
         predset = cesium.predict.model_predictions(fset, computed_model)
+        predset = prediction_store.top_k_predictions(predset, top_k)
         predset['name'] = predset.name.astype('str')
 
-        return self.success(predset)
+        if binary_io.NPZ_CONTENT_TYPE in self.request.headers.get('Accept', ''):
+            self.set_header('Content-Type', binary_io.NPZ_CONTENT_TYPE)
+            return self.write(binary_io.encode_predset(predset))
+        else:
+            return self.success(predset)
@@ -1,5 +1,6 @@
 from .base import BaseHandler, AccessError
 from ..models import Project
+from .. import deltas
 
 
 class ProjectHandler(BaseHandler):
@@ -30,7 +31,8 @@ class ProjectHandler(BaseHandler):
                            data.get('projectDescription', ''),
                            self.get_username())
 
-        return self.success({"id": p.id}, 'cesium/FETCH_PROJECTS')
+        self.push_delta(deltas.updated(p))
+        return self.success({"id": p.id})
 
     def put(self, project_id):
         # This ensures that the user has access to the project they
@@ -44,10 +46,13 @@ class ProjectHandler(BaseHandler):
             ).where(Project.id == project_id)
         query.execute()
 
-        return self.success(action='cesium/FETCH_PROJECTS')
+        self.push_delta(deltas.updated(self._get_project(project_id)))
+        return self.success()
 
     def delete(self, project_id):
         p = self._get_project(project_id)
+        delta = deltas.deleted(p)
         p.delete_instance()
 
-        return self.success(action='cesium/FETCH_PROJECTS')
+        self.push_delta(delta)
+        return self.success()
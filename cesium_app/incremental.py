@@ -0,0 +1,153 @@
+'''Out-of-core training of models that support `partial_fit`.
+
+Instead of loading the whole feature set into memory, the feature set NetCDF
+file is read in chunks of consecutive rows. In each pass over the data, the
+chunks are visited in random order, and the rows of a few chunks at a time
+are shuffled together before being passed on to `partial_fit` in batches,
+so that at most ``shuffle_chunks * chunk_size`` rows are held in memory.
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from cesium.featureset import Featureset
+from sklearn.base import is_classifier
+
+from .config import cfg
+from . import model_search
+
+
+__all__ = ['supports_partial_fit', 'use_incremental_training',
+           'iter_chunks', 'fit_incremental']
+
+
+def supports_partial_fit(model_type):
+    """Check whether models of type `model_type` can be trained
+    incrementally."""
+    return hasattr(model_search.make_model(model_type, {}), 'partial_fit')
+
+
+def use_incremental_training(model_type, fset_path):
+    """Check whether a model of type `model_type` should be trained
+    incrementally on the feature set at `fset_path`, i.e. whether it supports
+    `partial_fit` and the feature set file is larger than
+    ``cfg['models']['incremental_min_size_mb']``.
+    """
+    min_size = cfg['models']['incremental_min_size_mb'] * 2 ** 20
+    return (supports_partial_fit(model_type) and
+            os.path.getsize(fset_path) > min_size)
+
+
+def _read_rows(fset, start, stop):
+    """Read features and targets of rows `start:stop` of feature set
+    `fset`."""
+    rows = Featureset(fset.isel(name=slice(start, stop)).load())
+    return rows.to_dataframe(), rows['target'].values
+
+
+def iter_chunks(fset, chunk_size, shuffle_chunks=1, random_state=None):
+    """Iterate over the features and targets of an (unloaded) feature set in
+    chunks of `chunk_size` rows.
+
+    Parameters
+    ----------
+    fset : xarray.Dataset
+        Feature set, as opened with `xarray.open_dataset`.
+    chunk_size : int
+        Number of rows per chunk.
+    shuffle_chunks : int, optional
+        Number of chunks whose rows are shuffled together.
+    random_state : numpy.random.RandomState, optional
+        Random number generator used to shuffle chunks and rows. If None,
+        rows are returned in order.
+
+    Yields
+    ------
+    (pandas.DataFrame, numpy.ndarray) tuple
+        Features and targets of the next `chunk_size` (or fewer) rows.
+
+    """
+    n_rows = fset['target'].shape[0]
+    starts = np.arange(0, n_rows, chunk_size)
+    if random_state is not None:
+        starts = random_state.permutation(starts)
+
+    for i in range(0, len(starts), shuffle_chunks):
+        parts = [_read_rows(fset, start, start + chunk_size)
+                 for start in starts[i:i + shuffle_chunks]]
+        X = pd.concat([X_part for X_part, _ in parts])
+        y = np.concatenate([y_part for _, y_part in parts])
+        if random_state is not None:
+            order = random_state.permutation(len(y))
+            X, y = X.iloc[order], y[order]
+        for j in range(0, len(y), chunk_size):
+            yield X.iloc[j:j + chunk_size], y[j:j + chunk_size]
+
+
+def _score(model, fset, chunk_size):
+    """Training score of `model` (accuracy for classifiers, coefficient of
+    determination for regressors, as for `model.score`), computed chunk by
+    chunk.
+    """
+    n = 0
+    if is_classifier(model):
+        n_correct = 0
+        for X, y in iter_chunks(fset, chunk_size):
+            n_correct += np.sum(model.predict(X) == y)
+            n += len(y)
+        return n_correct / n
+    else:
+        ss_res = sum_y = sum_y2 = 0.
+        for X, y in iter_chunks(fset, chunk_size):
+            ss_res += np.sum((y - model.predict(X)) ** 2)
+            sum_y += np.sum(y)
+            sum_y2 += np.sum(y ** 2)
+            n += len(y)
+        return 1. - ss_res / (sum_y2 - sum_y ** 2 / n)
+
+
+def fit_incremental(fset_path, model_type, model_params, n_passes,
+                    chunk_size, shuffle_chunks=1, engine='netcdf4'):
+    """Train a model with `partial_fit`, reading the feature set in chunks.
+
+    Parameters
+    ----------
+    fset_path : str
+        Path to feature set NetCDF file.
+    model_type : str
+        Type of model, e.g. 'LinearSGDClassifier'.
+    model_params : dict
+        Hyperparameters passed to the model constructor. If a `random_state`
+        is given, it is also used to shuffle the data.
+    n_passes : int
+        Number of passes over the feature set.
+    chunk_size : int
+        Number of rows read, and passed to `partial_fit`, at a time.
+    shuffle_chunks : int, optional
+        Number of chunks whose rows are shuffled together.
+    engine : str, optional
+        Engine used to read NetCDF file.
+
+    Returns
+    -------
+    model : scikit-learn estimator
+        The fitted model.
+    score : float
+        The model's training score.
+
+    """
+    model = model_search.make_model(model_type, model_params)
+    random_state = np.random.RandomState(model_params.get('random_state'))
+    with xr.open_dataset(fset_path, engine=engine) as fset:
+        fit_kwargs = {}
+        if is_classifier(model):
+            fit_kwargs['classes'] = np.unique(fset['target'].values)
+        for i in range(n_passes):
+            for X, y in iter_chunks(fset, chunk_size, shuffle_chunks,
+                                    random_state):
+                model.partial_fit(X, y, **fit_kwargs)
+        score = _score(model, fset, chunk_size)
+
+    return model, score
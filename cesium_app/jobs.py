@@ -0,0 +1,311 @@
+'''Persistent queue of featurization, model building and prediction jobs.
+
+Handlers only record what is to be computed, as a `models.Job`, and pass it
+to the application's `JobManager` (``application.job_manager``); the
+manager submits the job's tasks to the cluster, waits for them and updates
+the database and the frontend (through `Flow`) when the job succeeds or
+fails. Since that state is kept in the database rather than in the
+coroutines of a finished request, jobs interrupted by a restart of the app
+server are found by `JobManager.reconcile` at startup and submitted again
+(from the start, since the results held by the scheduler for the previous
+server are released when it exits).
+
+So that no user can monopolize the cluster, the number of jobs running at
+the same time is limited (in total, per user and per project); further jobs
+are queued and started in weighted fair order, and refused with HTTP 429
+(`QueueFull`) once too many are queued.
+
+Each type of job is defined by the module that creates it, with `register`.
+'''
+
+import collections
+import datetime
+import itertools
+
+import peewee as pw
+import tornado.gen
+import tornado.ioloop
+import tornado.web
+
+from .config import cfg
+from . import deltas
+from .flow import Flow
+from .models import Job
+
+
+__all__ = ['register', 'set_task', 'QueueFull', 'JobManager']
+
+
+JobType = collections.namedtuple('JobType', ['run', 'on_success',
+                                             'on_failure', 'target'])
+
+_job_types = {}
+
+
+def register(job_type, run, on_success, on_failure, target=None):
+    """Register a type of job.
+
+    Parameters
+    ----------
+    job_type : str
+        Name of the job type, stored in `Job.type`.
+    run : coroutine function
+        ``run(executor, job)`` submits the tasks of `job` using `executor`
+        (recording the key of the final task with `set_task`)
+        and returns their result. Must raise `peewee.DoesNotExist` if the
+        record the job computes has been deleted in the meantime.
+    on_success : function
+        ``on_success(job, result)`` stores the result and returns a
+        notification for the user.
+    on_failure : function
+        ``on_failure(job, error)`` cleans up after a failed job and returns
+        a notification for the user.
+    target : `models.BaseModel` subclass, optional
+        Type of the records computed by jobs of this type, e.g.
+        `models.Model`; once a job has finished, its record is sent to the
+        frontend as a delta (see `deltas`).
+
+    """
+    _job_types[job_type] = JobType(run, on_success, on_failure, target)
+
+
+def set_task(job, target, task_id):
+    """Record `task_id` as the key of the final task of `job` (and of the
+    record it computes, `target`)."""
+    job.task_id = target.task_id = task_id
+    job.save()
+    target.save()
+
+
+class QueueFull(tornado.web.HTTPError):
+    """Raised when a job is submitted while the job queue is saturated."""
+    def __init__(self, reason):
+        tornado.web.HTTPError.__init__(self, reason=reason, status_code=429)
+
+    def __str__(self):
+        return self.reason
+
+
+class JobManager(object):
+    """Run jobs on the cluster and keep track of their state.
+
+    At most `max_running` jobs run at the same time, of which at most
+    `max_running_per_user` per user and `max_running_per_project` per
+    project. Further jobs are queued and started in (self-clocked) weighted
+    fair order: each user receives a share of the job slots proportional to
+    its weight in `user_weights`, however many jobs it has queued. Once
+    `max_queued` jobs (or `max_queued_per_user` jobs of one user) are
+    queued, new jobs are refused with `QueueFull`.
+
+    Parameters
+    ----------
+    executor : `cluster.SharedExecutor`
+        Connection to the cluster.
+    max_retries : int, optional
+        Number of times a job interrupted by a restart is submitted again.
+    max_running, max_running_per_user, max_running_per_project : int, optional
+        Job concurrency limits.
+    max_queued, max_queued_per_user : int, optional
+        Job queue length limits.
+    user_weights : dict, optional
+        Weight of each user (default 1) in the fair ordering of jobs.
+    loop : `tornado.ioloop.IOLoop`, optional
+        Event loop on which jobs are awaited; defaults to the current loop.
+
+    All limits default to the corresponding values of ``cfg['jobs']``.
+
+    """
+    def __init__(self, executor, max_retries=None, max_running=None,
+                 max_running_per_user=None, max_running_per_project=None,
+                 max_queued=None, max_queued_per_user=None,
+                 user_weights=None, loop=None):
+        self.executor = executor
+
+        def config(value, key):
+            return cfg['jobs'][key] if value is None else value
+        self.max_retries = config(max_retries, 'max_retries')
+        self.max_running = config(max_running, 'max_running')
+        self.max_running_per_user = config(max_running_per_user,
+                                           'max_running_per_user')
+        self.max_running_per_project = config(max_running_per_project,
+                                              'max_running_per_project')
+        self.max_queued = config(max_queued, 'max_queued')
+        self.max_queued_per_user = config(max_queued_per_user,
+                                          'max_queued_per_user')
+        self.user_weights = config(user_weights, 'user_weights') or {}
+
+        self.loop = loop or tornado.ioloop.IOLoop.current()
+        self.flow = Flow.instance()
+        # Jobs being run by this process, by id
+        self._running = {}
+        # Queued jobs, as (virtual finish time, job id, job) tuples
+        self._queue = []
+        # Virtual finish time of the last job started, and of the last job
+        # queued by each user with jobs queued or running
+        self._virtual_time = 0.
+        self._last_finish = {}
+
+    def start(self):
+        """Resume the jobs interrupted by the last shutdown of the server in
+        the background. Must be called from within the event loop thread.
+        """
+        self.loop.spawn_callback(self.reconcile)
+
+    def check_capacity(self, username):
+        """Raise `QueueFull` if a new job of `username` would exceed the
+        queue length limits. To be called right before creating the record
+        the job computes and submitting the job, without yielding in
+        between (`submit` does not check again, so that it never leaves the
+        record behind without a job)."""
+        if len(self._queue) >= self.max_queued:
+            raise QueueFull('Too many jobs queued; please try again later')
+        n_queued = sum(1 for _, _, job in self._queue
+                       if job.username == username)
+        if n_queued >= self.max_queued_per_user:
+            raise QueueFull('You already have {} jobs queued; please try '
+                            'again later'.format(n_queued))
+
+    def submit(self, job_type, target, username, params={}):
+        """Create a job computing `target` (e.g. a `Featureset`) and start
+        running it, or queue it if the concurrency limits are reached. The
+        queue length limits must have been checked with `check_capacity`.
+
+        Returns
+        -------
+        `models.Job`
+            The new job, with state 'running' or 'queued'.
+
+        """
+        job = Job.create(type=job_type, target_id=target.id,
+                         project=target.project, username=username,
+                         params=params)
+        self._enqueue(job)
+        self._dispatch()
+        if job.state == 'queued':
+            self.flow.push(username, 'cesium/SHOW_NOTIFICATION', {
+                'note': 'Job queued behind {} others; it will start as soon '
+                        'as resources are available.'.format(
+                            self.queue_depth() - 1)})
+        return job
+
+    def queue_depth(self, username=None):
+        """Number of queued jobs, in total or of `username`."""
+        return sum(1 for _, _, job in self._queue
+                   if username is None or job.username == username)
+
+    def _enqueue(self, job):
+        weight = self.user_weights.get(job.username, 1)
+        start = max(self._virtual_time,
+                    self._last_finish.get(job.username, 0.))
+        finish = start + 1. / weight
+        self._last_finish[job.username] = finish
+        self._queue.append((finish, job.id, job))
+
+    def _can_start(self, job):
+        n_user = n_project = 0
+        for running in self._running.values():
+            n_user += running.username == job.username
+            n_project += running.project_id == job.project_id
+        return (n_user < self.max_running_per_user and
+                n_project < self.max_running_per_project)
+
+    def _dispatch(self):
+        """Start queued jobs, in order of virtual finish time, while the
+        concurrency limits allow."""
+        while self._queue and len(self._running) < self.max_running:
+            startable = [entry for entry in self._queue
+                         if self._can_start(entry[2])]
+            if not startable:
+                break
+            entry = min(startable, key=lambda entry: entry[:2])
+            self._queue.remove(entry)
+            finish, _, job = entry
+            self._virtual_time = finish
+
+            job.state = 'running'
+            job.started = datetime.datetime.now()
+            job.save()
+            self._running[job.id] = job
+            self.loop.spawn_callback(self._run, job)
+
+    @tornado.gen.coroutine
+    def reconcile(self):
+        """Queue again the unfinished jobs of a previous run of the server,
+        or mark interrupted jobs as failed once they have been retried
+        `max_retries` times."""
+        known = set(self._running) | set(job_id for _, job_id, _ in
+                                         self._queue)
+        unfinished = (Job.select()
+                      .where(Job.state << ['queued', 'running'])
+                      .order_by(Job.id))
+        for job in unfinished:
+            if job.id in known:
+                continue
+            if job.state == 'running':
+                if job.retries >= self.max_retries:
+                    self._fail(job, RuntimeError(
+                        'Interrupted {} times by server restarts'.format(
+                            job.retries + 1)))
+                    continue
+                print('[jobs] Resuming {} job {} (task {})'.format(
+                    job.type, job.id, job.task_id))
+                job.retries += 1
+                job.state = 'queued'
+                job.save()
+            self._enqueue(job)
+        self._dispatch()
+
+    @tornado.gen.coroutine
+    def _run(self, job):
+        job_type = _job_types[job.type]
+        try:
+            executor = yield self.executor.get()
+            result = yield job_type.run(executor, job)
+            note = job_type.on_success(job, result)
+
+            job.state = 'completed'
+            job.finished = datetime.datetime.now()
+            job.save()
+            self._notify(job, note)
+        except pw.DoesNotExist:
+            # The record computed by the job was deleted
+            job.state = 'cancelled'
+            job.finished = datetime.datetime.now()
+            job.save()
+        except Exception as e:
+            self._fail(job, e)
+        finally:
+            self._running.pop(job.id, None)
+            self._dispatch()
+            if not any(other.username == job.username for other in
+                       itertools.chain(self._running.values(),
+                                       (entry[2] for entry in self._queue))):
+                # Starts afresh from the virtual time when next queueing
+                self._last_finish.pop(job.username, None)
+
+    def _fail(self, job, error):
+        job.state = 'failed'
+        job.error = str(error)
+        job.finished = datetime.datetime.now()
+        job.save()
+        print('[jobs] {} job {} failed: {!r}'.format(job.type, job.id, error))
+        try:
+            note = _job_types[job.type].on_failure(job, error)
+        except pw.DoesNotExist:
+            return
+        self._notify(job, note, 'error')
+
+    def _notify(self, job, note, note_type=None):
+        payload = {'note': note}
+        if note_type is not None:
+            payload['type'] = note_type
+        self.flow.push(job.username, 'cesium/SHOW_NOTIFICATION', payload)
+        target = _job_types[job.type].target
+        if target is not None:
+            try:
+                delta = deltas.updated(target.get(target.id == job.target_id))
+            except pw.DoesNotExist:
+                # Deleted by `on_failure`
+                delta = deltas.deleted(target(id=job.target_id),
+                                       cascade=False)
+            self.flow.push(job.username, deltas.APPLY_DELTA, delta)
@@ -25,7 +25,7 @@ def dataset_row_to_dict(row):
     out['target'] = row.target.values.item() if 'target' in row else None
     if 'prediction' in row:
         if 'class_label' in row:  # {class label: probability}
-            out['prediction'] = {six.u(label): value for label, value
+            out['prediction'] = {six.u(label): float(value) for label, value
                                  in zip(row.class_label.values,
                                         row.prediction.values)}
         else: # just a single predicted label or target
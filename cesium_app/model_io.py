@@ -0,0 +1,92 @@
+'''Saving and loading of serialized models.'''
+
+from collections import OrderedDict
+import os
+import threading
+
+import joblib
+
+from .config import cfg
+
+
+__all__ = ['save_model', 'load_model']
+
+
+# Loaded models, per process, keyed by (path, modification time)
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def save_model(model, path, compress=0):
+    """Serialize a fitted model to `path`.
+
+    Of a hyperparameter search such as `GridSearchCV`, only the best
+    estimator is saved (without the search results and other estimators).
+    By default, models are written uncompressed, so that `joblib` stores
+    each of the model's NumPy arrays as a contiguous block in the file that
+    can later be memory-mapped by `load_model`.
+
+    Parameters
+    ----------
+    model : scikit-learn estimator
+        The fitted model.
+    path : str
+        Output path.
+    compress : int, optional
+        `joblib` compression level, from 0 (no compression) to 9. Compressed
+        models are smaller, but cannot be memory-mapped when loaded.
+
+    Returns
+    -------
+    int
+        Size of the saved file, in bytes.
+
+    """
+    model = getattr(model, 'best_estimator_', model)
+    joblib.dump(model, path, compress=compress)
+    return os.path.getsize(path)
+
+
+def load_model(path, mmap_mode='r', cache=True):
+    """Load a model saved with `save_model`.
+
+    NumPy arrays in the model are memory-mapped read-only (unless `mmap_mode`
+    is None), so that all processes loading the same model share the
+    underlying pages through the OS page cache instead of each holding a
+    private copy. The most recently used models are additionally kept
+    in a per-process cache (of size ``cfg['models']['cache_size']``), so
+    that a long-lived worker only deserializes a given model once.
+
+    Parameters
+    ----------
+    path : str
+        Path to serialized model.
+    mmap_mode : {None, 'r', 'r+', 'c'}, optional
+        Passed on to `joblib.load`. Defaults to 'r'.
+    cache : bool, optional
+        If False, the model is neither taken from nor added to the cache.
+
+    Returns
+    -------
+    scikit-learn estimator
+        The loaded model. If `cache` is True, it may be shared with other
+        callers, and so must not be modified in place.
+
+    """
+    if not cache:
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    key = (path, os.path.getmtime(path), mmap_mode)
+    with _model_cache_lock:
+        if key in _model_cache:
+            _model_cache.move_to_end(key)
+            return _model_cache[key]
+
+    model = joblib.load(path, mmap_mode=mmap_mode)
+
+    with _model_cache_lock:
+        _model_cache[key] = model
+        while len(_model_cache) > cfg['models']['cache_size']:
+            _model_cache.popitem(last=False)
+
+    return model
@@ -0,0 +1,321 @@
+'''Hyperparameter search distributed across the cluster.
+
+`GridSearchCV` fits every combination of parameters and cross-validation
+fold one after the other, so running it inside a single task leaves all but
+one worker idle. Here, the feature set is loaded into the cluster once (by
+`load_training_data`) and each (parameters, fold) fit is submitted as a
+separate task that takes the resulting future as input; the fold scores are
+then gathered and compared on the application side by `search_params`.
+Fits that fail for transient reasons (e.g. a lost worker) are retried (see
+`retry.gather`).
+
+Besides exhaustive grid search, `search_params` supports randomized search
+over a fixed number of parameter combinations, and successive halving, in
+which all candidates are first evaluated cheaply (on a fraction of the
+training samples, or, for random forest/extra trees models, with a fraction
+of their trees) and only the best ones are evaluated again with more
+resources.
+'''
+
+import functools
+
+import numpy as np
+import tornado.gen
+from cesium import featureset
+from cesium.build_model import MODELS_TYPE_DICT
+from sklearn.base import is_classifier
+from sklearn.metrics import (accuracy_score, f1_score, mean_absolute_error,
+                             mean_squared_error, r2_score)
+from sklearn.model_selection import ParameterGrid, ParameterSampler, check_cv
+
+from . import featureset_cache
+from . import retry
+from .ext.flat_forest import FOREST_CLASSIFIERS, FOREST_REGRESSORS
+
+
+__all__ = ['load_training_data', 'make_model', 'fit_model', 'search_params',
+           'cross_validation_metrics']
+
+
+# Default number of cross-validation folds, as in `GridSearchCV`
+N_FOLDS = 3
+# Successive halving keeps 1 / HALVING_FACTOR of the candidates in each round
+HALVING_FACTOR = 3
+
+
+def load_training_data(fset_path, engine='netcdf4'):
+    """Load features and targets of the feature set saved at `fset_path`.
+
+    Loaded feature sets are kept in memory by each worker for later model
+    builds (see `featureset_cache`), and so must not be modified in place.
+
+    Returns
+    -------
+    (pandas.DataFrame, numpy.ndarray) tuple
+        Feature values (one row per time series) and targets.
+
+    """
+    return featureset_cache.get(
+        fset_path, lambda path: _read_training_data(path, engine))
+
+
+def _read_training_data(fset_path, engine):
+    fset = featureset.from_netcdf(fset_path, engine=engine)
+    if fset.get('target') is None:
+        raise ValueError("Cannot build model for unlabeled feature set.")
+    X = fset.to_dataframe()
+    y = fset['target'].values
+    fset.close()
+    return X, y
+
+
+def make_model(model_type, model_params):
+    """Instantiate an (unfitted) model of type `model_type`."""
+    return MODELS_TYPE_DICT[model_type](**model_params)
+
+
+def fit_model(training_data, model_type, model_params):
+    """Fit a model of type `model_type` to `training_data`, as returned by
+    `load_training_data`.
+    """
+    X, y = training_data
+    return make_model(model_type, model_params).fit(X, y)
+
+
+def _fold_indices(model, y, fold, n_folds):
+    """Training and test indices of cross-validation fold `fold`."""
+    cv = check_cv(n_folds, y, classifier=is_classifier(model))
+    return list(cv.split(np.zeros(len(y)), y))[fold]
+
+
+def _fit_and_score(training_data, model_type, model_params, fold, n_folds,
+                   sample_fraction=1.):
+    """Fit a model on all but fold `fold` of `training_data` and return its
+    score on the held-out fold.
+
+    If `sample_fraction` is less than 1, the model is fit on a random subset
+    of that fraction of the training samples only (but scored on the whole
+    held-out fold).
+    """
+    X, y = training_data
+    model = make_model(model_type, model_params)
+    train, test = _fold_indices(model, y, fold, n_folds)
+    if sample_fraction < 1.:
+        n_classes = len(np.unique(y)) if is_classifier(model) else 1
+        n_samples = max(int(len(train) * sample_fraction),
+                        min(len(train), 2 * n_classes * n_folds))
+        train = np.random.RandomState(fold).permutation(train)[:n_samples]
+    model.fit(X.iloc[train], y[train])
+    return model.score(X.iloc[test], y[test])
+
+
+@tornado.gen.coroutine
+def _cross_validate(executor, training_data, model_type, model_params,
+                    candidates, n_folds, sample_fraction=1., resources=None):
+    """Compute the mean cross-validation score of each of `candidates`,
+    fitting each (parameters, fold) combination in a separate task.
+    """
+    submits = [functools.partial(executor.submit, _fit_and_score,
+                                 training_data, model_type,
+                                 dict(model_params, **params), fold, n_folds,
+                                 sample_fraction, resources=resources)
+               for params in candidates for fold in range(n_folds)]
+    scores = yield retry.gather(executor, submits)
+    return np.reshape(scores, (len(candidates), n_folds)).mean(axis=1)
+
+
+def _halving_schedule(n_candidates):
+    """Number of candidates evaluated in each round of successive halving."""
+    schedule = []
+    while n_candidates > 1:
+        schedule.append(n_candidates)
+        n_candidates = int(np.ceil(n_candidates / HALVING_FACTOR))
+    return schedule or [1]
+
+
+@tornado.gen.coroutine
+def _halving_search(executor, training_data, model_type, model_params,
+                    candidates, n_folds, resource, resources=None):
+    """Successive halving: evaluate all candidates with a small fraction of
+    `resource` (training samples or trees), then repeatedly keep the best
+    `1 / HALVING_FACTOR` of them while multiplying the resource by
+    `HALVING_FACTOR`, until the last round uses all of it.
+    """
+    schedule = _halving_schedule(len(candidates))
+    if resource == 'n_estimators':
+        max_estimators = model_params.get('n_estimators') or make_model(
+            model_type, {}).n_estimators
+    for i, n_candidates in enumerate(schedule):
+        fraction = float(HALVING_FACTOR) ** (i + 1 - len(schedule))
+        if resource == 'n_estimators':
+            n_estimators = max(1, int(round(max_estimators * fraction)))
+            params = dict(model_params, n_estimators=n_estimators)
+            mean_scores = yield _cross_validate(executor, training_data,
+                                                model_type, params,
+                                                candidates, n_folds,
+                                                resources=resources)
+        else:
+            mean_scores = yield _cross_validate(executor, training_data,
+                                                model_type, model_params,
+                                                candidates, n_folds, fraction,
+                                                resources)
+        n_keep = schedule[i + 1] if i + 1 < len(schedule) else 1
+        # Stable sort, so that ties are resolved in favor of earlier candidates
+        best = np.argsort(-mean_scores, kind='mergesort')[:n_keep]
+        candidates = [candidates[j] for j in best]
+        mean_scores = mean_scores[best]
+
+    return candidates[0], float(mean_scores[0])
+
+
+@tornado.gen.coroutine
+def search_params(executor, training_data, model_type, model_params,
+                  params_to_optimize, n_folds=N_FOLDS, search_strategy='grid',
+                  search_budget=None, halving_resource='n_samples',
+                  resources=None):
+    """Find the best hyperparameters by cross-validated search.
+
+    Parameters
+    ----------
+    executor : `distributed.Executor`
+        Executor used to submit the individual fits.
+    training_data : `distributed.Future`
+        Future of the output of `load_training_data`, which should have
+        finished successfully (see `retry.wait`): the fits depending on it
+        are retried, but not the loading itself.
+    model_type : str
+        Type of model, e.g. 'RandomForestClassifier'.
+    model_params : dict
+        Hyperparameters passed to the model constructor as-is.
+    params_to_optimize : dict
+        Grid of hyperparameter values to search, as for `GridSearchCV`.
+    n_folds : int, optional
+        Number of cross-validation folds.
+    search_strategy : {'grid', 'random', 'halving'}, optional
+        'grid' evaluates every combination of parameter values; 'random'
+        evaluates `search_budget` randomly sampled combinations; 'halving'
+        uses successive halving (see `_halving_search`) to discard poor
+        combinations early, starting from `search_budget` randomly sampled
+        combinations (or all of them, if `search_budget` is None).
+    search_budget : int, optional
+        Number of parameter combinations to sample (for 'random' and
+        'halving' searches). If None, all combinations are used.
+    halving_resource : {'n_samples', 'n_estimators'}, optional
+        Resource increased in each round of a 'halving' search: the number
+        of training samples, or the number of trees of a random
+        forest/extra trees model. In the latter case, the largest value of
+        `n_estimators` in `params_to_optimize` (if any) is used in the final
+        round; for other models, the number of training samples is used
+        instead.
+    resources : dict, optional
+        Resources required by each fit (see `cesium_app.resources`).
+
+    Returns
+    -------
+    best_params : dict
+        Values of the hyperparameters in `params_to_optimize` with the best
+        mean cross-validation score.
+    best_score : float
+        Mean cross-validation score of `best_params`.
+
+    """
+    params_to_optimize = dict(params_to_optimize)
+    # Fewer trees only make a cheaper, noisier version of the same model for
+    # forests; e.g. boosted models with fewer stages are just worse
+    if halving_resource == 'n_estimators' and not isinstance(
+            make_model(model_type, {}),
+            FOREST_CLASSIFIERS + FOREST_REGRESSORS):
+        halving_resource = 'n_samples'
+    fixed_params = {}
+    if (search_strategy == 'halving' and halving_resource == 'n_estimators'
+            and 'n_estimators' in params_to_optimize):
+        fixed_params['n_estimators'] = max(
+            params_to_optimize.pop('n_estimators'))
+        model_params = dict(model_params, **fixed_params)
+
+    candidates = list(ParameterGrid(params_to_optimize))
+    if (search_strategy != 'grid' and search_budget is not None and
+            search_budget < len(candidates)):
+        candidates = list(ParameterSampler(
+            params_to_optimize, search_budget,
+            random_state=model_params.get('random_state')))
+
+    if search_strategy == 'halving':
+        best_params, best_score = yield _halving_search(
+            executor, training_data, model_type, model_params, candidates,
+            n_folds, halving_resource, resources)
+    else:
+        mean_scores = yield _cross_validate(executor, training_data,
+                                            model_type, model_params,
+                                            candidates, n_folds,
+                                            resources=resources)
+        best = int(np.argmax(mean_scores))
+        best_params, best_score = candidates[best], float(mean_scores[best])
+
+    return dict(best_params, **fixed_params), best_score
+
+
+def _fit_and_evaluate(training_data, model_type, model_params, fold,
+                      n_folds):
+    """Fit a model on all but fold `fold` of `training_data` and return a
+    dictionary of evaluation metrics on the held-out fold.
+    """
+    X, y = training_data
+    model = make_model(model_type, model_params)
+    train, test = _fold_indices(model, y, fold, n_folds)
+    model.fit(X.iloc[train], y[train])
+    y_pred = model.predict(X.iloc[test])
+    if is_classifier(model):
+        return {'accuracy': accuracy_score(y[test], y_pred),
+                'f1_macro': f1_score(y[test], y_pred, average='macro')}
+    else:
+        return {'r2': r2_score(y[test], y_pred),
+                'mean_absolute_error': mean_absolute_error(y[test], y_pred),
+                'root_mean_squared_error': np.sqrt(
+                    mean_squared_error(y[test], y_pred))}
+
+
+@tornado.gen.coroutine
+def cross_validation_metrics(executor, training_data, model_type,
+                             model_params, n_folds=N_FOLDS, resources=None):
+    """Estimate the performance of a model on unseen data by k-fold
+    cross-validation, fitting and evaluating each fold in a separate task.
+
+    Parameters
+    ----------
+    executor : `distributed.Executor`
+        Executor used to submit the individual fits.
+    training_data : `distributed.Future`
+        Future of the output of `load_training_data`, which should have
+        finished successfully (see `retry.wait`): the fits depending on it
+        are retried, but not the loading itself.
+    model_type : str
+        Type of model, e.g. 'RandomForestClassifier'.
+    model_params : dict
+        Hyperparameters passed to the model constructor.
+    n_folds : int, optional
+        Number of cross-validation folds.
+    resources : dict, optional
+        Resources required by each fit (see `cesium_app.resources`).
+
+    Returns
+    -------
+    dict
+        Number of folds (`n_folds`) and, for each metric (accuracy and macro
+        F1 score for classifiers; coefficient of determination, mean
+        absolute error and root mean squared error for regressors), its mean
+        and standard deviation over all folds, e.g.
+        `{'n_folds': 3, 'accuracy': {'mean': 0.9, 'std': 0.02}, ...}`.
+
+    """
+    submits = [functools.partial(executor.submit, _fit_and_evaluate,
+                                 training_data, model_type, model_params,
+                                 fold, n_folds, resources=resources)
+               for fold in range(n_folds)]
+    fold_metrics = yield retry.gather(executor, submits)
+    cv_metrics = {'n_folds': n_folds}
+    for name in fold_metrics[0]:
+        values = [metrics[name] for metrics in fold_metrics]
+        cv_metrics[name] = {'mean': float(np.mean(values)),
+                            'std': float(np.std(values))}
+    return cv_metrics
@@ -55,6 +55,12 @@ class Project(BaseModel):
         return username in users
 
 
+@signals.pre_delete(sender=Project)
+def delete_project_records(sender, instance):
+    delete_dependents(instance.datasets)
+    delete_dependents(instance.models)
+
+
 class UserProject(BaseModel):
     username = pw.CharField()
     project = pw.ForeignKeyField(Project, related_name='owners',
@@ -71,6 +77,35 @@ class File(BaseModel):
     uri = pw.CharField(primary_key=True)  # s3://cesium_bin/3eef6601a
     name = pw.CharField(null=True)
     created = pw.DateTimeField(default=datetime.datetime.now)
+    checksum = pw.CharField(null=True)
+    # Number of records (e.g. models sharing a build artifact) using the file
+    ref_count = pw.IntegerField(default=1)
+
+    @staticmethod
+    def share(uri):
+        """Return the `File` with `uri`, creating it if it does not exist and
+        otherwise incrementing its reference count."""
+        try:
+            f = File.get(File.uri == uri)
+        except File.DoesNotExist:
+            return File.create(uri=uri)
+        f.retain()
+        return f
+
+    def retain(self):
+        """Increment the reference count of the file."""
+        File.update(ref_count=File.ref_count + 1).where(
+            File.uri == self.uri).execute()
+        self.ref_count += 1
+
+    def release(self):
+        """Decrement the reference count of the file, and delete it once it
+        is no longer referenced."""
+        File.update(ref_count=File.ref_count - 1).where(
+            File.uri == self.uri).execute()
+        self.ref_count = File.get(File.uri == self.uri).ref_count
+        if self.ref_count <= 0:
+            self.delete_instance()
 
 @signals.post_delete(sender=File)
 def remove_file_after_delete(sender, instance):
@@ -134,8 +169,17 @@ class DatasetFile(BaseModel):
             (('dataset', 'file'), True),
         )
 
+def delete_dependents(query):
+    """Delete the records of `query` one by one rather than leaving them to
+    ``ON DELETE CASCADE``, which skips their `pre_delete` handlers (and so
+    would leave their files behind)."""
+    for record in query:
+        record.delete_instance()
+
+
 @signals.pre_delete(sender=Dataset)
 def remove_related_files(sender, instance):
+    delete_dependents(Prediction.select().where(Prediction.dataset == instance))
     for f in instance.files:
         f.delete_instance()
 
@@ -155,6 +199,10 @@ class Featureset(BaseModel):
     def is_owned_by(self, username):
         return self.project.is_owned_by(username)
 
+@signals.pre_delete(sender=Featureset)
+def delete_featureset_models(sender, instance):
+    delete_dependents(instance.models)
+
 
 class Model(BaseModel):
     """ORM model of the Model table"""
@@ -167,13 +215,40 @@ class Model(BaseModel):
     params = BinaryJSONField(default={})
     type = pw.CharField()
     file = pw.ForeignKeyField(File, on_delete='CASCADE')
+    flat_file = pw.ForeignKeyField(File, null=True, on_delete='SET NULL',
+                                   related_name='flat_models')
     task_id = pw.CharField(null=True)
     finished = pw.DateTimeField(null=True)
     train_score = pw.FloatField(null=True)
+    # Total size (bytes) and save time of the model files, and load time of
+    # the model used for predictions (seconds)
+    artifact_size = pw.BigIntegerField(null=True)
+    save_time = pw.FloatField(null=True)
+    load_time = pw.FloatField(null=True)
+    # See `model_search.cross_validation_metrics`
+    cv_metrics = BinaryJSONField(null=True)
+    fingerprint = pw.CharField(null=True, index=True)
+    parent = pw.ForeignKeyField('self', null=True, on_delete='SET NULL',
+                                related_name='children')
 
     def is_owned_by(self, username):
         return self.project.is_owned_by(username)
 
+    @property
+    def prediction_uri(self):
+        """Path of the model file to use for predictions: the flattened
+        model (see `ext.flat_forest`), if there is one.
+        """
+        return (self.flat_file or self.file).uri
+
+@signals.pre_delete(sender=Model)
+def release_model_files(sender, instance):
+    delete_dependents(instance.predictions)
+    # Model files may be shared by several models with the same fingerprint
+    if instance.flat_file is not None:
+        instance.flat_file.release()
+    instance.file.release()
+
 
 class Prediction(BaseModel):
     """ORM model of the Prediction table"""
@@ -184,19 +259,23 @@ class Prediction(BaseModel):
                                related_name='predictions')
     created = pw.DateTimeField(default=datetime.datetime.now)
     file = pw.ForeignKeyField(File, on_delete='CASCADE')
+    index_file = pw.ForeignKeyField(File, null=True, on_delete='SET NULL',
+                                    related_name='indexed_predictions')
     task_id = pw.CharField(null=True)
     finished = pw.DateTimeField(null=True)
 
     def is_owned_by(self, username):
         return self.project.is_owned_by(username)
 
-    def display_info(self):
+    def display_info(self, results=True):
+        """Description of the prediction, with its `results` once finished
+        (unless `results` is False)."""
         info = self.__dict__()
         info['model_type'] = self.model.type
         info['dataset_name'] = self.dataset.name
         info['model_name'] = self.model.name
         info['featureset_name'] = self.model.featureset.name
-        if self.task_id is None:
+        if results and self.finished is not None:
             try:
                 with xr.open_dataset(self.file.uri, engine=cfg['xr_engine']) as pset:
                     info['results'] = pset.load()
@@ -207,8 +286,38 @@ class Prediction(BaseModel):
             if 'prediction' in first_result:
                 info['isProbabilistic'] = 'class_label' in\
                                           first_result.prediction
+            info['truncated'] = bool(info['results'].attrs.get('truncated'))
         return info
 
+@signals.pre_delete(sender=Prediction)
+def remove_prediction_index_file(sender, instance):
+    if instance.index_file is not None:
+        instance.index_file.delete_instance()
+
+
+class Job(BaseModel):
+    """ORM model of the Job table: a featurization, model build or prediction
+    run by `jobs.JobManager`"""
+    type = pw.CharField()
+    project = pw.ForeignKeyField(Project, on_delete='CASCADE',
+                                 related_name='jobs')
+    username = pw.CharField()
+    # Id of the Featureset/Model/Prediction computed by the job
+    target_id = pw.IntegerField()
+    # Everything needed to (re)submit the job's tasks
+    params = BinaryJSONField(default={})
+    # One of 'queued', 'running', 'completed', 'failed', 'cancelled'
+    state = pw.CharField(default='queued', index=True)
+    task_id = pw.CharField(null=True)
+    retries = pw.IntegerField(default=0)
+    error = pw.TextField(null=True)
+    # Error message of each time series left out of the job's results, by
+    # path (see `retry.wait_items`)
+    failed_items = BinaryJSONField(null=True)
+    created = pw.DateTimeField(default=datetime.datetime.now)
+    started = pw.DateTimeField(null=True)
+    finished = pw.DateTimeField(null=True)
+
 
 models = [
     obj for (name, obj) in inspect.getmembers(sys.modules[__name__])
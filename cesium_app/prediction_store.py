@@ -0,0 +1,160 @@
+'''Storage of prediction results with random access by time series name.
+
+Predictions are saved as NetCDF files, as before, together with a sorted
+index of time series names stored as a `.npy` file of `(name, row)` records.
+Looking up a single time series memory-maps the index, binary searches it
+for the name, and reads only the corresponding row from the NetCDF file,
+so that neither file has to be loaded in full.
+
+For probabilistic classifiers with many classes, `top_k_predictions` can be
+used to keep only the `k` most likely class labels of each time series (as
+float32 probabilities); the truncation is recorded in the dataset
+attributes `top_k`, `n_classes` and `truncated`.
+'''
+
+import numpy as np
+import xarray as xr
+
+
+__all__ = ['top_k_predictions', 'write_prediction', 'load_prediction_row']
+
+
+def build_name_index(names):
+    """Build a sorted `(name, row)` index for the time series names `names`.
+
+    Parameters
+    ----------
+    names : array-like
+        Time series names, in the order in which they are stored.
+
+    Returns
+    -------
+    numpy.ndarray
+        Structured array with fields `name` (unicode) and `row` (int), sorted
+        by `name`.
+
+    """
+    names = np.asarray(names).astype('U')
+    index = np.empty(len(names), dtype=[('name', names.dtype),
+                                        ('row', '<i8')])
+    order = np.argsort(names, kind='mergesort')
+    index['name'] = names[order]
+    index['row'] = order
+    return index
+
+
+def find_row(index, name):
+    """Find the row of time series `name` in a sorted `(name, row)` index.
+
+    Raises
+    ------
+    KeyError
+        If `name` is not in the index.
+
+    """
+    names = index['name']
+    i = np.searchsorted(names, name)
+    if i == len(names) or names[i] != name:
+        raise KeyError(name)
+    return int(index['row'][i])
+
+
+def top_k_predictions(predset, k):
+    """Keep only the `k` most likely class labels of each time series.
+
+    The `prediction` variable of a probabilistic classifier's predictions has
+    dimensions `(name, class_label)`; it is replaced by float32 probabilities
+    with dimensions `(name, rank)`, sorted in decreasing order, and a
+    `class_label` coordinate of the same shape holding the corresponding
+    labels. Predictions without class probabilities are returned unchanged.
+
+    Parameters
+    ----------
+    predset : xarray.Dataset
+        Prediction dataset, as returned by `cesium.predict.model_predictions`.
+    k : int
+        Number of class labels to keep per time series. If `k` is None or
+        not positive, `predset` is returned unchanged.
+
+    Returns
+    -------
+    xarray.Dataset
+        Truncated prediction dataset, with attributes `top_k` (number of
+        labels kept), `n_classes` (total number of classes) and `truncated`
+        (1 if any class probabilities were discarded, otherwise 0).
+
+    """
+    if not k or k < 0 or 'class_label' not in predset.prediction.dims:
+        return predset
+
+    probs = predset.prediction.transpose('name', 'class_label').values
+    n_classes = probs.shape[1]
+    k = min(k, n_classes)
+    rows = np.arange(probs.shape[0])[:, np.newaxis]
+    top = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    top = top[rows, np.argsort(-probs[rows, top], axis=1, kind='mergesort')]
+
+    # `Dataset.drop` of variables is deprecated in newer versions of xarray
+    drop_vars = getattr(predset, 'drop_vars', predset.drop)
+    result = drop_vars(['prediction', 'class_label'])
+    result['prediction'] = (('name', 'rank'),
+                            probs[rows, top].astype(np.float32))
+    result.coords['class_label'] = (('name', 'rank'),
+                                    predset.class_label.values[top])
+    result.attrs.update(top_k=k, n_classes=n_classes,
+                        truncated=int(k < n_classes))
+    return result
+
+
+def write_prediction(predset, path, index_path, engine, top_k=None):
+    """Save prediction dataset `predset` to `path` and its name index to
+    `index_path`.
+
+    If `top_k` is given, only the `top_k` most likely class labels of each
+    time series are saved; see `top_k_predictions`.
+    """
+    predset = top_k_predictions(predset, top_k)
+    predset.to_netcdf(path, engine=engine)
+    np.save(index_path, build_name_index(predset.name.values))
+
+
+def load_prediction_row(path, name, index_path=None, engine='netcdf4'):
+    """Load the predictions for a single time series.
+
+    Parameters
+    ----------
+    path : str
+        Path to prediction NetCDF file.
+    name : str
+        Name of time series.
+    index_path : str, optional
+        Path to name index written by `write_prediction`. If None, the full
+        list of names is read from the prediction file instead.
+    engine : str, optional
+        Engine used to read NetCDF file.
+
+    Returns
+    -------
+    xarray.Dataset
+        Prediction results for the time series `name` (i.e., one "row" of the
+        prediction dataset).
+
+    Raises
+    ------
+    KeyError
+        If there is no time series `name`.
+
+    """
+    if index_path is None:
+        with xr.open_dataset(path, engine=engine) as pset:
+            index = build_name_index(pset.name.values)
+    else:
+        index = np.load(index_path, mmap_mode='r')
+    row = find_row(index, name)
+
+    # Skip the `name` coordinate, which xarray would otherwise read in full
+    with xr.open_dataset(path, engine=engine,
+                         drop_variables=['name']) as pset:
+        result = pset.isel(name=row).load()
+    result.coords['name'] = name
+    return result
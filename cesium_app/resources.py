@@ -0,0 +1,64 @@
+'''Memory estimates of featurization and prediction tasks.
+
+Every local worker advertises its memory (``cfg['cluster']['worker_memory_mb']``)
+as a `MEMORY` resource (see `worker_pool.WorkerPool`), and tasks are
+submitted with an estimate of the memory they need, e.g.
+
+    uri_resources, = yield task_resources([uri])
+    executor.submit(f, uri, resources=uri_resources)
+
+The scheduler then only runs as many tasks on a worker at the same time as fit
+into its memory, instead of placing several very long light curves on the
+same worker until it is killed for running out of memory.
+
+Estimates are computed from the sizes of the files written at ingest (time
+series) or by earlier jobs (feature sets, models): the memory taken by a
+task is assumed to be ``cfg['cluster']['task_memory_factor']`` times the
+size of its input files, plus ``cfg['cluster']['task_memory_base_mb']``.
+Estimates are capped at the memory of a worker, so that every task can run
+somewhere. The files are looked up in a background thread, so that slow
+shared storage does not hold up the app server.
+
+Since a task requiring `MEMORY` never starts on a worker that does not
+advertise it (e.g. one started with ``dask-worker``), resources are only
+requested if ``cfg['cluster']['memory_resources']`` is set, i.e. when all
+workers are started by `worker_pool.WorkerPool`.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import tornado.gen
+
+from .config import cfg
+
+
+__all__ = ['estimate_memory', 'task_resources']
+
+
+_stat_pool = ThreadPoolExecutor(1)
+
+
+def estimate_memory(paths):
+    """Estimated memory (in bytes) needed to process the files `paths`."""
+    nbytes = sum(os.path.getsize(path) for path in paths
+                 if os.path.exists(path))
+    estimate = (cfg['cluster']['task_memory_base_mb'] * 2 ** 20 +
+                cfg['cluster']['task_memory_factor'] * nbytes)
+    return int(min(estimate, cfg['cluster']['worker_memory_mb'] * 2 ** 20))
+
+
+@tornado.gen.coroutine
+def task_resources(*path_groups):
+    """Resources of tasks processing each of the groups of files
+    `path_groups` (e.g. the time series to featurize, or a feature set and a
+    model), as a list with one entry per group.
+
+    Entries are None (no requirements) unless
+    ``cfg['cluster']['memory_resources']`` is set.
+    """
+    if not cfg['cluster']['memory_resources']:
+        return [None] * len(path_groups)
+    estimates = yield _stat_pool.submit(
+        lambda: [estimate_memory(paths) for paths in path_groups])
+    return [{'MEMORY': estimate} for estimate in estimates]
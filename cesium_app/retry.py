@@ -0,0 +1,166 @@
+'''Retrying of tasks that fail for transient reasons.
+
+A task may fail because of the environment rather than its input: its worker
+was lost (e.g. killed for using too much memory, or retired), or shared
+storage was briefly unavailable (`OSError`). Rather than failing the whole
+job, such tasks are submitted again after an exponentially increasing delay
+(``cfg['jobs']['retry_delay'] * 2 ** attempt`` seconds, at most
+``cfg['jobs']['max_retry_delay']``), up to ``cfg['jobs']['task_retries']``
+times. Retried tasks are submitted as impure, since the scheduler remembers
+the failure of the original task under its (deterministic) key.
+
+`gather` (or `result`) retries the tasks of a computation that needs all of
+their results;
+`wait_items` retries the tasks of independent items (e.g. the time series of
+a dataset) and reports the items that still failed, so that a job can go on
+without them.
+'''
+
+import tornado.gen
+
+from .config import cfg
+
+
+__all__ = ['is_transient', 'retry_delay', 'gather', 'result', 'wait',
+           'wait_items']
+
+
+# Raised by distributed when a worker or connection is lost; matched by name,
+# since their location differs between versions of distributed
+_TRANSIENT_ERROR_NAMES = {'KilledWorker', 'CommClosedError',
+                          'StreamClosedError'}
+
+# OS errors that retrying will not fix (e.g. a missing input file)
+_PERMANENT_OS_ERRORS = (FileNotFoundError, FileExistsError, PermissionError,
+                        IsADirectoryError, NotADirectoryError)
+
+
+def is_transient(error):
+    """Check whether `error` is likely to go away when its task is retried."""
+    return ((isinstance(error, OSError) and
+             not isinstance(error, _PERMANENT_OS_ERRORS)) or
+            type(error).__name__ in _TRANSIENT_ERROR_NAMES)
+
+
+def retry_delay(attempt):
+    """Seconds to wait before retry number `attempt` (starting at 0)."""
+    return min(cfg['jobs']['retry_delay'] * 2 ** attempt,
+               cfg['jobs']['max_retry_delay'])
+
+
+@tornado.gen.coroutine
+def _wait(submit, retries):
+    """Submit a task with ``submit(pure=...)`` and wait for it to finish,
+    retrying it after transient failures.
+
+    Returns
+    -------
+    future : `distributed.Future`
+        The last future submitted.
+    error : Exception or None
+        The error of the task, if it finally failed.
+
+    """
+    future = submit(pure=True)
+    for attempt in range(retries + 1):
+        error = yield future._exception()
+        if error is None or not is_transient(error) or attempt == retries:
+            break
+        print('[retry] Task {} failed with {!r}; retrying'.format(
+            future.key, error))
+        yield tornado.gen.sleep(retry_delay(attempt))
+        future = submit(pure=False)
+    return future, error
+
+
+@tornado.gen.coroutine
+def gather(executor, submits, retries=None):
+    """Gather the results of tasks, retrying transient failures.
+
+    Parameters
+    ----------
+    executor : `distributed.Executor`
+        Executor the tasks are submitted to.
+    submits : list of functions
+        ``submit(pure=...)`` submits a task, with `pure` passed on to
+        `executor.submit`, and returns its future (e.g.
+        ``functools.partial(executor.submit, func, *args)``).
+    retries : int, optional
+        Maximum number of retries per task; defaults to
+        ``cfg['jobs']['task_retries']``.
+
+    Returns
+    -------
+    list
+        Results of the tasks. The first error that persists is raised.
+
+    """
+    if retries is None:
+        retries = cfg['jobs']['task_retries']
+    outcomes = yield [_wait(submit, retries) for submit in submits]
+    for future, error in outcomes:
+        if error is not None:
+            raise error
+    results = yield executor._gather([future for future, _ in outcomes])
+    return results
+
+
+@tornado.gen.coroutine
+def result(executor, submit, retries=None):
+    """Result of a single task, retrying transient failures (see
+    `gather`)."""
+    results = yield gather(executor, [submit], retries)
+    return results[0]
+
+
+@tornado.gen.coroutine
+def wait(submit, retries=None):
+    """Wait for a task to finish, retrying transient failures (see
+    `gather`), without fetching its result.
+
+    Returns the future of the attempt that succeeded, e.g. to pass to the
+    tasks depending on it, which would otherwise all fail (and be retried in
+    vain) if it did. The error that persists is raised.
+    """
+    if retries is None:
+        retries = cfg['jobs']['task_retries']
+    future, error = yield _wait(submit, retries)
+    if error is not None:
+        raise error
+    return future
+
+
+@tornado.gen.coroutine
+def wait_items(submit, items, retries=None):
+    """Compute each of `items`, retrying transient failures.
+
+    Parameters
+    ----------
+    submit : function
+        ``submit(item, pure)`` submits the task(s) computing `item`, with
+        `pure` passed on to `executor.submit`, and returns the future of its
+        result.
+    items : list
+        Items to compute.
+    retries : int, optional
+        Maximum number of retries per item; defaults to
+        ``cfg['jobs']['task_retries']``.
+
+    Returns
+    -------
+    futures : list of `distributed.Future`
+        Futures of the items that were computed successfully, in order.
+    failed : dict
+        Error message of each item that failed.
+
+    """
+    if retries is None:
+        retries = cfg['jobs']['task_retries']
+    outcomes = yield [_wait(lambda pure, item=item: submit(item, pure),
+                            retries)
+                      for item in items]
+    futures = [future for future, error in outcomes if error is None]
+    failed = {str(item): '{}: {}'.format(type(error).__name__, error)
+              for item, (_, error) in zip(items, outcomes)
+              if error is not None}
+    return futures, failed
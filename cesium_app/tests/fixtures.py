@@ -12,10 +12,11 @@ from cesium import featureset
 from cesium.features import CADENCE_FEATS, GENERAL_FEATS, LOMB_SCARGLE_FEATS
 from cesium.tests import fixtures
 from cesium_app.config import cfg
+from cesium_app import model_io
+from cesium_app import prediction_store
 import shutil
 import peewee
 import datetime
-import joblib
 import xarray as xr
 
 
@@ -132,7 +133,7 @@ def create_test_model(fset, model_type='RandomForestClassifier'):
                                                              model_type=model_type)
         model_path = pjoin(cfg['paths']['models_folder'],
                            '{}.pkl'.format(str(uuid.uuid4())))
-        joblib.dump(model_data, model_path)
+        model_io.save_model(model_data, model_path)
     f, created = m.File.create_or_get(uri=model_path)
     model = m.Model.create(name='test_model',
                            file=f, featureset=fset, project=fset.project,
@@ -158,14 +159,20 @@ def create_test_prediction(dataset, model):
 
     """
     with featureset.from_netcdf(model.featureset.file.uri, engine=cfg['xr_engine']) as fset_data:
-        model_data = joblib.load(model.file.uri)
+        model_data = model_io.load_model(model.file.uri)
         pred_data = predict.model_predictions(fset_data.load(), model_data)
+    pred_uuid = str(uuid.uuid4())
     pred_path = pjoin(cfg['paths']['predictions_folder'],
-                      '{}.nc'.format(str(uuid.uuid4())))
-    pred_data.to_netcdf(pred_path, engine=cfg['xr_engine'])
+                      '{}.nc'.format(pred_uuid))
+    index_path = pjoin(cfg['paths']['predictions_folder'],
+                       '{}_index.npy'.format(pred_uuid))
+    prediction_store.write_prediction(pred_data, pred_path, index_path,
+                                      cfg['xr_engine'])
     f, created = m.File.create_or_get(uri=pred_path)
-    pred = m.Prediction.create(file=f, dataset=dataset, project=dataset.project,
-                               model=model, finished=datetime.datetime.now())
+    index_f, created = m.File.create_or_get(uri=index_path)
+    pred = m.Prediction.create(file=f, index_file=index_f, dataset=dataset,
+                               project=dataset.project, model=model,
+                               finished=datetime.datetime.now())
     pred.save()
     try:
         yield pred
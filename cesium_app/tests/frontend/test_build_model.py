@@ -5,6 +5,10 @@ import uuid
 import time
 import os
 from os.path import join as pjoin
+import requests
+from cesium_app import models as m
+from cesium_app import model_io
+from cesium_app.config import cfg
 from cesium_app.tests.fixtures import (create_test_project, create_test_dataset,
                                        create_test_featureset, create_test_model)
 
@@ -136,3 +140,25 @@ def test_model_info_display(driver):
                                             "parameters')]").is_displayed()
         assert driver.find_element_by_xpath("//th[contains(text(),'Training "
                                             "Data Score')]").is_displayed()
+
+
+def test_grow_model():
+    with create_test_project() as p, create_test_featureset(p) as fs,\
+         create_test_model(fs) as model:
+        url = '{}/models/{}/grow'.format(cfg['server']['url'], model.id)
+        response = requests.post(url, json={'nEstimators': 5}).json()
+        assert response['status'] == 'error'
+
+        response = requests.post(url, json={'nEstimators': 20}).json()
+        assert response['status'] == 'success'
+        grown = m.Model.get(m.Model.parent == model)
+        try:
+            for i in range(30):
+                grown = m.Model.get(m.Model.id == grown.id)
+                if grown.finished is not None:
+                    break
+                time.sleep(0.5)
+            assert grown.params['n_estimators'] == 20
+            assert len(model_io.load_model(grown.file.uri).estimators_) == 20
+        finally:
+            grown.delete_instance()
@@ -7,6 +7,9 @@ import os
 from os.path import join as pjoin
 import numpy as np
 import numpy.testing as npt
+import requests
+from cesium import featureset
+from cesium_app.config import cfg
 from cesium_app.tests.fixtures import (create_test_project, create_test_dataset,
                                        create_test_featureset, create_test_model,
                                        create_test_prediction)
@@ -204,3 +207,19 @@ def test_download_prediction_csv_regr(driver):
                  [4, 3.1, 3.1]])
         finally:
             os.remove('/tmp/cesium_prediction_results.csv')
+
+
+def test_prediction_results_by_name():
+    with create_test_project() as p, create_test_dataset(p) as ds,\
+         create_test_featureset(p) as fs, create_test_model(fs) as m,\
+         create_test_prediction(ds, m) as pred:
+        pset = featureset.from_netcdf(pred.file.uri)
+        name = str(pset.name.values[1])
+        url = '{}/predictions/{}/results'.format(cfg['server']['url'],
+                                                 pred.id)
+        response = requests.get(url, params={'name': name}).json()
+        assert response['status'] == 'success'
+        assert response['data']['target'] == pset.target.values[1]
+
+        response = requests.get(url, params={'name': 'nope'}).json()
+        assert response['status'] == 'error'
@@ -1,8 +1,11 @@
 from cesium_app.tests.fixtures import (create_test_project, create_test_dataset,
                                        create_test_featureset, create_test_model)
 from cesium_app.config import cfg
+from cesium_app import binary_io
 import requests
 import json
+import io
+import numpy as np
 
 
 def test_predict_raw_data():
@@ -18,3 +21,21 @@ def test_predict_raw_data():
         assert response['status'] == 'success'
         assert response['data']['0']['features']['total_time'] == 3.0
         assert 'Mira' in response['data']['0']['prediction']
+
+
+def test_predict_raw_data_binary():
+    with create_test_project() as p, create_test_dataset(p) as ds,\
+         create_test_featureset(p) as fs, create_test_model(fs) as m:
+        body = binary_io.encode_buffer([[1, 2, 3, 4]],
+                                       [[32.2, 53.3, 32.3, 32.52]],
+                                       [[0.2, 0.3, 0.6, 0.3]])
+        query_string = '{}/predict_raw_data?modelID={}'.format(
+            cfg['server']['url'], json.dumps(m.id))
+        response = requests.post(
+            query_string, data=body,
+            headers={'Content-Type': binary_io.BUFFER_CONTENT_TYPE,
+                     'Accept': binary_io.NPZ_CONTENT_TYPE})
+        assert response.headers['Content-Type'] == binary_io.NPZ_CONTENT_TYPE
+        with np.load(io.BytesIO(response.content)) as results:
+            assert list(results['name']) == ['0']
+            assert 'Mira' in results['class_label']
@@ -0,0 +1,79 @@
+'''In-process stand-ins for the dask scheduler, its executors and worker
+processes, for testing the code managing them without a cluster.'''
+
+import tornado.gen
+
+from cesium_app.cluster import SharedExecutor
+
+
+class StandInScheduler(object):
+    """Scheduler answering health checks (unless `responding` is False)."""
+    def __init__(self):
+        self.responding = True
+
+    @tornado.gen.coroutine
+    def ncores(self):
+        if not self.responding:
+            raise IOError('Scheduler not responding')
+        return {}
+
+
+class StandInFuture(object):
+    """Future of task `key`, finished with `result` or failed with
+    `error`."""
+    def __init__(self, key, result=None, error=None):
+        self.key = key
+        self.result = result
+        self.error = error
+
+    @tornado.gen.coroutine
+    def _exception(self):
+        return self.error
+
+
+class StandInExecutor(object):
+    """Executor connected to `scheduler` until shut down."""
+    def __init__(self, scheduler=None):
+        self.scheduler = scheduler
+        self.status = 'running'
+
+    @tornado.gen.coroutine
+    def _gather(self, futures):
+        return [future.result for future in futures]
+
+    @tornado.gen.coroutine
+    def _shutdown(self, fast=False):
+        self.status = 'closed'
+
+
+class StandInSharedExecutor(SharedExecutor):
+    """`SharedExecutor` connecting to an in-process `StandInScheduler`."""
+    def __init__(self, **kwargs):
+        SharedExecutor.__init__(self, 'test', health_check_interval=0,
+                                timeout=1, **kwargs)
+        self.scheduler = StandInScheduler()
+
+    @tornado.gen.coroutine
+    def _connect(self):
+        yield self._close()
+        self._executor = StandInExecutor(self.scheduler)
+        self.n_connects += 1
+
+
+class StandInProcess(object):
+    """Worker process that runs until killed (or `returncode` is set)."""
+    pid = -1
+
+    def __init__(self):
+        self.returncode = None
+        self.killed = False
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        pass
+
+    def kill(self):
+        self.killed = True
+        self.returncode = -9
@@ -0,0 +1,71 @@
+import io
+import numpy as np
+import numpy.testing as npt
+import pytest
+from cesium_app import binary_io
+
+
+def test_decode_buffer_ragged():
+    """Test decoding of ragged time series in length-prefixed buffer format"""
+    times = [np.arange(3.), np.arange(5.)]
+    values = [np.random.random(3), np.random.random(5)]
+    errors = [np.ones(3), np.ones(5)]
+    body = binary_io.encode_buffer(times, values, errors)
+    t, m, e = binary_io.decode_ts_data(body, binary_io.BUFFER_CONTENT_TYPE)
+    for decoded, expected in zip((t, m, e), (times, values, errors)):
+        assert len(decoded) == len(expected)
+        for arr, exp in zip(decoded, expected):
+            npt.assert_array_equal(arr, exp)
+            # Zero-copy views into the request body
+            assert not arr.flags.writeable
+
+
+def test_decode_buffer_invalid():
+    """Test that malformed buffers are rejected"""
+    body = binary_io.encode_buffer([np.arange(3.)], [np.arange(3.)])
+    for bad_body in (body[:4], body[:-8], body + b'\x00' * 8):
+        pytest.raises(ValueError, binary_io.decode_ts_data, bad_body,
+                      binary_io.BUFFER_CONTENT_TYPE)
+
+
+def test_decode_buffer_decreasing_offsets():
+    """Test that buffers with decreasing offsets are rejected"""
+    # The length of the data matches the last offset
+    body = (binary_io._BUFFER_HEADER.pack(2, 2) +
+            np.array([0, 5, 3], dtype='<u8').tobytes() +
+            np.zeros(2 * 3, dtype='<f8').tobytes())
+    pytest.raises(ValueError, binary_io.decode_ts_data, body,
+                  binary_io.BUFFER_CONTENT_TYPE)
+
+
+def test_decode_npy():
+    """Test decoding of single and equal-length time series in .npy format"""
+    single = np.random.random((3, 10))
+    f = io.BytesIO()
+    np.save(f, single)
+    t, m, e = binary_io.decode_ts_data(f.getvalue(),
+                                       binary_io.NPY_CONTENT_TYPE)
+    npt.assert_array_equal(np.array([t, m, e]), single)
+
+    multiple = np.random.random((2, 4, 10))
+    f = io.BytesIO()
+    np.save(f, multiple)
+    t, m = binary_io.decode_ts_data(f.getvalue(), binary_io.NPY_CONTENT_TYPE)
+    assert len(t) == len(m) == 4
+    npt.assert_array_equal(np.array([t, m]), multiple)
+
+
+def test_decode_npz_ragged():
+    """Test decoding of ragged time series in .npz format"""
+    f = io.BytesIO()
+    np.savez(f, times=np.arange(7.), values=np.arange(7.) ** 2,
+             offsets=np.array([0, 3, 7]))
+    t, m = binary_io.decode_ts_data(f.getvalue(), binary_io.NPZ_CONTENT_TYPE)
+    npt.assert_array_equal(t[0], [0., 1., 2.])
+    npt.assert_array_equal(m[1], [9., 16., 25., 36.])
+
+    f = io.BytesIO()
+    np.savez(f, times=np.arange(7.), values=np.arange(7.) ** 2,
+             offsets=np.array([0, 3, 6]))
+    pytest.raises(ValueError, binary_io.decode_ts_data, f.getvalue(),
+                  binary_io.NPZ_CONTENT_TYPE)
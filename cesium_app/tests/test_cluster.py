@@ -0,0 +1,45 @@
+import tornado.ioloop
+
+from cesium_app.tests.stand_ins import (StandInScheduler,
+                                        StandInSharedExecutor)
+
+
+def test_shared_executor_reused():
+    """Test that requests share one connection until it is closed"""
+    loop = tornado.ioloop.IOLoop()
+    shared = StandInSharedExecutor(loop=loop)
+    first = loop.run_sync(shared.get)
+    assert loop.run_sync(shared.get) is first
+    assert shared.n_connects == 1
+
+    # A closed connection is replaced on the next request
+    first.status = 'closed'
+    assert loop.run_sync(shared.get) is not first
+    assert shared.n_connects == 2
+    loop.close()
+
+
+def test_shared_executor_health_check():
+    """Test that only lost connections are replaced by health checks"""
+    loop = tornado.ioloop.IOLoop()
+    shared = StandInSharedExecutor(loop=loop)
+    assert loop.run_sync(shared.check_health)
+    executor = loop.run_sync(shared.get)
+
+    # A slow scheduler does not cancel the tasks in flight by closing the
+    # connection...
+    shared.scheduler.responding = False
+    for i in range(5):
+        assert not loop.run_sync(shared.check_health)
+        assert loop.run_sync(shared.get) is executor
+    assert executor.status == 'running'
+    assert shared.n_failures == 5
+
+    # ...but a lost connection (e.g. to a restarted scheduler) is replaced
+    executor.status = 'closed'
+    shared.scheduler = StandInScheduler()
+    assert loop.run_sync(shared.check_health)
+    assert loop.run_sync(shared.get) is not executor
+    assert shared.n_connects == 2
+    assert shared.n_failures == 0
+    loop.close()
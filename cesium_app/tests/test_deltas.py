@@ -0,0 +1,43 @@
+from cesium_app import deltas
+from cesium_app.tests.fixtures import (create_test_project,
+                                       create_test_dataset,
+                                       create_test_featureset,
+                                       create_test_model,
+                                       create_test_prediction)
+
+
+def test_updated_delta():
+    with create_test_project() as p:
+        with create_test_dataset(p) as ds:
+            delta = deltas.updated(ds)
+            assert delta['collection'] == 'datasets'
+            assert delta['id'] == ds.id
+            # As returned by the list endpoint
+            assert delta['item'] == ds.display_info()
+            assert deltas.updated(ds)['version'] >= delta['version']
+
+
+def test_deleted_delta_cascade():
+    with create_test_project() as p:
+        with create_test_dataset(p) as ds:
+            with create_test_featureset(p) as fs:
+                with create_test_model(fs) as model:
+                    with create_test_prediction(ds, model) as prediction:
+                        # Results are left out of prediction deltas
+                        item = deltas.updated(prediction)['item']
+                        assert 'results' not in item
+                        assert item['finished'] == prediction.finished
+
+                        delta = deltas.deleted(fs)
+                        assert delta['deleted']
+                        assert delta['cascade'] == {
+                            'models': [model.id],
+                            'predictions': [prediction.id]}
+
+                        delta = deltas.deleted(p)
+                        assert delta['cascade']['datasets'] == [ds.id]
+                        assert delta['cascade']['predictions'] == [
+                            prediction.id]
+
+                        assert 'cascade' not in deltas.deleted(
+                            prediction, cascade=False)
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from cesium_app import featureset_cache
+from cesium_app.config import cfg
+
+
+def _loader(calls):
+    def load(path):
+        calls.append(path)
+        return pd.DataFrame({'amplitude': np.arange(1000.)}), np.zeros(1000)
+    return load
+
+
+def test_featureset_cache(monkeypatch):
+    """Test caching, reloading after modification, and eviction"""
+    monkeypatch.setitem(cfg['models'], 'featureset_cache_max_memory_percent',
+                        100)
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    os.close(fd)
+    calls = []
+    try:
+        data = featureset_cache.get(path, _loader(calls))
+        assert featureset_cache.get(path, _loader(calls)) is data
+        assert len(calls) == 1
+
+        os.utime(path, (0, 0))
+        assert featureset_cache.get(path, _loader(calls)) is not data
+        assert len(calls) == 2
+
+        assert featureset_cache.evict(path) == 1
+        featureset_cache.get(path, _loader(calls))
+        assert len(calls) == 3
+    finally:
+        featureset_cache.evict(path)
+        os.remove(path)
+
+
+def test_featureset_cache_size_limit(monkeypatch):
+    """Test that least recently used feature sets are evicted"""
+    monkeypatch.setitem(cfg['models'], 'featureset_cache_size_mb', 0.02)
+    monkeypatch.setitem(cfg['models'], 'featureset_cache_max_memory_percent',
+                        100)
+    paths = []
+    calls = []
+    try:
+        for i in range(3):
+            fd, path = tempfile.mkstemp(suffix='.nc')
+            os.close(fd)
+            paths.append(path)
+            featureset_cache.get(path, _loader(calls))
+        # Each entry takes ~16kB, so only the last one is kept
+        featureset_cache.get(paths[-1], _loader(calls))
+        assert len(calls) == 3
+        featureset_cache.get(paths[0], _loader(calls))
+        assert len(calls) == 4
+    finally:
+        for path in paths:
+            featureset_cache.evict(path)
+            os.remove(path)
@@ -0,0 +1,87 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+from sklearn.ensemble import (RandomForestClassifier, RandomForestRegressor,
+                              ExtraTreesClassifier, ExtraTreesRegressor)
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import GridSearchCV
+from cesium_app.ext import flat_forest
+
+
+@pytest.fixture(params=['numpy', 'loop'])
+def traversal(request, monkeypatch):
+    """Run tests with both the vectorized and the (compiled) loop traversal"""
+    impl = getattr(flat_forest, '_accumulate_leaf_values_' + request.param)
+    if request.param == 'loop' and flat_forest.numba is not None:
+        impl = flat_forest.numba.njit(impl)
+    monkeypatch.setattr(flat_forest, '_accumulate_leaf_values', impl)
+
+
+def _sample_data(n_samples=200, n_features=6, n_classes=3):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(n_samples, n_features))
+    y_class = np.array(['class_{}'.format(i) for i in
+                        rng.randint(n_classes, size=n_samples)])
+    y_regr = X[:, 0] + 0.5 * X[:, 1] ** 2 + rng.normal(size=n_samples)
+    return X, y_class, y_regr
+
+
+@pytest.mark.parametrize('model_cls', [RandomForestClassifier,
+                                       ExtraTreesClassifier])
+def test_flat_forest_classifier(model_cls, traversal):
+    """Test that flattened classifiers match scikit-learn output"""
+    X, y, _ = _sample_data()
+    model = model_cls(n_estimators=20, random_state=0).fit(X, y)
+    flat = flat_forest.flatten_forest(model)
+    assert isinstance(flat, flat_forest.FlatForestClassifier)
+    npt.assert_array_equal(flat.classes_, model.classes_)
+
+    X_test = np.random.RandomState(1).normal(size=(500, X.shape[1]))
+    npt.assert_allclose(flat.predict_proba(X_test),
+                        model.predict_proba(X_test))
+    npt.assert_array_equal(flat.predict(X_test), model.predict(X_test))
+
+
+@pytest.mark.parametrize('model_cls', [RandomForestRegressor,
+                                       ExtraTreesRegressor])
+def test_flat_forest_regressor(model_cls, traversal):
+    """Test that flattened regressors match scikit-learn output"""
+    X, _, y = _sample_data()
+    model = model_cls(n_estimators=20, random_state=0).fit(X, y)
+    flat = flat_forest.flatten_forest(model)
+    assert not hasattr(flat, 'predict_proba')
+
+    X_test = np.random.RandomState(1).normal(size=(500, X.shape[1]))
+    npt.assert_allclose(flat.predict(X_test), model.predict(X_test))
+
+
+def test_traversals_agree_on_nan():
+    """Test that both traversals send missing feature values the same way"""
+    X, y, _ = _sample_data()
+    flat = flat_forest.flatten_forest(
+        RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y))
+    X_test = np.random.RandomState(1).normal(size=(50, X.shape[1]))
+    X_test[::2, :] = np.nan
+    X_test = X_test.astype(np.float32)
+    outs = []
+    for impl in [flat_forest._accumulate_leaf_values_numpy,
+                 flat_forest._accumulate_leaf_values_loop]:
+        out = np.zeros((X_test.shape[0], flat.leaf_values.shape[1]))
+        impl(X_test, flat.roots, flat.children_left, flat.children_right,
+             flat.feature, flat.threshold, flat.leaf_values, out)
+        outs.append(out)
+    npt.assert_array_equal(*outs)
+
+
+def test_flatten_grid_search_and_unsupported():
+    """Test flattening of GridSearchCV and rejection of other models"""
+    X, y, y_regr = _sample_data()
+    model = GridSearchCV(RandomForestClassifier(random_state=0),
+                         {'n_estimators': [5, 10]}, cv=2).fit(X, y)
+    assert flat_forest.is_flattenable(model)
+    flat = flat_forest.flatten_forest(model)
+    npt.assert_allclose(flat.predict_proba(X), model.predict_proba(X))
+
+    linear = LinearRegression().fit(X, y_regr)
+    assert not flat_forest.is_flattenable(linear)
+    pytest.raises(ValueError, flat_forest.flatten_forest, linear)
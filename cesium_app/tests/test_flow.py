@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+
+import zmq
+
+from cesium_app.flow import Flow
+
+
+def test_flow_delivers_in_order():
+    address = 'ipc://' + os.path.join(tempfile.mkdtemp(), 'flow_in')
+    sub = zmq.Context.instance().socket(zmq.SUB)
+    sub.bind(address)
+    sub.setsockopt(zmq.SUBSCRIBE, b'')
+    sub.setsockopt(zmq.RCVTIMEO, 5000)
+
+    flow = Flow(address, batch_size=10, connect_delay=0.2)
+    # Pushed before the connection is up, but not lost
+    for i in range(25):
+        flow.push('testuser', 'cesium/TEST', {'i': i})
+    assert flow.flush(timeout=5)
+    assert flow.queue_depth() == 0
+
+    received = []
+    for i in range(25):
+        channel, data = sub.recv().decode('utf-8').split(' ', 1)
+        received.append(json.loads(data))
+    assert [data['payload']['i'] for data in received] == list(range(25))
+    assert all(data['user'] == 'testuser' for data in received)
+    assert flow.n_sent == 25
+    assert flow.n_batches >= 3
+    sub.close()
+
+
+def test_flow_instance_shared():
+    assert Flow.instance() is Flow.instance()
+
+
+def test_flow_drops_when_full():
+    flow = Flow('ipc://' + os.path.join(tempfile.mkdtemp(), 'flow_in'),
+                queue_size=5, connect_delay=60)
+    for i in range(10):
+        flow.push('testuser', 'cesium/TEST')
+    assert flow.n_dropped == 5
+    assert flow.queue_depth() == 5
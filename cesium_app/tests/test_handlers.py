@@ -0,0 +1,94 @@
+import json
+import os
+import uuid
+from os.path import join as pjoin
+
+import tornado.testing
+
+from cesium_app import app_server
+from cesium_app.handlers.model import _model_fingerprint
+from cesium_app import models as m
+from cesium_app.config import cfg
+from cesium_app.tests.fixtures import (create_test_project,
+                                       create_test_dataset,
+                                       create_test_featureset,
+                                       create_test_model)
+
+
+def test_unseeded_builds_not_fingerprinted():
+    """Randomized models are only reused if built with a fixed seed."""
+    args = ('checksum', 'RandomForestClassifier')
+    assert _model_fingerprint(*args, {'n_estimators': 10}, {}, {}, False) is None
+    assert _model_fingerprint(*args, {'random_state': None}, {}, {},
+                              False) is None
+    seeded = _model_fingerprint(*args, {'random_state': 0}, {}, {}, False)
+    assert seeded == _model_fingerprint(*args, {'random_state': 0}, {}, {},
+                                        False)
+    assert _model_fingerprint('checksum', 'LinearRegressor', {}, {}, {},
+                              False) is not None
+
+
+class TestPredictionHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return app_server.make_app()
+
+    def test_results_of_queued_prediction(self):
+        """Results of a prediction whose job is still queued are reported as
+        in progress, rather than read from a file not written yet."""
+        with create_test_project() as p, create_test_dataset(p) as ds, \
+                create_test_featureset(p) as fs, \
+                create_test_model(fs) as model:
+            pred_path = pjoin(cfg['paths']['predictions_folder'],
+                              '{}.nc'.format(uuid.uuid4()))
+            prediction = m.Prediction.create(file=m.File.create(uri=pred_path),
+                                             dataset=ds, project=p,
+                                             model=model)
+            m.Job.create(type='predict', project=p,
+                         username='testuser@gmail.com',
+                         target_id=prediction.id)
+            assert not os.path.exists(pred_path)
+
+            for action in ['results?name={}'.format(ds.file_names[0]),
+                           'download']:
+                response = self.fetch('/predictions/{}/{}'.format(
+                    prediction.id, action))
+                assert response.code == 200
+                data = json.loads(response.body.decode('utf-8'))
+                assert data['status'] == 'error'
+                assert 'in progress' in data['message']
+
+    def test_invalid_top_k(self):
+        """Predictions requesting fewer than one top class, or a number of
+        top classes that is not an integer, are refused."""
+        with create_test_project() as p, create_test_dataset(p) as ds, \
+                create_test_featureset(p) as fs, \
+                create_test_model(fs) as model:
+            for top_k in [0, -1, 'abc', None]:
+                response = self.fetch('/predictions', method='POST',
+                                      body=json.dumps({'datasetID': ds.id,
+                                                       'modelID': model.id,
+                                                       'topK': top_k}))
+                assert response.code == 200
+                data = json.loads(response.body.decode('utf-8'))
+                assert data['status'] == 'error'
+                assert 'top classes' in data['message']
+            assert not model.predictions.exists()
+
+
+class TestModelHandler(tornado.testing.AsyncHTTPTestCase):
+    def get_app(self):
+        return app_server.make_app()
+
+    def test_grow_non_ensemble(self):
+        """Only ensemble models can be grown, even if they take
+        `warm_start`."""
+        with create_test_project() as p, create_test_featureset(p) as fs, \
+                create_test_model(fs, 'LinearSGDClassifier') as model:
+            response = self.fetch('/models/{}/grow'.format(model.id),
+                                  method='POST',
+                                  body=json.dumps({'nEstimators': 20}))
+            assert response.code == 200
+            data = json.loads(response.body.decode('utf-8'))
+            assert data['status'] == 'error'
+            assert 'cannot be grown' in data['message']
+            assert not model.children.exists()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import numpy as np
+import xarray as xr
+from sklearn.linear_model import SGDClassifier
+from cesium_app import incremental
+
+
+def _sample_featureset(path, n_samples=3000, n_features=4):
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(n_samples, n_features))
+    y = np.where(X[:, 0] + X[:, 1] > 0, 'Mira', 'Classical_Cepheid')
+    # Sort by class, so that chunks must be shuffled to train well
+    order = np.argsort(y, kind='mergesort')
+    X, y = X[order], y[order]
+    fset = xr.Dataset({'f{}'.format(i): ('name', X[:, i])
+                       for i in range(n_features)},
+                      coords={'name': np.arange(n_samples).astype(str)})
+    fset['target'] = ('name', y)
+    fset.to_netcdf(path)
+    return X, y
+
+
+def test_iter_chunks():
+    """Test that shuffled chunks cover every row exactly once"""
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    os.close(fd)
+    try:
+        _sample_featureset(path, n_samples=1050)
+        with xr.open_dataset(path) as fset:
+            chunks = list(incremental.iter_chunks(
+                fset, 100, shuffle_chunks=3,
+                random_state=np.random.RandomState(0)))
+        assert max(len(y) for X, y in chunks) == 100
+        names = np.concatenate([X.index.values for X, y in chunks])
+        assert sorted(names) == sorted(np.arange(1050).astype(str))
+    finally:
+        os.remove(path)
+
+
+def test_fit_incremental():
+    """Test that incremental training is comparable to in-memory training"""
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    os.close(fd)
+    try:
+        X, y = _sample_featureset(path)
+        model, score = incremental.fit_incremental(
+            path, 'LinearSGDClassifier', {'random_state': 0}, n_passes=5,
+            chunk_size=200, shuffle_chunks=2)
+        assert isinstance(model, SGDClassifier)
+        full_score = SGDClassifier(random_state=0).fit(X, y).score(X, y)
+        assert score > full_score - 0.05
+        assert np.isclose(score, model.score(X, y))
+    finally:
+        os.remove(path)
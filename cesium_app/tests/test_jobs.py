@@ -0,0 +1,150 @@
+import collections
+
+import peewee as pw
+import pytest
+import tornado.gen
+import tornado.ioloop
+
+from cesium_app import jobs
+from cesium_app import models as m
+from cesium_app.tests.fixtures import create_test_project
+from cesium_app.tests.stand_ins import StandInSharedExecutor
+
+
+_Target = collections.namedtuple('_Target', ['id', 'project'])
+_results = {}
+_completed = []
+
+
+@tornado.gen.coroutine
+def _run(executor, job):
+    if job.params.get('deleted'):
+        raise pw.DoesNotExist()
+    if job.params.get('fail'):
+        raise OSError('Disk on fire')
+    return job.params['value']
+
+
+def _succeeded(job, result):
+    _results[job.id] = result
+    _completed.append(job.id)
+    return 'Done'
+
+
+def _failed(job, error):
+    _results[job.id] = None
+    return 'Failed'
+
+
+jobs.register('test', _run, _succeeded, _failed)
+
+
+def _run_jobs(manager, loop):
+    """Run the loop until all jobs spawned by `manager` have finished."""
+    @tornado.gen.coroutine
+    def wait():
+        while manager._running:
+            yield tornado.gen.sleep(0.01)
+    loop.run_sync(wait)
+
+
+def test_job_states():
+    """Test that jobs end up completed, failed or cancelled"""
+    loop = tornado.ioloop.IOLoop()
+    manager = jobs.JobManager(StandInSharedExecutor(loop=loop),
+                              max_retries=1, loop=loop)
+    with create_test_project() as p:
+        target = _Target(1, p)
+        success = manager.submit('test', target, 'testuser@gmail.com',
+                                 {'value': 42})
+        failure = manager.submit('test', target, 'testuser@gmail.com',
+                                 {'fail': True})
+        cancelled = manager.submit('test', target, 'testuser@gmail.com',
+                                   {'deleted': True})
+        _run_jobs(manager, loop)
+
+        success = m.Job.get(m.Job.id == success.id)
+        assert success.state == 'completed'
+        assert success.finished >= success.started
+        assert _results[success.id] == 42
+
+        failure = m.Job.get(m.Job.id == failure.id)
+        assert failure.state == 'failed'
+        assert failure.error == 'Disk on fire'
+        assert _results[failure.id] is None
+
+        cancelled = m.Job.get(m.Job.id == cancelled.id)
+        assert cancelled.state == 'cancelled'
+        assert cancelled.id not in _results
+    loop.close()
+
+
+def test_reconcile_interrupted_jobs():
+    """Test that interrupted jobs are resumed, up to `max_retries` times"""
+    loop = tornado.ioloop.IOLoop()
+    manager = jobs.JobManager(StandInSharedExecutor(loop=loop),
+                              max_retries=1, loop=loop)
+    with create_test_project() as p:
+        # Jobs left unfinished by a previous run of the server
+        resumed = m.Job.create(type='test', project=p, target_id=1,
+                               username='testuser@gmail.com',
+                               params={'value': 7}, state='running')
+        exhausted = m.Job.create(type='test', project=p, target_id=1,
+                                 username='testuser@gmail.com',
+                                 params={'value': 7}, state='running',
+                                 retries=1)
+        loop.run_sync(manager.reconcile)
+        _run_jobs(manager, loop)
+
+        resumed = m.Job.get(m.Job.id == resumed.id)
+        assert resumed.state == 'completed'
+        assert resumed.retries == 1
+        assert _results[resumed.id] == 7
+
+        exhausted = m.Job.get(m.Job.id == exhausted.id)
+        assert exhausted.state == 'failed'
+        assert 'restart' in exhausted.error
+    loop.close()
+
+
+def test_weighted_fair_queuing():
+    """Test that queued jobs are started in proportion to user weights"""
+    loop = tornado.ioloop.IOLoop()
+    manager = jobs.JobManager(StandInSharedExecutor(loop=loop), max_running=1,
+                              user_weights={'b@example.com': 2}, loop=loop)
+    with create_test_project() as p:
+        target = _Target(1, p)
+        a1, a2, a3 = [manager.submit('test', target, 'a@example.com',
+                                     {'value': i}) for i in range(3)]
+        b1 = manager.submit('test', target, 'b@example.com', {'value': 3})
+        assert a1.state == 'running'
+        assert a2.state == b1.state == 'queued'
+        assert manager.queue_depth() == 3
+        assert manager.queue_depth('b@example.com') == 1
+
+        del _completed[:]
+        _run_jobs(manager, loop)
+        # b, with twice the weight, is served ahead of the backlog of a
+        assert _completed == [a1.id, b1.id, a2.id, a3.id]
+    loop.close()
+
+
+def test_queue_full():
+    """Test that users with too many queued jobs are refused"""
+    loop = tornado.ioloop.IOLoop()
+    manager = jobs.JobManager(StandInSharedExecutor(loop=loop), max_running=1,
+                              max_queued_per_user=1, loop=loop)
+    with create_test_project() as p:
+        target = _Target(1, p)
+        manager.submit('test', target, 'a@example.com', {'value': 0})
+        manager.submit('test', target, 'a@example.com', {'value': 1})
+        with pytest.raises(jobs.QueueFull) as e:
+            manager.check_capacity('a@example.com')
+        assert e.value.status_code == 429
+        # Other users are still admitted
+        manager.check_capacity('b@example.com')
+        manager.submit('test', target, 'b@example.com', {'value': 3})
+        _run_jobs(manager, loop)
+        # Users without jobs are forgotten
+        assert manager._last_finish == {}
+    loop.close()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import numpy as np
+import numpy.testing as npt
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import GridSearchCV
+from cesium_app import model_io
+
+
+def test_save_load_model_mmap():
+    """Test that saved models are memory-mapped and cached on load"""
+    X = np.random.random((20, 3))
+    y = np.arange(20) % 2
+    model = SGDClassifier().fit(X, y)
+    fd, path = tempfile.mkstemp(suffix='.pkl')
+    os.close(fd)
+    try:
+        model_io.save_model(model, path)
+        loaded = model_io.load_model(path)
+        assert isinstance(loaded.coef_, np.memmap)
+        npt.assert_array_equal(loaded.predict(X), model.predict(X))
+        assert model_io.load_model(path) is loaded
+        # Cached separately for each `mmap_mode`
+        in_memory = model_io.load_model(path, mmap_mode=None)
+        assert not isinstance(in_memory.coef_, np.memmap)
+        assert model_io.load_model(path) is loaded
+    finally:
+        os.remove(path)
+
+
+def test_save_best_estimator_compressed():
+    """Test that only the best estimator of a search is saved"""
+    X = np.random.random((30, 3))
+    y = np.arange(30) % 2
+    search = GridSearchCV(SGDClassifier(), {'alpha': [1e-4, 1e-3]},
+                          cv=2).fit(X, y)
+    fd, path = tempfile.mkstemp(suffix='.pkl')
+    os.close(fd)
+    try:
+        size = model_io.save_model(search, path, compress=3)
+        assert size == os.path.getsize(path)
+        loaded = model_io.load_model(path, cache=False)
+        assert isinstance(loaded, SGDClassifier)
+        assert loaded.alpha == search.best_params_['alpha']
+        npt.assert_array_equal(loaded.predict(X), search.predict(X))
+    finally:
+        os.remove(path)
@@ -0,0 +1,64 @@
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+from sklearn.model_selection import GridSearchCV, cross_validate
+from cesium_app import model_search
+
+
+def test_fit_and_score_matches_grid_search():
+    """Test that per-fold scores match those computed by GridSearchCV"""
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame(rng.normal(size=(60, 4)), columns=list('abcd'))
+    y = np.array(['Mira', 'Classical_Cepheid'])[(X.a > 0).astype(int)]
+    params = {'n_estimators': 5, 'random_state': 0}
+    grid = {'max_depth': [1, 3]}
+
+    model = model_search.make_model('RandomForestClassifier', params)
+    search = GridSearchCV(model, grid, cv=model_search.N_FOLDS).fit(X, y)
+    for i, max_depth in enumerate(grid['max_depth']):
+        scores = [model_search._fit_and_score(
+                      (X, y), 'RandomForestClassifier',
+                      dict(params, max_depth=max_depth), fold,
+                      model_search.N_FOLDS)
+                  for fold in range(model_search.N_FOLDS)]
+        npt.assert_allclose(scores, [
+            search.cv_results_['split{}_test_score'.format(fold)][i]
+            for fold in range(model_search.N_FOLDS)])
+
+
+def test_halving_schedule():
+    """Test number of candidates in each round of successive halving"""
+    assert model_search._halving_schedule(1) == [1]
+    assert model_search._halving_schedule(9) == [9, 3]
+    assert model_search._halving_schedule(96) == [96, 32, 11, 4, 2]
+
+
+def test_fit_and_score_subsample():
+    """Test fitting on a fraction of the training samples"""
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame(rng.normal(size=(300, 4)), columns=list('abcd'))
+    y = (X.a > 0).values
+    params = {'n_estimators': 5, 'random_state': 0}
+    score = model_search._fit_and_score((X, y), 'RandomForestClassifier',
+                                        params, 0, 3, sample_fraction=0.1)
+    assert 0.5 < score <= 1.
+
+
+def test_fit_and_evaluate_matches_cross_validate():
+    """Test per-fold metrics against scikit-learn's cross_validate"""
+    rng = np.random.RandomState(0)
+    X = pd.DataFrame(rng.normal(size=(60, 4)), columns=list('abcd'))
+    y = np.array(['Mira', 'Classical_Cepheid'])[(X.a > 0).astype(int)]
+    params = {'n_estimators': 5, 'random_state': 0}
+
+    model = model_search.make_model('RandomForestClassifier', params)
+    expected = cross_validate(model, X, y, cv=model_search.N_FOLDS,
+                              scoring=['accuracy', 'f1_macro'])
+    for fold in range(model_search.N_FOLDS):
+        metrics = model_search._fit_and_evaluate(
+            (X, y), 'RandomForestClassifier', params, fold,
+            model_search.N_FOLDS)
+        npt.assert_allclose(metrics['accuracy'],
+                            expected['test_accuracy'][fold])
+        npt.assert_allclose(metrics['f1_macro'],
+                            expected['test_f1_macro'][fold])
@@ -2,7 +2,11 @@ import os
 import tempfile
 
 from cesium_app import models as m
-from cesium_app.tests.fixtures import create_test_project, create_test_dataset
+from cesium_app.tests.fixtures import (create_test_project,
+                                       create_test_dataset,
+                                       create_test_featureset,
+                                       create_test_model,
+                                       create_test_prediction)
 
 
 def test_file_delete():
@@ -22,3 +26,38 @@ def test_dataset_delete():
         assert all(os.path.exists(f) for f in uris)
         ds.delete_instance()
         assert not any(os.path.exists(f) for f in uris)
+
+
+def test_file_ref_count():
+    """Test that a shared `File` is only removed once no longer referenced."""
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    f = m.File.create(uri=path)
+    assert m.File.share(path).ref_count == 2
+    f.release()
+    assert m.File.get(m.File.uri == path).ref_count == 1
+    assert os.path.exists(path)
+    f.release()
+    assert not os.path.exists(path)
+    assert not m.File.select().where(m.File.uri == path).exists()
+
+
+def test_project_delete_releases_files():
+    """Test that deleting a `Project` releases the files of the models and
+    predictions deleted along with it."""
+    p = create_test_project().__enter__()  # skip cleanup steps
+    ds = create_test_dataset(p).__enter__()
+    fs = create_test_featureset(p).__enter__()
+    model = create_test_model(fs).__enter__()
+    prediction = create_test_prediction(ds, model).__enter__()
+    # Also referenced elsewhere, e.g. by a model of another project
+    model_path = model.file.uri
+    shared = m.File.share(model_path)
+    uris = ds.uris + [prediction.index_file.uri]
+
+    p.delete_instance()
+    assert m.File.get(m.File.uri == model_path).ref_count == 1
+    assert os.path.exists(model_path)
+    assert not any(os.path.exists(uri) for uri in uris)
+    shared.release()
+    assert not os.path.exists(model_path)
@@ -0,0 +1,65 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+import xarray as xr
+from cesium import featureset
+from cesium_app import prediction_store
+from cesium_app.config import cfg
+from cesium_app.tests.fixtures import (create_test_project, create_test_dataset,
+                                       create_test_featureset, create_test_model,
+                                       create_test_prediction)
+
+
+def test_find_row():
+    """Test lookup of rows in name index"""
+    names = ['c', '10', 'a', '2']
+    index = prediction_store.build_name_index(names)
+    npt.assert_array_equal(index['name'], sorted(names))
+    for row, name in enumerate(names):
+        assert prediction_store.find_row(index, name) == row
+    pytest.raises(KeyError, prediction_store.find_row, index, 'b')
+
+
+def test_top_k_predictions():
+    """Test truncation of class probabilities to the k most likely labels"""
+    probs = np.random.RandomState(0).dirichlet(np.ones(6), size=5)
+    labels = np.array(['class_{}'.format(i) for i in range(6)])
+    predset = xr.Dataset({'prediction': (('name', 'class_label'), probs)},
+                         coords={'name': list('abcde'),
+                                 'class_label': labels})
+
+    top = prediction_store.top_k_predictions(predset, 3)
+    assert top.attrs == {'top_k': 3, 'n_classes': 6, 'truncated': 1}
+    assert top.prediction.dtype == np.float32
+    assert top.prediction.dims == ('name', 'rank')
+    for i, name in enumerate(predset.name.values):
+        order = np.argsort(-probs[i])[:3]
+        row = top.sel(name=name)
+        npt.assert_array_equal(row.class_label.values, labels[order])
+        npt.assert_allclose(row.prediction.values, probs[i, order],
+                            rtol=1e-6)
+
+    assert prediction_store.top_k_predictions(predset, 10).truncated == 0
+    assert prediction_store.top_k_predictions(predset, 0) is predset
+
+
+def test_load_prediction_row():
+    """Test loading of single time series predictions"""
+    with create_test_project() as p, create_test_dataset(p) as ds,\
+         create_test_featureset(p) as fs, create_test_model(fs) as m,\
+         create_test_prediction(ds, m) as pred:
+        pset = featureset.from_netcdf(pred.file.uri)
+        for name in pset.name.values:
+            expected = pset.sel(name=name)
+            for index_path in (pred.index_file.uri, None):
+                row = prediction_store.load_prediction_row(
+                    pred.file.uri, str(name), index_path,
+                    engine=cfg['xr_engine'])
+                assert row.target.values.item() == \
+                    expected.target.values.item()
+                npt.assert_array_equal(row.class_label.values,
+                                       expected.class_label.values)
+                npt.assert_array_almost_equal(row.prediction.values,
+                                              expected.prediction.values)
+        pytest.raises(KeyError, prediction_store.load_prediction_row,
+                      pred.file.uri, 'no_such_name', pred.index_file.uri)
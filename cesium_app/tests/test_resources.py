@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+import tornado.ioloop
+
+from cesium_app import resources
+from cesium_app.config import cfg
+
+
+def test_estimate_memory(monkeypatch):
+    """Test that memory estimates grow with file sizes, up to the memory of
+    a worker"""
+    monkeypatch.setitem(cfg['cluster'], 'task_memory_base_mb', 1)
+    monkeypatch.setitem(cfg['cluster'], 'task_memory_factor', 10)
+    monkeypatch.setitem(cfg['cluster'], 'worker_memory_mb', 2)
+    monkeypatch.setitem(cfg['cluster'], 'memory_resources', True)
+    fd, path = tempfile.mkstemp(suffix='.nc')
+    loop = tornado.ioloop.IOLoop()
+    try:
+        os.write(fd, b'\0' * 2 ** 16)
+        os.close(fd)
+        assert resources.estimate_memory([]) == 2 ** 20
+        assert resources.estimate_memory([path]) == 2 ** 20 + 10 * 2 ** 16
+        # Missing files (e.g. not yet written) are ignored
+        assert loop.run_sync(lambda: resources.task_resources(
+            [path, path], [path + '.missing'])) == [
+                {'MEMORY': 2 * 2 ** 20}, {'MEMORY': 2 ** 20}]
+    finally:
+        loop.close()
+        os.remove(path)
+
+
+def test_no_resources_unless_enabled(monkeypatch):
+    """Test that tasks do not request memory that only local workers
+    advertise unless enabled"""
+    monkeypatch.setitem(cfg['cluster'], 'memory_resources', False)
+    loop = tornado.ioloop.IOLoop()
+    try:
+        assert loop.run_sync(lambda: resources.task_resources(
+            ['a.nc'], [])) == [None, None]
+    finally:
+        loop.close()
@@ -0,0 +1,103 @@
+import tornado.ioloop
+
+from cesium_app import retry
+from cesium_app.config import cfg
+from cesium_app.tests.stand_ins import StandInExecutor, StandInFuture
+
+
+class KilledWorker(Exception):
+    pass
+
+
+def _flaky(errors, result):
+    """Task submitter failing with each of `errors` in turn, then returning
+    `result`."""
+    submitted = []
+
+    def submit(pure):
+        submitted.append(pure)
+        error = errors[len(submitted) - 1] if len(submitted) <= len(errors) \
+            else None
+        return StandInFuture(len(submitted), result, error)
+    submit.submitted = submitted
+    return submit
+
+
+def test_is_transient():
+    """Test which errors are considered transient"""
+    assert retry.is_transient(OSError('NFS unavailable'))
+    assert retry.is_transient(KilledWorker())
+    assert retry.is_transient(ConnectionResetError())
+    assert not retry.is_transient(ValueError('Bad input'))
+    assert not retry.is_transient(FileNotFoundError('featureset.nc'))
+    assert not retry.is_transient(PermissionError('featureset.nc'))
+
+
+def test_retry_delay():
+    """Test that retry delays back off exponentially, up to a maximum"""
+    assert retry.retry_delay(0) == cfg['jobs']['retry_delay']
+    assert retry.retry_delay(1) == 2 * cfg['jobs']['retry_delay']
+    assert retry.retry_delay(100) == cfg['jobs']['max_retry_delay']
+
+
+def test_gather_retries_transient_errors(monkeypatch):
+    """Test that only transient errors are retried, with impure tasks"""
+    monkeypatch.setitem(cfg['jobs'], 'retry_delay', 0)
+    loop = tornado.ioloop.IOLoop()
+    executor = StandInExecutor()
+
+    submit = _flaky([KilledWorker(), OSError()], 'result')
+    assert loop.run_sync(lambda: retry.gather(executor, [submit])) == \
+        ['result']
+    # Retries are impure, so that the failed task is not reused
+    assert submit.submitted == [True, False, False]
+
+    # Other errors are raised right away...
+    submit = _flaky([ValueError('Bad input')], 'result')
+    try:
+        loop.run_sync(lambda: retry.result(executor, submit))
+        assert False
+    except ValueError:
+        assert submit.submitted == [True]
+
+    # ...and transient ones once there are no retries left
+    submit = _flaky([OSError()] * 3, 'result')
+    try:
+        loop.run_sync(lambda: retry.result(executor, submit, retries=2))
+        assert False
+    except OSError:
+        assert len(submit.submitted) == 3
+    loop.close()
+
+
+def test_wait_returns_successful_future(monkeypatch):
+    """Test that waiting for a dependency returns the future of the attempt
+    that succeeded"""
+    monkeypatch.setitem(cfg['jobs'], 'retry_delay', 0)
+    loop = tornado.ioloop.IOLoop()
+    submit = _flaky([KilledWorker()], 'training data')
+    future = loop.run_sync(lambda: retry.wait(submit))
+    assert (future.key, future.result) == (2, 'training data')
+
+    submit = _flaky([FileNotFoundError('featureset.nc')], 'training data')
+    try:
+        loop.run_sync(lambda: retry.wait(submit))
+        assert False
+    except FileNotFoundError:
+        assert submit.submitted == [True]
+    loop.close()
+
+
+def test_wait_items_records_failures(monkeypatch):
+    """Test that items that cannot be computed are left out and recorded"""
+    monkeypatch.setitem(cfg['jobs'], 'retry_delay', 0)
+    loop = tornado.ioloop.IOLoop()
+    submits = {'a.nc': _flaky([OSError()], 'a'),
+               'b.nc': _flaky([ValueError('Bad file')], 'b'),
+               'c.nc': _flaky([], 'c')}
+
+    futures, failed = loop.run_sync(lambda: retry.wait_items(
+        lambda item, pure: submits[item](pure), ['a.nc', 'b.nc', 'c.nc']))
+    assert [future.result for future in futures] == ['a', 'c']
+    assert failed == {'b.nc': 'ValueError: Bad file'}
+    loop.close()
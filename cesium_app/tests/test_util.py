@@ -90,6 +90,31 @@ def test_check_model_param_types():
                   model_type, params)
 
 
+def test_check_model_param_types_search_options():
+    """Test validation of hyperparameter search options"""
+    model_type = "RandomForestClassifier (comprehensive)"
+    params = {"n_estimators": [10, 50], "search_strategy": "halving",
+              "search_budget": 10, "halving_resource": "n_estimators"}
+    normal, opt, search = sklearn_models.check_model_param_types(
+        model_type, params, return_search_options=True)
+    assert normal == {}
+    assert opt == {"n_estimators": [10, 50]}
+    assert search == {"search_strategy": "halving", "search_budget": 10,
+                      "halving_resource": "n_estimators"}
+
+    params = {"search_strategy": "grid", "search_budget": None}
+    assert sklearn_models.check_model_param_types(model_type, params) ==\
+        ({}, {})
+
+    for params in [{"search_strategy": "bayesian"}, {"search_budget": 0},
+                   {"halving_resource": "max_depth"}]:
+        pytest.raises(ValueError, sklearn_models.check_model_param_types,
+                      model_type, params)
+
+    pytest.raises(ValueError, sklearn_models.check_model_param_types,
+                  "LinearSGDClassifier", {"search_strategy": "grid"})
+
+
 def test_prediction_to_csv_class():
     """Test util.prediction_to_csv"""
     with create_test_project() as p, create_test_dataset(p) as ds,\
@@ -0,0 +1,239 @@
+import json
+import os
+import sys
+import time
+
+import tornado.gen
+import tornado.ioloop
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..',
+                                'services'))
+from websocket_server import WebSocket
+
+
+class _WebSocket(WebSocket):
+    """`WebSocket` without a network connection."""
+    def __init__(self):
+        self.authenticated = False
+        self.username = None
+        self.last_write = time.time()
+        self.received = []
+        self.participants.add(self)
+        self._init_send_queue()
+
+    def write_message(self, message, binary=False):
+        self.last_write = time.time()
+        self.received.append(message)
+
+    def login(self, username):
+        self._unregister()
+        self.username = username
+        self.authenticated = True
+        self.connections[username].add(self)
+
+
+def _message(user, action):
+    return [('0 ' + json.dumps({'user': user, 'action': action,
+                                'payload': {}})).encode('utf-8')]
+
+
+def test_broadcast_routes_by_user():
+    alice, alice2, bob = _WebSocket(), _WebSocket(), _WebSocket()
+    for p, username in [(alice, 'alice'), (alice2, 'alice'), (bob, 'bob')]:
+        p.login(username)
+
+    WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+    assert len(alice.received) == len(alice2.received) == 1
+    assert bob.received == []
+
+    alice.on_close()
+    bob.on_close()
+    assert 'bob' not in WebSocket.connections
+    WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+    assert len(alice.received) == 1
+    assert len(alice2.received) == 2
+    alice2.on_close()
+    assert not WebSocket.connections
+
+
+def test_heartbeat_only_silent_connections():
+    busy, silent = _WebSocket(), _WebSocket()
+    silent.last_write -= WebSocket.heartbeat_interval
+    WebSocket.heartbeat()
+    assert busy.received == []
+    assert silent.received == [b'<3']
+    busy.on_close()
+    silent.on_close()
+
+
+def test_fetch_actions_coalesced(monkeypatch):
+    monkeypatch.setattr(WebSocket, 'coalesce_window', 0.1)
+    alice = _WebSocket()
+    alice.login('alice')
+
+    @tornado.gen.coroutine
+    def send_burst():
+        for i in range(10):
+            WebSocket.broadcast(_message('alice', 'cesium/FETCH_MODELS'))
+        WebSocket.broadcast(_message('alice', 'cesium/FETCH_PREDICTIONS'))
+        # The first of each is delivered right away...
+        assert len(alice.received) == 2
+        yield tornado.gen.sleep(0.15)
+        # ...and the held back ones once, at the end of the window
+        assert len(alice.received) == 3
+        yield tornado.gen.sleep(0.15)
+        assert len(alice.received) == 3
+        WebSocket.broadcast(_message('alice', 'cesium/FETCH_MODELS'))
+        assert len(alice.received) == 4
+
+    loop = tornado.ioloop.IOLoop()
+    loop.run_sync(send_burst)
+    loop.close()
+    alice.on_close()
+
+
+class _SlowWebSocket(_WebSocket):
+    """`_WebSocket` whose writes only complete when `complete` is called."""
+    def __init__(self):
+        _WebSocket.__init__(self)
+        self.pending = []
+        self.closed = False
+
+    def write_message(self, message, binary=False):
+        _WebSocket.write_message(self, message, binary)
+        future = tornado.gen.Future()
+        self.pending.append(future)
+        return future
+
+    def complete(self):
+        while self.pending:
+            self.pending.pop(0).set_result(None)
+
+    def close(self, code=None, reason=None):
+        self.closed = True
+
+
+def _delta(collection, item_id, version):
+    return [('0 ' + json.dumps({
+        'user': 'alice', 'action': 'cesium/APPLY_DELTA',
+        'payload': {'collection': collection, 'id': item_id,
+                    'version': version}})).encode('utf-8')]
+
+
+def test_send_queue_bounded(monkeypatch):
+    monkeypatch.setattr(WebSocket, 'max_queue', 3)
+    monkeypatch.setattr(WebSocket, 'coalesce_window', 0)
+    alice = _SlowWebSocket()
+    alice.login('alice')
+
+    @tornado.gen.coroutine
+    def send_while_stalled():
+        # The first message is being written; later ones wait
+        WebSocket.broadcast(_delta('models', 1, 1))
+        assert alice.queue_depth == 0
+        WebSocket.broadcast(_delta('models', 2, 2))
+        WebSocket.broadcast(_delta('models', 2, 3))
+        assert alice.queue_depth == 1
+        assert alice.n_replaced == 1
+        WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+        alice.send(b'<3', key='<3')
+        assert alice.queue_depth == 3
+        # Heartbeats are dropped when the queue is full...
+        WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+        assert alice.queue_depth == 3
+        assert alice.n_dropped == 1
+        assert WebSocket.stats()[0]['queue_depth'] == 3
+
+        alice.complete()
+        yield tornado.gen.moment
+        while alice.pending:
+            alice.complete()
+            yield tornado.gen.moment
+        assert alice.queue_depth == 0
+        assert [json.loads(data)['action'] for data in alice.received] == (
+            ['cesium/APPLY_DELTA'] * 2 + ['cesium/SHOW_NOTIFICATION'] * 2)
+        assert not alice.closed
+
+    loop = tornado.ioloop.IOLoop()
+    loop.run_sync(send_while_stalled)
+    loop.close()
+    alice.on_close()
+
+
+def test_dropped_delta_resyncs(monkeypatch):
+    monkeypatch.setattr(WebSocket, 'max_queue', 2)
+    monkeypatch.setattr(WebSocket, 'coalesce_window', 0)
+    alice = _SlowWebSocket()
+    alice.login('alice')
+
+    @tornado.gen.coroutine
+    def send_while_stalled():
+        for i in range(4):
+            WebSocket.broadcast(_delta('models', i, i))
+        # ...but other messages are not, since nothing would replace them:
+        # the client downloads everything again instead
+        assert alice.n_dropped == 2
+        assert alice.queue_depth == 1
+        alice.complete()
+        yield tornado.gen.moment
+        hydrate = json.loads(alice.received[-1])
+        assert hydrate['action'] == 'cesium/HYDRATE'
+        # Including the deltas dropped, which are not to be replayed
+        assert hydrate['seq'] == WebSocket._last_seq['alice']
+
+    loop = tornado.ioloop.IOLoop()
+    loop.run_sync(send_while_stalled)
+    loop.close()
+    alice.on_close()
+
+
+def test_slow_consumer_closed(monkeypatch):
+    monkeypatch.setattr(WebSocket, 'max_queue', 2)
+    monkeypatch.setattr(WebSocket, 'slow_consumer_timeout', 10)
+    alice = _SlowWebSocket()
+    alice.login('alice')
+    for i in range(5):
+        WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+    assert alice.n_dropped == 2
+    assert not alice.closed
+
+    # Still not caught up after `slow_consumer_timeout`
+    alice._full_since -= 10
+    for i in range(2):
+        WebSocket.broadcast(_message('alice', 'cesium/SHOW_NOTIFICATION'))
+    assert alice.closed
+    alice.on_close()
+
+
+def test_replay_on_reconnect(monkeypatch):
+    monkeypatch.setattr(WebSocket, 'coalesce_window', 0)
+    alice = _WebSocket()
+    alice.login('carol')
+    for i in range(3):
+        WebSocket.broadcast(_message('carol', 'cesium/SHOW_NOTIFICATION'))
+    seqs = [json.loads(data)['seq'] for data in alice.received]
+    assert seqs == list(range(seqs[0], seqs[0] + 3))
+    alice.on_close()
+
+    # Missed while disconnected
+    for i in range(2):
+        WebSocket.broadcast(_message('carol', 'cesium/SHOW_NOTIFICATION'))
+
+    reconnected = _WebSocket()
+    reconnected.login('carol')
+    reconnected.replay(WebSocket.epoch, seqs[-1])
+    assert [json.loads(data)['seq'] for data in reconnected.received] == [
+        seqs[-1] + 1, seqs[-1] + 2]
+
+    # Up to date
+    reconnected.received = []
+    reconnected.replay(WebSocket.epoch, seqs[-1] + 2)
+    assert reconnected.received == []
+
+    # Messages no longer kept, or sequence numbers of an earlier server
+    for epoch, last_seq in [(WebSocket.epoch, seqs[0] - 2), ('old', 0)]:
+        reconnected.received = []
+        reconnected.replay(epoch, last_seq)
+        assert [json.loads(data)['action']
+                for data in reconnected.received] == ['cesium/HYDRATE']
+    reconnected.on_close()
@@ -0,0 +1,107 @@
+import time
+
+import tornado.gen
+import tornado.ioloop
+
+from cesium_app.worker_pool import WorkerPool
+from cesium_app.tests.stand_ins import StandInProcess, StandInSharedExecutor
+
+
+class _TestWorkerPool(WorkerPool):
+    """`WorkerPool` with stand-in worker processes and scheduler."""
+    def __init__(self, **kwargs):
+        WorkerPool.__init__(self, executor=StandInSharedExecutor(),
+                            min_workers=1, max_workers=4, tasks_per_worker=2,
+                            max_memory_percent=100, scale_interval=1,
+                            **kwargs)
+        self.n_tasks = {}
+        self.n_unassigned = 0
+        self.retired = []
+
+    def _start_worker(self):
+        self._n_started += 1
+        name = 'worker-{}'.format(self._n_started)
+        self._processes[name] = StandInProcess()
+        self._last_busy[name] = time.time()
+
+    def _stop_worker(self, name):
+        del self._processes[name]
+        self._last_busy.pop(name, None)
+
+    def worker_memory(self):
+        return {name: 0 for name in self._processes}
+
+    @tornado.gen.coroutine
+    def _scheduler_state(self):
+        addresses = {name: name for name in self._processes}
+        return addresses, {name: self.n_tasks.get(name, 0)
+                           for name in self._processes}, self.n_unassigned
+
+    @tornado.gen.coroutine
+    def _retire(self, names, addresses):
+        self.retired.extend(names)
+        for name in names:
+            self._stop_worker(name)
+
+
+def test_worker_pool_scaling():
+    """Test that the pool grows with the backlog and retires idle workers"""
+    loop = tornado.ioloop.IOLoop()
+    pool = _TestWorkerPool(idle_timeout=60)
+    loop.run_sync(pool.scale)
+    assert len(pool._processes) == pool.min_workers
+
+    # Grows with the backlog, up to `max_workers`
+    pool.n_tasks = {'worker-1': 5}
+    loop.run_sync(pool.scale)
+    assert len(pool._processes) == 3
+    pool.n_tasks = {'worker-1': 20}
+    loop.run_sync(pool.scale)
+    assert len(pool._processes) == pool.max_workers
+
+    # Busy or recently busy workers are kept...
+    pool.n_tasks = {'worker-1': 1}
+    loop.run_sync(pool.scale)
+    assert len(pool._processes) == pool.max_workers
+
+    # ...but idle workers are retired, down to `min_workers`
+    pool.idle_timeout = 0
+    pool.n_tasks = {'worker-1': 1}
+    loop.run_sync(pool.scale)
+    assert list(pool._processes) == ['worker-1']
+    assert len(pool.retired) == 3
+    loop.close()
+
+
+def test_worker_pool_unassigned_backlog():
+    """Test that tasks not assigned to any worker count towards the backlog"""
+    loop = tornado.ioloop.IOLoop()
+    pool = _TestWorkerPool(idle_timeout=60)
+    loop.run_sync(pool.scale)
+    # Tasks no worker has been assigned yet count towards the backlog
+    pool.n_unassigned = 5
+    loop.run_sync(pool.scale)
+    assert len(pool._processes) == 3
+    loop.close()
+
+
+def test_stopped_workers_reaped():
+    """Test that stopped workers are not waited for, but killed if stuck"""
+    pool = _TestWorkerPool()
+    exiting, stuck = StandInProcess(), StandInProcess()
+    pool._processes = {'exiting': exiting, 'stuck': stuck}
+    for name in ['exiting', 'stuck']:
+        WorkerPool._stop_worker(pool, name)
+    assert not pool._processes
+
+    # Not waited for...
+    exiting.returncode = 0
+    pool._reap()
+    assert list(pool._stopping) == ['stuck']
+    assert not stuck.killed
+
+    # ...but killed if still running after `stop_timeout`
+    pool.stop_timeout = 0
+    pool._reap()
+    assert stuck.killed
+    assert not pool._stopping
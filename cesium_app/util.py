@@ -33,6 +33,15 @@ def secure_filename(filename):
     return hashlib.sha256(filename).hexdigest()[:20]
 
 
+def file_checksum(path, block_size=2 ** 20):
+    """Compute SHA-256 hash of the contents of the file at `path`."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
 def prediction_to_csv(pred, outpath=None):
     """Convert an `xarray.Dataset` prediction object's results to CSV.
 
@@ -52,6 +61,10 @@ def prediction_to_csv(pred, outpath=None):
          ['ts_1', 'Class_A', 'Class_A']]
         If `outpath` is specified, the data is saved in CSV format to the
         path specified, which is then returned.
+        If only the most likely class labels of each time series were stored
+        (see `prediction_store.top_k_predictions`), `top_k` and `n_classes`
+        columns record the number of labels listed and the total number of
+        classes.
 
     """
     head = ['ts_name']
@@ -69,6 +82,12 @@ def prediction_to_csv(pred, outpath=None):
             if first_iter:
                 head.append('true_target')
 
+        if pred.attrs.get('truncated'):
+            row.extend([pred.attrs['top_k'], pred.attrs['n_classes']])
+
+            if first_iter:
+                head.extend(['top_k', 'n_classes'])
+
         if 'class_label' in entry:
             for label, val in zip(entry.class_label.values,
                                   entry.prediction.values):
@@ -0,0 +1,267 @@
+'''Local pool of dask workers, scaled with the scheduler's backlog.
+
+Instead of a fixed number of workers, `WorkerPool` runs between
+``cfg['cluster']['min_workers']`` and ``cfg['cluster']['max_workers']``
+single-threaded `dask-worker` processes. Every `scale_interval` seconds, it
+asks the scheduler how many tasks are waiting or running, and starts enough
+workers to have at most `tasks_per_worker` of them per worker, as long as
+system memory usage stays below `max_memory_percent` and the available
+memory could accommodate another worker as large as the largest current one.
+The backlog includes tasks that the scheduler has not assigned to any worker
+yet (e.g. because no worker has the resources they need). Workers that have
+had nothing to do for `idle_timeout` seconds are retired again, down to the
+minimum: the scheduler first moves any results they hold to other workers,
+and only then are they stopped, so that no task or result is lost.
+
+Each worker advertises ``cfg['cluster']['worker_memory_mb']`` as its `MEMORY`
+resource, for memory-aware placement of tasks (see `cesium_app.resources`),
+and spills the results it holds to disk once they take up more than
+``cfg['cluster']['spill_fraction']`` of that memory.
+
+Run as a service with ``python services/worker_pool.py``.
+'''
+
+import math
+import subprocess
+import sys
+import time
+
+import psutil
+import tornado.gen
+import tornado.ioloop
+
+from .cluster import SharedExecutor
+from .config import cfg
+
+
+__all__ = ['WorkerPool']
+
+
+def _unassigned_tasks(dask_scheduler=None):
+    """Number of tasks that are ready to run but not assigned to a worker,
+    including those that no worker can run (for lack of resources). Run on
+    the scheduler."""
+    return (len(getattr(dask_scheduler, 'ready', ())) +
+            len(getattr(dask_scheduler, 'unrunnable', ())))
+
+
+class WorkerPool(object):
+    """Adaptive pool of local dask workers.
+
+    Parameters
+    ----------
+    executor : `cluster.SharedExecutor`, optional
+        Connection to the scheduler; by default, a new connection to
+        ``cfg['cluster']['scheduler_address']``.
+    min_workers, max_workers : int, optional
+        Bounds on the number of workers.
+    tasks_per_worker : int, optional
+        Number of waiting or running tasks per worker above which the pool
+        grows.
+    idle_timeout : float, optional
+        Seconds a worker must have been idle before it is retired.
+    max_memory_percent : float, optional
+        System memory usage (in percent) above which no workers are added.
+    scale_interval : float, optional
+        Seconds between scaling decisions.
+
+    All parameters default to the corresponding values of ``cfg['cluster']``.
+
+    """
+    # Seconds a worker is given to exit once terminated, before it is killed
+    stop_timeout = 30
+
+    def __init__(self, executor=None, min_workers=None, max_workers=None,
+                 tasks_per_worker=None, idle_timeout=None,
+                 max_memory_percent=None, scale_interval=None):
+        self.executor = executor or SharedExecutor()
+
+        def config(value, key):
+            return cfg['cluster'][key] if value is None else value
+        self.min_workers = config(min_workers, 'min_workers')
+        self.max_workers = config(max_workers, 'max_workers')
+        self.tasks_per_worker = config(tasks_per_worker, 'tasks_per_worker')
+        self.idle_timeout = config(idle_timeout, 'idle_timeout')
+        self.max_memory_percent = config(max_memory_percent,
+                                         'max_memory_percent')
+        self.scale_interval = config(scale_interval, 'scale_interval')
+
+        # Worker processes and the time they were last seen busy, by name
+        self._processes = {}
+        self._last_busy = {}
+        # Terminated worker processes and the time they were terminated, by
+        # name
+        self._stopping = {}
+        self._n_started = 0
+        self._scaling = None
+        self._scale_in_progress = False
+
+    def start(self):
+        """Start the minimum number of workers and scale periodically. Must
+        be called from within the event loop thread."""
+        self.executor.start()
+        for i in range(self.min_workers):
+            self._start_worker()
+        self._scaling = tornado.ioloop.PeriodicCallback(
+            self.scale, self.scale_interval * 1000)
+        self._scaling.start()
+
+    def stop(self):
+        """Stop scaling and terminate all workers, waiting for them to exit.
+        Blocks, so must not be called while the event loop is running (it is
+        called at exit)."""
+        if self._scaling is not None:
+            self._scaling.stop()
+        for name in list(self._processes):
+            self._stop_worker(name)
+        deadline = time.time() + self.stop_timeout
+        for process, _ in self._stopping.values():
+            try:
+                process.wait(timeout=max(0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self._stopping.clear()
+
+    def _start_worker(self):
+        self._n_started += 1
+        name = 'cesium-worker-{}'.format(self._n_started)
+        worker_memory = cfg['cluster']['worker_memory_mb'] * 2 ** 20
+        spill_threshold = int(cfg['cluster']['spill_fraction'] *
+                              worker_memory)
+        self._processes[name] = subprocess.Popen(
+            ['dask-worker', '--nthreads=1', '--nprocs=1', '--name', name,
+             '--resources', 'MEMORY={}'.format(worker_memory),
+             '--memory-limit', str(spill_threshold),
+             self.executor.address],
+            stdout=sys.stdout, stderr=sys.stderr)
+        self._last_busy[name] = time.time()
+        print('[worker_pool] Started {} ({} workers)'.format(
+            name, len(self._processes)))
+
+    def _stop_worker(self, name):
+        """Terminate worker `name`, without waiting for it to exit (see
+        `_reap`)."""
+        process = self._processes.pop(name)
+        self._last_busy.pop(name, None)
+        process.terminate()
+        self._stopping[name] = (process, time.time())
+        print('[worker_pool] Stopping {} ({} workers)'.format(
+            name, len(self._processes)))
+
+    def _reap(self):
+        """Forget the terminated workers that have exited, and kill those
+        that have not exited within `stop_timeout` seconds."""
+        now = time.time()
+        for name, (process, terminated) in list(self._stopping.items()):
+            if process.poll() is None:
+                if now - terminated < self.stop_timeout:
+                    continue
+                process.kill()
+                print('[worker_pool] Killed {}'.format(name))
+            del self._stopping[name]
+
+    def worker_memory(self):
+        """Resident memory (in bytes) of each worker process, including any
+        children, by worker name."""
+        memory = {}
+        for name, process in self._processes.items():
+            try:
+                parent = psutil.Process(process.pid)
+                memory[name] = sum(p.memory_info().rss for p in
+                                   [parent] + parent.children(recursive=True))
+            except psutil.NoSuchProcess:
+                memory[name] = 0
+        return memory
+
+    @tornado.gen.coroutine
+    def _scheduler_state(self):
+        """Addresses of the workers of this pool, by name, the number of
+        tasks queued for or running on each worker, by address, and the
+        number of tasks not assigned to any worker yet."""
+        executor = yield self.executor.get()
+        identity = yield executor.scheduler.identity()
+        addresses = {info.get('name'): address
+                     for address, info in identity['workers'].items()}
+        processing = yield executor.scheduler.processing()
+        stacks = yield executor.scheduler.stacks()
+        n_tasks = {address: len(processing.get(address, ())) +
+                   len(stacks.get(address, ()))
+                   for address in identity['workers']}
+        n_unassigned = yield executor._run_on_scheduler(_unassigned_tasks)
+        return addresses, n_tasks, n_unassigned
+
+    @tornado.gen.coroutine
+    def scale(self):
+        """Add or retire workers according to the current backlog."""
+        if self._scale_in_progress:
+            return
+        self._scale_in_progress = True
+        try:
+            yield self._scale()
+        finally:
+            self._scale_in_progress = False
+
+    @tornado.gen.coroutine
+    def _scale(self):
+        self._reap()
+        # Replace workers that have died (e.g. killed for using too much
+        # memory)
+        for name, process in list(self._processes.items()):
+            if process.poll() is not None:
+                print('[worker_pool] {} exited with code {}'.format(
+                    name, process.returncode))
+                del self._processes[name]
+                self._last_busy.pop(name, None)
+        while len(self._processes) < self.min_workers:
+            self._start_worker()
+
+        try:
+            addresses, n_tasks, n_unassigned = yield self._scheduler_state()
+        except Exception as e:
+            print('[worker_pool] Could not query scheduler: {!r}'.format(e))
+            return
+
+        backlog = sum(n_tasks.values()) + n_unassigned
+        wanted = int(math.ceil(backlog / float(self.tasks_per_worker)))
+        wanted = max(self.min_workers, min(self.max_workers, wanted))
+
+        now = time.time()
+        for name in self._processes:
+            if n_tasks.get(addresses.get(name), 0) > 0:
+                self._last_busy[name] = now
+
+        n_workers = len(self._processes)
+        if wanted > n_workers:
+            # Only add as many workers as there is memory for, assuming they
+            # will use as much as the largest current worker
+            system_memory = psutil.virtual_memory()
+            worker_memory = max(self.worker_memory().values() or [0])
+            n_new = wanted - n_workers
+            if worker_memory:
+                n_new = min(n_new, system_memory.available // worker_memory)
+            if (system_memory.percent > self.max_memory_percent or
+                    n_new <= 0):
+                print('[worker_pool] Backlog of {} tasks, but not enough '
+                      'memory to add workers'.format(backlog))
+            else:
+                for i in range(n_new):
+                    self._start_worker()
+        elif wanted < n_workers:
+            idle = sorted((name for name in self._processes
+                           if name in addresses and
+                           now - self._last_busy[name] > self.idle_timeout),
+                          key=lambda name: self._last_busy[name])
+            yield self._retire(idle[:n_workers - wanted], addresses)
+
+    @tornado.gen.coroutine
+    def _retire(self, names, addresses):
+        """Gracefully remove workers `names` from the cluster, then stop
+        them."""
+        if not names:
+            return
+        executor = yield self.executor.get()
+        # Moves the results held by the workers to the remaining ones
+        yield executor.scheduler.retire_workers(
+            workers=[addresses[name] for name in names])
+        for name in names:
+            self._stop_worker(name)
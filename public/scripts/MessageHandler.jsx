@@ -27,6 +27,13 @@ class MessageHandler {
       case Action.FETCH_PREDICTIONS:
         this.dispatch(Action.fetchPredictions());
         break;
+      case Action.APPLY_DELTA:
+        this.dispatch(Action.receiveDelta(message.payload));
+        break;
+      // Sent on reconnection if missed messages could not be replayed
+      case Action.HYDRATE:
+        this.dispatch(Action.hydrate());
+        break;
       case SHOW_NOTIFICATION:
         this.dispatch(showNotification(message.payload.note,
                                        message.payload.type));
@@ -1,4 +1,4 @@
-import React, { PropTypes } from 'react';
+import React, { Component, PropTypes } from 'react';
 import { connect } from 'react-redux';
 import { reduxForm } from 'redux-form';
 
@@ -167,6 +167,9 @@ let ModelInfo = props => (
         <th>Model Type</th>
         <th>Hyperparameters</th>
         <th>Training Data Score</th>
+        <th>Cross-Validation</th>
+        <th>Model Size</th>
+        <th>Load Time</th>
       </tr>
     </thead>
     <tbody>
@@ -191,6 +194,33 @@ let ModelInfo = props => (
         <td>
           {props.model.train_score}
         </td>
+        <td>
+          <table>
+            <tbody>
+              {
+                props.model.cv_metrics &&
+                Object.keys(props.model.cv_metrics)
+                  .filter(metric => metric !== 'n_folds')
+                  .map(metric => (
+                    <tr key={metric}>
+                      <td>{metric}</td>
+                      <td style={{ paddingLeft: "5px" }}>
+                        {props.model.cv_metrics[metric].mean.toFixed(3)} &plusmn; {props.model.cv_metrics[metric].std.toFixed(3)}
+                      </td>
+                    </tr>
+                  ))
+              }
+            </tbody>
+          </table>
+        </td>
+        <td>
+          {props.model.artifact_size !== null &&
+           `${(props.model.artifact_size / 1048576).toFixed(1)} MB`}
+        </td>
+        <td>
+          {props.model.load_time !== null &&
+           `${(props.model.load_time * 1000).toFixed(0)} ms`}
+        </td>
       </tr>
     </tbody>
   </table>
@@ -226,7 +256,11 @@ export let ModelTable = props => (
               <td>{model.name}</td>
               <td>{reformatDatetime(model.created)}</td>
               {status}
-              <td><DeleteModel ID={model.id} /></td>
+              <td>
+                {done && ('n_estimators' in model.params) &&
+                 <GrowModel model={model} />}
+                <DeleteModel ID={model.id} />
+              </td>
             </tr>
             {foldedContent}
           </FoldableRow>
@@ -250,6 +284,48 @@ const mtMapStateToProps = (state, ownProps) => (
 ModelTable = connect(mtMapStateToProps)(ModelTable);
 
 
+/* Add estimators to a finished ensemble model, as a new model */
+class GrowModelControl extends Component {
+  constructor(props) {
+    super(props);
+    this.state = { nEstimators: '' };
+    this.grow = this.grow.bind(this);
+  }
+
+  grow(e) {
+    e.stopPropagation();
+    this.props.grow(this.props.model.id, this.state.nEstimators);
+    this.setState({ nEstimators: '' });
+  }
+
+  render() {
+    return (
+      <div style={{ display: 'inline-block', marginRight: '1em' }}>
+        <input
+          type="text"
+          size={4}
+          placeholder={this.props.model.params.n_estimators || ""}
+          value={this.state.nEstimators}
+          onClick={e => e.stopPropagation()}
+          onChange={e => this.setState({ nEstimators: e.target.value })}
+        />
+        <a onClick={this.grow}> Grow</a>
+      </div>
+    );
+  }
+}
+GrowModelControl.propTypes = {
+  model: PropTypes.object.isRequired,
+  grow: PropTypes.func.isRequired
+};
+
+const gmMapDispatchToProps = dispatch => (
+  { grow: (id, nEstimators) => dispatch(Action.growModel(id, nEstimators)) }
+);
+
+const GrowModel = connect(null, gmMapDispatchToProps)(GrowModelControl);
+
+
 const dmMapDispatchToProps = dispatch => (
   { delete: id => dispatch(Action.deleteModel(id)) }
 );
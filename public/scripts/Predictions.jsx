@@ -172,6 +172,9 @@ const PredictionResults = (props) => {
 
   return (
     <table className="table">
+      {props.prediction.truncated &&
+       <caption>Only the most likely classes of each time series are shown.</caption>
+      }
       <thead>
         <tr>
           <th>Time Series</th>
@@ -192,7 +195,9 @@ const PredictionResults = (props) => {
       <tbody>
       {results && Object.keys(results).map((fname, idx) => {
         const result = results[fname];
-        const classesSorted = classes.sort((a, b) => (result.prediction[b] - result.prediction[a]));
+        // With top-k storage, each time series has its own set of labels
+        const classesSorted = Object.keys(result.prediction).sort(
+          (a, b) => (result.prediction[b] - result.prediction[a]));
 
         return (
           <tr key={idx}>
@@ -64,6 +64,11 @@ class WebSocket extends React.Component {
       authenticated: false
     };
 
+    // Server run and sequence number of the last message received, sent
+    // when reconnecting so that the server can replay any messages missed
+    this.epoch = null;
+    this.lastSeq = null;
+
     const ws = new ReconnectingWebSocket(props.url);
 
     ws.onopen = (event) => {
@@ -81,16 +86,25 @@ class WebSocket extends React.Component {
       const data = JSON.parse(message);
       const action = data.action;
 
+      if (data.seq !== undefined) {
+        this.lastSeq = data.seq;
+      }
+
       switch (action) {
         case "AUTH REQUEST":
           getAuthToken(this.props.auth_url)
-            .then(token => ws.send(token));
+            .then(token => ws.send(JSON.stringify({
+              token,
+              epoch: this.epoch,
+              last_seq: this.lastSeq
+            })));
           break;
         case "AUTH FAILED":
           this.setState({ authenticated: false });
           eraseCookie('auth_token');
           break;
         case "AUTH OK":
+          this.epoch = data.epoch;
           this.setState({ authenticated: true });
           break;
         default:
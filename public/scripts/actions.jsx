@@ -5,6 +5,10 @@ import { reset as resetForm } from 'redux-form';
 
 export const HYDRATE = 'cesium/HYDRATE';
 
+// Change to one of the lists below, pushed by the server (see
+// cesium_app/deltas.py)
+export const APPLY_DELTA = 'cesium/APPLY_DELTA';
+
 export const FETCH_PROJECTS = 'cesium/FETCH_PROJECTS';
 export const RECEIVE_PROJECTS = 'cesium/RECEIVE_PROJECTS';
 export const ADD_PROJECT = 'cesium/ADD_PROJECT';
@@ -29,6 +33,7 @@ export const FETCH_MODELS = 'cesium/FETCH_MODELS';
 export const RECEIVE_MODELS = 'cesium/RECEIVE_MODELS';
 export const CREATE_MODEL = 'cesium/CREATE_MODEL';
 export const DELETE_MODEL = 'cesium/DELETE_MODEL';
+export const GROW_MODEL = 'cesium/GROW_MODEL';
 
 export const FETCH_PREDICTIONS = 'cesium/FETCH_PREDICTIONS';
 export const RECEIVE_PREDICTIONS = 'cesium/RECEIVE_PREDICTIONS';
@@ -515,6 +520,33 @@ export function deleteModel(id) {
 }
 
 
+export function growModel(id, nEstimators) {
+  return dispatch =>
+    promiseAction(
+      dispatch,
+      GROW_MODEL,
+
+      fetch(`/models/${id}/grow`,
+            { method: 'POST',
+             body: JSON.stringify({ nEstimators }),
+             headers: new Headers({
+               'Content-Type': 'application/json'
+             }) })
+        .then(response => response.json())
+        .then((json) => {
+          if (json.status == 'success') {
+            dispatch(showNotification('Model training begun.'));
+          } else {
+            dispatch(
+              showNotification(
+                'Error growing model ({})'.format(json.message)
+              ));
+          }
+          return json;
+        })
+  );
+}
+
 export function doPrediction(form) {
   return dispatch =>
     promiseAction(
@@ -593,6 +625,43 @@ export function receivePredictions(preds) {
 }
 
 
+export function applyDelta(delta) {
+  return {
+    type: APPLY_DELTA,
+    payload: delta
+  };
+}
+
+
+// Apply a delta pushed by the server; deltas of predictions do not include
+// their results, which are downloaded once the prediction has finished
+export function receiveDelta(delta) {
+  return (dispatch) => {
+    dispatch(applyDelta(delta));
+    if (delta.collection === 'predictions' && delta.item &&
+        delta.item.finished) {
+      dispatch(fetchPrediction(delta.id, delta.version));
+    }
+  };
+}
+
+
+// Download a single prediction, with its results
+export function fetchPrediction(id, version) {
+  return dispatch =>
+    fetch(`/predictions/${id}`)
+      .then(response => response.json())
+      .then((json) => {
+        if (json.status == 'success') {
+          dispatch(applyDelta({ collection: 'predictions', id, version,
+                                item: json.data }));
+        }
+        return json;
+      }
+      ).catch(ex => console.log('fetchPrediction', ex));
+}
+
+
 export function spinLogo() {
   return {
     type: SPIN_LOGO
@@ -6,10 +6,40 @@ import { reducer as notifications } from './Notifications';
 import { contains, joinObjectValues } from './utils';
 
 
+// Apply a change pushed by the server (see cesium_app/deltas.py) to the
+// list of items of `collection`
+function applyDelta(list, collection, delta) {
+  const cascaded = (delta.cascade && delta.cascade[collection]) || [];
+  const remaining = cascaded.length ?
+    list.filter(item => !contains(cascaded, item.id)) : list;
+
+  if (delta.collection !== collection) {
+    return remaining;
+  }
+
+  const current = remaining.find(item => item.id === delta.id);
+  if (current && current.version > delta.version) {
+    return remaining;
+  }
+  if (delta.deleted) {
+    return remaining.filter(item => item.id !== delta.id);
+  }
+
+  const item = { ...delta.item, version: delta.version };
+  return current ?
+    remaining.map(other => (other.id === delta.id ? item : other)) :
+    [...remaining, item];
+}
+
+
 function projects(state={ projectList: [] }, action) {
   switch (action.type) {
     case Action.RECEIVE_PROJECTS:
       return { ...state, projectList: action.payload };
+    case Action.APPLY_DELTA:
+      return { ...state,
+               projectList: applyDelta(state.projectList, 'projects',
+                                       action.payload) };
     default:
       return state;
   }
@@ -20,6 +50,8 @@ function datasets(state = [], action) {
   switch (action.type) {
     case Action.RECEIVE_DATASETS:
       return action.payload;
+    case Action.APPLY_DELTA:
+      return applyDelta(state, 'datasets', action.payload);
     default:
       return state;
   }
@@ -30,6 +62,8 @@ function featuresets(state=[], action) {
   switch (action.type) {
     case Action.RECEIVE_FEATURESETS:
       return action.payload;
+    case Action.APPLY_DELTA:
+      return applyDelta(state, 'featuresets', action.payload);
     default:
       return state;
   }
@@ -74,6 +108,8 @@ function models(state = [], action) {
   switch (action.type) {
     case Action.RECEIVE_MODELS:
       return action.payload;
+    case Action.APPLY_DELTA:
+      return applyDelta(state, 'models', action.payload);
     default:
       return state;
   }
@@ -84,6 +120,8 @@ function predictions(state = [], action) {
   switch (action.type) {
     case Action.RECEIVE_PREDICTIONS:
       return action.payload;
+    case Action.APPLY_DELTA:
+      return applyDelta(state, 'predictions', action.payload);
     default:
       return state;
   }
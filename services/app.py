@@ -5,4 +5,6 @@ import tornado.ioloop
 
 app = app_server.make_app()
 app.listen(65000)
+app.executor.start()
+app.job_manager.start()
 tornado.ioloop.IOLoop.current().start()
@@ -1,7 +1,11 @@
 # encoding: utf-8
 
 from tornado import websocket, web, ioloop
+import collections
+import itertools
 import json
+import time
+import uuid
 import zmq
 import jwt
 
@@ -16,6 +20,35 @@ ctx = zmq.Context()
 
 class WebSocket(websocket.WebSocketHandler):
     participants = set()
+    # Authenticated connections, by username
+    connections = collections.defaultdict(set)
+    # Maximum number of seconds without writing to a connection
+    heartbeat_interval = 45
+    # Identical FETCH_* actions to the same user within this many seconds
+    # of each other are delivered only once, plus once more at the end of
+    # the window if any were held back; 0 disables coalescing
+    coalesce_window = config.cfg['websocket']['coalesce_window']
+    # Whether actions were held back during the open coalescing windows, by
+    # (user, message)
+    _coalescing = {}
+    n_coalesced = 0
+    # Maximum number of messages waiting to be written to a connection,
+    # beyond which they are replaced by a single HYDRATE (see `_resync`);
+    # connections that do not catch up within `slow_consumer_timeout`
+    # seconds are closed
+    max_queue = config.cfg['websocket']['max_queue']
+    slow_consumer_timeout = config.cfg['websocket']['slow_consumer_timeout']
+    _message_ids = itertools.count()
+    # The last `replay_buffer_size` messages (at most `replay_max_age`
+    # seconds old) sent to each user are kept, numbered, as (sequence
+    # number, time, message), so that a reconnecting client can get those it
+    # missed; sequence numbers restart with the server, i.e. with `epoch`
+    replay_buffer_size = config.cfg['websocket']['replay_buffer_size']
+    replay_max_age = config.cfg['websocket']['replay_max_age']
+    history = collections.defaultdict(
+        lambda: collections.deque(maxlen=WebSocket.replay_buffer_size))
+    _last_seq = collections.defaultdict(int)
+    epoch = uuid.uuid4().hex
 
     def __init__(self, *args, **kwargs):
         websocket.WebSocketHandler.__init__(self, *args, **kwargs)
@@ -24,6 +57,17 @@ class WebSocket(websocket.WebSocketHandler):
         self.auth_failures = 0
         self.max_auth_fails = 3
         self.username = None
+        self.last_write = time.time()
+        self._init_send_queue()
+
+    def _init_send_queue(self):
+        # Messages waiting to be written, by key: a message replaces a
+        # waiting message with the same key, which it makes stale
+        self._send_queue = collections.OrderedDict()
+        self._writing = False
+        self._full_since = None
+        self.n_dropped = 0
+        self.n_replaced = 0
 
     def check_origin(self, origin):
         return True
@@ -36,26 +80,151 @@ class WebSocket(websocket.WebSocketHandler):
     def on_close(self):
         if self in self.participants:
             self.participants.remove(self)
+        self._unregister()
+
+    def _unregister(self):
+        user_connections = self.connections.get(self.username)
+        if user_connections is not None:
+            user_connections.discard(self)
+            if not user_connections:
+                del self.connections[self.username]
+
+    def on_message(self, message):
+        # Either an auth token, or a JSON object with the token and, to
+        # resume a previous connection, the `epoch` and sequence number of
+        # the last message received
+        try:
+            resume = json.loads(message)
+        except ValueError:
+            resume = None
+        if not isinstance(resume, dict):
+            resume = {'token': message}
 
-    def on_message(self, auth_token):
-        self.authenticate(auth_token)
-        if not self.authenticated and self.auth_failures < self.max_auth_fails:
+        self.authenticate(resume.get('token'))
+        if self.authenticated:
+            self.replay(resume.get('epoch'), resume.get('last_seq'))
+        elif self.auth_failures < self.max_auth_fails:
             self.request_auth()
 
+    def replay(self, epoch, last_seq):
+        """Send the messages after `last_seq` again, or, if some of them
+        are no longer kept, tell the client to download everything again."""
+        if last_seq is None:
+            return
+        current_seq = self._last_seq.get(self.username, 0)
+        if epoch == self.epoch and last_seq >= current_seq:
+            return
+
+        history = self.history.get(self.username, ())
+        if (epoch != self.epoch or not history or
+                history[0][0] > last_seq + 1):
+            self.send_json(action='cesium/HYDRATE', seq=current_seq)
+            return
+        for seq, sent, data in history:
+            if seq > last_seq:
+                self.send(data)
+
     def request_auth(self):
         self.auth_failures += 1
         self.send_json(action="AUTH REQUEST")
 
     def send_json(self, **kwargs):
-        self.write_message(json.dumps(kwargs))
+        self.send(json.dumps(kwargs))
+
+    def send(self, message, key=None):
+        """Queue `message` to be written to the connection.
+
+        A waiting message with the same `key` (if not None) is replaced. If
+        the queue is full, a heartbeat is dropped; any other message would
+        leave the client out of date, so the client is resynchronized
+        instead (see `_resync`).
+        """
+        if not self._writing:
+            # Nothing is waiting
+            self._full_since = None
+            self._write(message)
+            return
+
+        if key is None:
+            key = next(self._message_ids)
+        elif key in self._send_queue:
+            self._send_queue[key] = message
+            self.n_replaced += 1
+            return
+
+        if len(self._send_queue) >= self.max_queue:
+            if key == '<3':
+                # A connection that is being written to needs no heartbeat
+                self.n_dropped += 1
+                return
+            if self._send_queue.pop('<3', None) is not None:
+                self.n_dropped += 1
+            else:
+                # The HYDRATE also brings the client up to date with
+                # `message`
+                self._resync()
+                return
+        self._send_queue[key] = message
+
+    def _resync(self):
+        """Replace the waiting messages with a single HYDRATE, telling the
+        client to download everything again (and to resume from the
+        current sequence number, so that it does not ask for the dropped
+        messages to be replayed). Connections that are resynchronized again
+        `slow_consumer_timeout` seconds later, without having caught up in
+        the meantime, are closed instead."""
+        self.n_dropped += len(self._send_queue)
+        self._send_queue.clear()
+        now = time.time()
+        if self._full_since is None:
+            self._full_since = now
+        elif now - self._full_since > self.slow_consumer_timeout:
+            print('[websocket_server] Closing connection of {}: {} '
+                  'messages dropped'.format(self.username, self.n_dropped))
+            self.close()
+            return
+        self._send_queue['cesium/HYDRATE'] = json.dumps({
+            'action': 'cesium/HYDRATE',
+            'seq': self._last_seq.get(self.username, 0)})
+
+    def _write(self, message):
+        # Only one message is written at a time, so that messages wait in
+        # the (bounded) queue rather than in the connection's output buffer
+        try:
+            future = self.write_message(message)
+        except websocket.WebSocketClosedError:
+            self._send_queue.clear()
+            return
+        if future is not None and not future.done():
+            self._writing = True
+            future.add_done_callback(self._write_next)
+        else:
+            self._write_next()
+
+    def _write_next(self, previous=None):
+        self._writing = False
+        if self._send_queue:
+            key, message = self._send_queue.popitem(last=False)
+            self._write(message)
+
+    @property
+    def queue_depth(self):
+        """Number of messages waiting to be written."""
+        return len(self._send_queue)
+
+    def write_message(self, message, binary=False):
+        self.last_write = time.time()
+        return websocket.WebSocketHandler.write_message(self, message, binary)
 
     def authenticate(self, auth_token):
         try:
             token_payload = jwt.decode(auth_token, secret)
+            self._unregister()
             self.username = token_payload['username']
             self.authenticated = True
+            self.connections[self.username].add(self)
             self.auth_failures = 0
-            self.send_json(action='AUTH OK')
+            self.send_json(action='AUTH OK', epoch=self.epoch)
         except jwt.DecodeError:
             self.send_json(action='AUTH FAILED')
         except jwt.ExpiredSignatureError:
@@ -63,18 +232,100 @@ class WebSocket(websocket.WebSocketHandler):
 
     @classmethod
     def heartbeat(cls):
+        # Only connections that have been silent for a while need one; called
+        # every `heartbeat_interval / 3` seconds
+        cutoff = time.time() - cls.heartbeat_interval * 2 / 3
         for p in cls.participants:
-            p.write_message(b'<3')
+            if p.last_write < cutoff:
+                p.send(b'<3', key='<3')
+        cls._prune_history()
+
+    @classmethod
+    def _prune_history(cls):
+        cutoff = time.time() - cls.replay_max_age
+        for user, history in list(cls.history.items()):
+            while history and history[0][1] < cutoff:
+                history.popleft()
+            if not history:
+                del cls.history[user]
+
+    @classmethod
+    def stats(cls):
+        """Queue depth and dropped and replaced messages of each
+        connection."""
+        return [{'username': p.username, 'queue_depth': p.queue_depth,
+                 'dropped': p.n_dropped, 'replaced': p.n_replaced}
+                for p in cls.participants]
 
     # http://mrjoes.github.io/2013/06/21/python-realtime.html
     @classmethod
     def broadcast(cls, data):
         channel, data = data[0].decode('utf-8').split(" ", 1)
-        user = json.loads(data)["user"]
+        message = json.loads(data)
+        user = message["user"]
 
-        for p in cls.participants:
-            if p.authenticated and p.username == user:
-                p.write_message(data)
+        # Refetching a list once brings the frontend up to date with any
+        # number of changes
+        if (cls.coalesce_window and
+                message["action"].startswith('cesium/FETCH_')):
+            key = (user, data)
+            if key in cls._coalescing:
+                cls._coalescing[key] = True
+                cls.n_coalesced += 1
+                return
+            cls._open_window(key)
+
+        cls.send_to_user(user, message)
+
+    @staticmethod
+    def _stale_key(message):
+        """Key of the messages made stale by `message` (see `send`)."""
+        action = message['action']
+        if action.startswith('cesium/FETCH_'):
+            return action
+        elif action == 'cesium/APPLY_DELTA':
+            delta = message['payload']
+            return (action, delta['collection'], delta['id'])
+        return None
+
+    @classmethod
+    def send_to_user(cls, user, message):
+        """Send `message` to all connections of `user`, numbered and kept
+        for replay."""
+        cls._last_seq[user] += 1
+        seq = cls._last_seq[user]
+        data = json.dumps(dict(message, seq=seq))
+        cls.history[user].append((seq, time.time(), data))
+
+        key = cls._stale_key(message)
+        for p in list(cls.connections.get(user, ())):
+            p.send(data, key)
+
+    @classmethod
+    def _open_window(cls, key):
+        cls._coalescing[key] = False
+        ioloop.IOLoop.current().call_later(cls.coalesce_window,
+                                           cls._close_window, key)
+
+    @classmethod
+    def _close_window(cls, key):
+        if cls._coalescing.pop(key):
+            # Deliver the actions held back, and hold back further ones
+            # for another window
+            cls._open_window(key)
+            user, data = key
+            cls.send_to_user(user, json.loads(data))
+
+
+class StatsHandler(web.RequestHandler):
+    """Send queue metrics of all connections (not exposed through nginx)."""
+    def get(self):
+        connections = WebSocket.stats()
+        self.write({'connections': connections,
+                    'queue_depth': sum(c['queue_depth'] for c in connections),
+                    'max_queue_depth': max([c['queue_depth']
+                                            for c in connections] or [0]),
+                    'coalesced': WebSocket.n_coalesced})
 
 
 if __name__ == "__main__":
@@ -98,12 +349,14 @@ if __name__ == "__main__":
 
     server = web.Application([
         (r'/websocket', WebSocket),
+        (r'/stats', StatsHandler),
     ])
     server.listen(PORT)
 
-    # We send a heartbeat every 45 seconds to make sure that nginx
-    # proxy does not time out and close the connection
-    ioloop.PeriodicCallback(WebSocket.heartbeat, 45000).start()
+    # We make sure that every connection is written to at least every 45
+    # seconds so that nginx proxy does not time out and close it
+    ioloop.PeriodicCallback(WebSocket.heartbeat,
+                            WebSocket.heartbeat_interval * 1000 / 3).start()
 
     print('[websocket_server] Listening for incoming websocket connections on port {}'.format(PORT))
     ioloop.IOLoop.instance().start()
@@ -0,0 +1,17 @@
+import atexit
+import signal
+import sys
+
+import tornado.ioloop
+
+from cesium_app.worker_pool import WorkerPool
+
+
+pool = WorkerPool()
+atexit.register(pool.stop)
+# Exit (and so stop the workers) when supervisord stops the pool
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+loop = tornado.ioloop.IOLoop.current()
+loop.add_callback(pool.start)
+loop.start()
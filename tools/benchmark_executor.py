@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Compare the latency of connecting a new `distributed.Executor` for every
+request (as the app server used to) with that of the shared, long-lived
+executor of `cesium_app.cluster.SharedExecutor`.
+
+Requires a running dask scheduler and workers (e.g. ``make run``):
+
+    PYTHONPATH=. ./tools/benchmark_executor.py [-n 50] [--address HOST:PORT]
+
+For each approach, reports the time to obtain an executor ("startup") and
+the round-trip time of a trivial task submitted through it ("request").
+"""
+
+import argparse
+import time
+
+import numpy as np
+import tornado.gen
+import tornado.ioloop
+
+from cesium_app.cluster import SharedExecutor
+from cesium_app.config import cfg
+
+
+def _noop(x):
+    return x
+
+
+def report(label, startup, request):
+    print('{:<12} startup: median {:7.2f} ms, max {:7.2f} ms | '
+          'request: median {:7.2f} ms, max {:7.2f} ms'.format(
+              label, 1e3 * np.median(startup), 1e3 * np.max(startup),
+              1e3 * np.median(request), 1e3 * np.max(request)))
+
+
+@tornado.gen.coroutine
+def benchmark_per_request(address, n):
+    from distributed import Executor
+
+    loop = tornado.ioloop.IOLoop.current()
+    startup, request = [], []
+    for i in range(n):
+        t0 = time.time()
+        executor = Executor(address, loop=loop, start=False)
+        yield executor._start()
+        t1 = time.time()
+        yield executor.submit(_noop, i, pure=False)._result()
+        t2 = time.time()
+        yield executor._shutdown()
+        startup.append(t1 - t0)
+        request.append(t2 - t1)
+    report('per-request', startup, request)
+
+
+@tornado.gen.coroutine
+def benchmark_shared(address, n):
+    shared = SharedExecutor(address, health_check_interval=0)
+    startup, request = [], []
+    for i in range(n):
+        t0 = time.time()
+        executor = yield shared.get()
+        t1 = time.time()
+        yield executor.submit(_noop, i, pure=False)._result()
+        t2 = time.time()
+        startup.append(t1 - t0)
+        request.append(t2 - t1)
+    yield shared.stop()
+    report('shared', startup, request)
+    print('{:<12} connections made: {}'.format('', shared.n_connects))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=50,
+                        help='Number of simulated requests')
+    parser.add_argument('--address',
+                        default=cfg['cluster']['scheduler_address'],
+                        help='Address of the dask scheduler')
+    args = parser.parse_args()
+
+    loop = tornado.ioloop.IOLoop.current()
+    loop.run_sync(lambda: benchmark_per_request(args.address, args.n))
+    loop.run_sync(lambda: benchmark_shared(args.address, args.n))
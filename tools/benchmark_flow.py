@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Compare the delivery latency and loss of actions pushed through a new
+`Flow` publisher per request (as the app server used to) with those of the
+process-wide publisher of `cesium_app.flow.Flow.instance()`.
+
+Runs its own message proxy on temporary sockets, so it does not interfere
+with (or need) a running app:
+
+    PYTHONPATH=. ./tools/benchmark_flow.py [-n 2000] [--rate 1000]
+
+Each of `n` actions is pushed `1/rate` seconds after the previous one, and
+received by a subscriber on the proxy's output, as the websocket server
+would.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import zmq
+
+from cesium_app.flow import Flow
+from cesium_app.json_util import to_json
+
+
+def start_proxy(ctx, address_in, address_out):
+    def run():
+        feed_in = ctx.socket(zmq.XSUB)
+        feed_in.bind(address_in)
+        feed_out = ctx.socket(zmq.XPUB)
+        feed_out.bind(address_out)
+        try:
+            zmq.proxy(feed_in, feed_out)
+        except zmq.ContextTerminated:
+            pass
+    threading.Thread(target=run, daemon=True).start()
+
+
+class PerRequestFlow(object):
+    """Publisher connecting a new context and socket for every action."""
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+
+    def push(self, user, action_type, payload={}):
+        ctx = zmq.Context()
+        pub = ctx.socket(zmq.PUB)
+        pub.connect(self.socket_path)
+        pub.send(b"0 " + to_json({'user': user,
+                                  'action': action_type,
+                                  'payload': payload}).encode('utf-8'))
+        pub.close(linger=1000)
+        ctx.term()
+
+    def flush(self, timeout=None):
+        return True
+
+
+def benchmark(label, flow, sub, n, rate):
+    received = {}
+
+    def receive():
+        while True:
+            try:
+                message = sub.recv()
+            except zmq.Again:
+                return
+            data = json.loads(message.decode('utf-8').split(' ', 1)[1])
+            received[data['payload']['i']] = time.time() - \
+                data['payload']['sent']
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+
+    t0 = time.time()
+    for i in range(n):
+        flow.push('benchmark', 'cesium/BENCHMARK',
+                  {'i': i, 'sent': time.time()})
+        time.sleep(max(0, t0 + (i + 1) / rate - time.time()))
+    push_time = time.time() - t0
+    flow.flush()
+    receiver.join()
+
+    latency = np.array(list(received.values())) * 1e3
+    print('{:<12} pushed {} in {:6.2f} s | lost {:5} ({:5.1f}%) | latency: '
+          'median {:7.2f} ms, 99th percentile {:7.2f} ms'.format(
+              label, n, push_time, n - len(received),
+              100. * (n - len(received)) / n,
+              np.median(latency) if len(latency) else np.nan,
+              np.percentile(latency, 99) if len(latency) else np.nan))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=2000,
+                        help='Number of actions pushed')
+    parser.add_argument('--rate', type=float, default=1000,
+                        help='Actions pushed per second')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    address_in = 'ipc://' + os.path.join(tmp_dir, 'flow_in')
+    address_out = 'ipc://' + os.path.join(tmp_dir, 'flow_out')
+    ctx = zmq.Context()
+    start_proxy(ctx, address_in, address_out)
+
+    sub = ctx.socket(zmq.SUB)
+    sub.connect(address_out)
+    sub.setsockopt(zmq.SUBSCRIBE, b'')
+    # Stop receiving once no more messages arrive
+    sub.setsockopt(zmq.RCVTIMEO, 2000)
+    time.sleep(0.5)
+
+    benchmark('per-request', PerRequestFlow(address_in), sub, args.n,
+              args.rate)
+    shared = Flow(address_in)
+    benchmark('shared', shared, sub, args.n, args.rate)
+    print('{:<12} batches sent: {}, dropped: {}'.format(
+        '', shared.n_batches, shared.n_dropped))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Measure the fan-out throughput of the websocket server (messages routed
+per second) against the number of open connections, comparing a scan of all
+connections per message (as the server used to) with the per-user index of
+`WebSocket.connections`.
+
+Connections are simulated in-process, so only the routing is measured, not
+the network:
+
+    PYTHONPATH=. ./tools/benchmark_websocket.py [-n 2000] [--users 100]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'services'))
+from websocket_server import WebSocket
+
+
+class SimulatedWebSocket(WebSocket):
+    """`WebSocket` without a network connection."""
+    def __init__(self, username):
+        self.authenticated = False
+        self.username = None
+        self.n_received = 0
+        self.last_write = time.time()
+        self._init_send_queue()
+        self.participants.add(self)
+        self.username = username
+        self.authenticated = True
+        self.connections[username].add(self)
+
+    def write_message(self, message, binary=False):
+        self.n_received += 1
+
+
+def scan_broadcast(data):
+    """Routing by scanning all connections."""
+    channel, data = data[0].decode('utf-8').split(" ", 1)
+    user = json.loads(data)["user"]
+
+    for p in WebSocket.participants:
+        if p.authenticated and p.username == user:
+            p.write_message(data)
+
+
+def benchmark(label, broadcast, messages):
+    t0 = time.time()
+    for message in messages:
+        broadcast(message)
+    return len(messages) / (time.time() - t0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', type=int, default=2000,
+                        help='Number of messages routed per measurement')
+    parser.add_argument('--users', type=int, default=100,
+                        help='Number of users the connections belong to')
+    args = parser.parse_args()
+    # Measure routing only, without holding back repeated actions
+    WebSocket.coalesce_window = 0
+
+    messages = [[('0 ' + json.dumps({'user': 'user{}'.format(i % args.users),
+                                     'action': 'cesium/FETCH_MODELS',
+                                     'payload': {}})).encode('utf-8')]
+                for i in range(args.n)]
+
+    print('{:>12} {:>18} {:>18}'.format('connections', 'scan (msg/s)',
+                                        'index (msg/s)'))
+    for n_connections in [100, 1000, 10000, 50000]:
+        WebSocket.participants.clear()
+        WebSocket.connections.clear()
+        for i in range(n_connections):
+            SimulatedWebSocket('user{}'.format(i % args.users))
+        print('{:>12} {:>18.0f} {:>18.0f}'.format(
+            n_connections, benchmark('scan', scan_broadcast, messages),
+            benchmark('index', WebSocket.broadcast, messages)))